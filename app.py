@@ -1,28 +1,175 @@
-from flask import Flask, render_template, request, jsonify # Import jsonify
+from flask import Flask, render_template, request, jsonify, g, Response # Import jsonify
 # Import prediction functions and the new user ID getter
-from pipeline.prediction_pipeline import predict_anime_hybrid, predict_similar_anime, get_all_user_ids
-import sys
+from pipeline.prediction_pipeline import (predict_anime_hybrid, predict_similar_anime, predict_top_rated_anime,
+                                          predict_also_liked_anime, predict_similar_synopsis, get_all_user_ids, warm_up)
+from functools import partial
+from time import perf_counter
 from src.custom_exception import CustomException
 from src.logger import get_logger
+from utils.anime_filters import parse_filters
+from utils.admission import AdmissionPolicy, ServiceUnavailable, request_key
+from utils.diversity import DiversityReranker
+from utils.single_flight import FollowerTimeout, SingleFlight, recommendation_key
+from utils.helpers import anime_id_for_name, popular_recommendations
+from utils.sharded_search import ShardedUserSearch
+from utils.app_state import app_state
+from utils.common_functions import read_yaml
+from utils.metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT, generate_latest, CONTENT_TYPE_LATEST
+from utils.tracing import Tracer
+from utils.trending import TrendingService
+from config.paths_config import CONFIG_PATH
 
 app = Flask(__name__)
 logger = get_logger(__name__)
 
+config = read_yaml(CONFIG_PATH)
+
+# Optional out-of-process user search. Shards are started before the loader thread so they fork cleanly.
+sharded_search_config = config.get("sharded_search", {})
+if sharded_search_config.get("enabled", False):
+    app_state.user_search = ShardedUserSearch(sharded_search_config.get("n_shards", 2)).start()
+
+# Load artifacts (and warm caches) without blocking the server from binding.
+serving_config = config.get("serving", {})
+warmup_config = serving_config.get("warmup", {})
+app_state.start(
+    background=serving_config.get("load_in_background", True),
+    warmup=partial(warm_up,
+                   top_titles=warmup_config.get("top_titles", 10),
+                   sample_users=warmup_config.get("sample_users", 5),
+                   random_state=warmup_config.get("random_state", 42)) if warmup_config.get("enabled", True) else None
+)
+
+# Per-request tracing; off unless enabled under `tracing` in config.yaml.
+tracer = Tracer(config.get("tracing", {}))
+
+# Bounded concurrency, per-request deadlines and cache/popularity fallbacks under overload.
+admission = AdmissionPolicy(config.get("admission", {}))
+
+# MMR re-ranking of similar-anime and hybrid results; off unless enabled under `diversity` in config.yaml.
+diversity = DiversityReranker(config.get("diversity", {}))
+diversity = diversity if diversity.enabled else None
+
+# Windowed "trending now" counts from live events; off unless enabled under `trending` in config.yaml.
+trending_config = config.get("trending", {})
+trending = TrendingService(trending_config).start(app_state) if trending_config.get("enabled", False) else None
+
+# Concurrent identical recommendation requests (same title or user, filters and model version) share one computation.
+recommendation_flight = SingleFlight("recommendations")
+
+def recommend(kind, key, filters, compute):
+    # Admission-controlled and, unless disabled, shared with identical requests in flight.
+    fallback = lambda: popular_recommendations(filters=filters, reason="overload")
+    serve = lambda: admission.serve(kind, key, compute, fallback=fallback, filters=filters)
+    if not serving_config.get("coalesce_requests", True):
+        return serve()
+    try:
+        result, _ = recommendation_flight.do(recommendation_key(kind, key, filters, app_state.model_version), serve,
+                                             timeout=admission.timeout_s if admission.enabled else None)
+    except FollowerTimeout as e:
+        # Waiting on another request's computation is bounded by this request's own deadline.
+        logger.warning(f"{e}.")
+        return admission.degrade(request_key(kind, key, filters), "deadline", fallback)
+    return result
+
+@app.before_request
+def start_request_timer():
+    g.request_start = perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    trace = tracer.start(f"{request.method} {request.path}", request.headers)
+    if trace is not None:
+        g.trace = trace.__enter__()
+
+@app.teardown_request
+def finish_request_trace(exc):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.__exit__(type(exc) if exc else None, exc, None)
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_SECONDS.labels(request.endpoint or 'unknown', request.method, response.status_code).observe(perf_counter() - start)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and serving HTTP, regardless of artifact state.
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: artifacts loaded and warm-up finished.
+    readiness = app_state.readiness()
+    return jsonify(readiness), (200 if readiness['ready'] else 503)
+
+@app.route('/trending')
+def trending_now():
+    # Most viewed/rated anime over the recent window, served from a precomputed snapshot.
+    if trending is None:
+        return jsonify({'error': 'Trending is disabled.'}), 404
+    entries, as_of = trending.trending(request.args.get('n', default=10, type=int))
+    return jsonify({'trending': entries, 'window_minutes': trending_config.get('window_minutes', 60), 'as_of': as_of})
+
+def recommendations_json(predict, *args):
+    # Shared body of the single-recommender JSON routes.
+    if not app_state.is_ready():
+        return jsonify({'error': 'Recommendations are not available until artifacts are loaded.'}), 503
+    try:
+        return jsonify({'recommendations': predict(*args)})
+    except CustomException as e:
+        logger.error(f"CustomException occurred during prediction: {e}", exc_info=True)
+        return jsonify({'error': 'An error occurred while generating recommendations.'}), 500
+
+@app.route('/recommendations/top-rated')
+def top_rated():
+    # Anime the user would rate highest, scored by the NumPy RecommenderNet scorer.
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        return jsonify({'error': 'An integer user_id is required.'}), 400
+    return recommendations_json(predict_top_rated_anime, user_id)
+
+@app.route('/recommendations/also-liked')
+def also_liked():
+    # "People who liked X also liked", from the precomputed co-occurrence neighbours.
+    anime_name = request.args.get('anime')
+    if not anime_name:
+        return jsonify({'error': 'An anime title is required.'}), 400
+    return recommendations_json(predict_also_liked_anime, anime_name)
+
+@app.route('/recommendations/similar-synopsis')
+def similar_synopsis():
+    # Anime whose synopses read most like the title's, from the precomputed TF-IDF index.
+    anime_name = request.args.get('anime')
+    if not anime_name:
+        return jsonify({'error': 'An anime title is required.'}), 400
+    return recommendations_json(predict_similar_synopsis, anime_name)
+
 @app.route('/', methods=['GET', 'POST'])
 def home():
     if request.method == 'POST':
         recommendations = None
         result_title = ""
         error_message = None # Variable for potential errors
+        source = None # "computed", or what was served instead under overload ("cache"/"popularity")
         try:
             recommendation_type = request.form.get("recommendation_type")
+            filters = parse_filters(request.form)
 
             if recommendation_type == "user_id":
                 user_id_str = request.form.get("UserID")
                 if user_id_str: # Check if UserID was provided
                     user_id = int(user_id_str)
-                    logger.info(f"Received request for hybrid recommendation for User ID: {user_id}")
-                    recommendations = predict_anime_hybrid(user_id)
+                    logger.info("Received request for hybrid recommendation for User ID: %s", user_id)
+                    recommendations, source = recommend(
+                        "user", user_id, filters,
+                        lambda deadline: predict_anime_hybrid(user_id, filters=filters, deadline=deadline, diversity=diversity))
                     # Change the result title here
                     result_title = "Anime Recommendations from User" 
                 else:
@@ -32,8 +179,14 @@ def home():
             elif recommendation_type == "anime_name":
                 anime_name = request.form.get("AnimeName")
                 if anime_name: # Check if AnimeName was provided
-                    logger.info(f"Received request for content-based recommendation for Anime: {anime_name}")
-                    recommendations = predict_similar_anime(anime_name)
+                    logger.info("Received request for content-based recommendation for Anime: %s", anime_name)
+                    if trending is not None and app_state.is_ready():
+                        anime_id = anime_id_for_name(anime_name)
+                        if anime_id is not None:
+                            trending.publish({"anime_id": anime_id, "event": "view"})
+                    recommendations, source = recommend(
+                        "anime", anime_name, filters,
+                        lambda deadline: predict_similar_anime(anime_name, filters=filters, deadline=deadline, diversity=diversity))
                     result_title = f"Anime Similar to '{anime_name}'"
                 else:
                     logger.warning("Anime Name form submitted but AnimeName field was empty.")
@@ -44,8 +197,15 @@ def home():
 
         except ValueError:
              logger.error(f"Invalid input received. Could not convert User ID to integer.", exc_info=True)
-             error_message = "Invalid User ID provided."
+             error_message = "Invalid User ID or filter value provided."
              recommendations = [] # Ensure recommendations is an empty list on error
+        except ServiceUnavailable as e:
+            logger.warning(f"Shedding recommendation request ({e.reason}): no cached or fallback result.")
+            return jsonify({
+                'recommendations': [],
+                'result_title': result_title,
+                'error': "The server is busy, please try again shortly."
+            }), 503, {'Retry-After': str(e.retry_after)}
         except CustomException as e:
             logger.error(f"CustomException occurred during prediction: {e}", exc_info=True)
             error_message = "An error occurred while generating recommendations."
@@ -59,7 +219,8 @@ def home():
         return jsonify({
             'recommendations': recommendations,
             'result_title': result_title,
-            'error': error_message
+            'error': error_message,
+            'source': source
         })
 
     # Handle GET request: Render the initial page
@@ -0,0 +1,83 @@
+"""
+Diversity Benchmark
+
+Measures the latency of MMR re-ranking (`utils.diversity.mmr`) for each shortlist size,
+on random unit-norm embeddings with cosine relevance to a random query. Each selection
+is checked against a straightforward MMR that rescans every selected item at each step.
+
+Usage:
+    python -m benchmarks.bench_diversity --candidates 100 500 2000 --k 10
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from benchmarks.run_benchmarks import summarize
+from src.logger import get_logger
+from utils.diversity import mmr
+
+logger = get_logger(__name__)
+
+
+def reference_mmr(relevance, embeddings, k, lambda_):
+    """MMR recomputing each candidate's similarity to every selected item at every step."""
+    selected = []
+    remaining = list(range(len(relevance)))
+    while remaining and len(selected) < k:
+        best, best_score = None, -np.inf
+        for candidate in remaining:
+            redundancy = max((float(embeddings[candidate] @ embeddings[chosen]) for chosen in selected), default=0.0)
+            score = lambda_ * relevance[candidate] - (1 - lambda_) * redundancy
+            if score > best_score:
+                best, best_score = candidate, score
+        selected.append(best)
+        remaining.remove(best)
+    return np.array(selected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MMR diversity re-ranking.")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embedding-size", type=int, default=128)
+    parser.add_argument("--lambda", dest="lambda_", type=float, default=0.7)
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    for n_candidates in args.candidates:
+        embeddings = rng.standard_normal((n_candidates, args.embedding_size)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        query = embeddings[0] + 0.1 * rng.standard_normal(args.embedding_size).astype(np.float32)
+        relevance = embeddings @ (query / np.linalg.norm(query))
+
+        latencies = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            selected = mmr(relevance, embeddings, args.k, args.lambda_)
+            latencies.append(time.perf_counter() - start)
+        summary = summarize(latencies)
+        summary["matches_reference"] = bool(np.array_equal(selected, reference_mmr(relevance, embeddings, args.k,
+                                                                                   args.lambda_)))
+        results[f"mmr_{n_candidates}_to_{args.k}"] = summary
+        logger.info(f"{n_candidates} -> {args.k}: p50 {summary['p50_ms']:.3f} ms, "
+                    f"matches reference: {summary['matches_reference']}")
+
+    report = {"meta": {"k": args.k, "embedding_size": args.embedding_size, "lambda": args.lambda_,
+                       "cpus": os.cpu_count()},
+              "benchmarks": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Sharded Search Benchmark
+
+Measures `ShardedUserSearch` throughput and latency for 1, 2 and 4 shards on random
+unit-norm user embeddings, and checks every configuration returns the same neighbours as
+a single in-process search.
+
+Usage:
+    python -m benchmarks.bench_sharded_search --users 200000 --output sharded.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import joblib
+import numpy as np
+from benchmarks.run_benchmarks import summarize
+from benchmarks.synthetic_data import write_random_embeddings
+from src.logger import get_logger
+from utils.sharded_search import ShardedUserSearch
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+
+def bench_shards(weights_path, decoded_path, n_shards, queries, k, batch_size):
+    """Runs all queries in batches through `n_shards` shards; returns (summary, first batch results)."""
+    with ShardedUserSearch(n_shards, weights_path, decoded_path) as search:
+        search.search(queries[:batch_size], k=k)
+        latencies, first = [], None
+        start = time.perf_counter()
+        for batch_start in range(0, len(queries), batch_size):
+            batch_time = time.perf_counter()
+            indices, _, _ = search.search(queries[batch_start:batch_start + batch_size], k=k)
+            latencies.append(time.perf_counter() - batch_time)
+            first = indices if first is None else first
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies)
+    summary["batch_size"] = batch_size
+    summary["queries_per_s"] = len(queries) / elapsed
+    return summary, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded user similarity search.")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--embedding-size", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="anime_shards_")
+    paths = write_random_embeddings(workdir, args.users, 1, args.embedding_size, args.seed)
+    decoded_path = os.path.join(workdir, "user2user_decoded.pkl")
+    joblib.dump({i: i + 1 for i in range(args.users)}, decoded_path)
+
+    weights = joblib.load(paths["user_weights"])
+    rng = np.random.default_rng(args.seed)
+    queries = weights[rng.integers(0, args.users, size=args.queries)]
+    expected, _ = row_top_k(queries[:args.batch_size] @ weights.T, args.k)
+    del weights
+
+    results = {}
+    for n_shards in args.shards:
+        summary, first = bench_shards(paths["user_weights"], decoded_path, n_shards, queries, args.k, args.batch_size)
+        summary["matches_single_process"] = bool(np.array_equal(first, expected))
+        results[f"shards_{n_shards}"] = summary
+        logger.info(f"{n_shards} shard(s): {summary['queries_per_s']:.0f} queries/s, p50 batch {summary['p50_ms']:.2f} ms")
+
+    report = {"meta": {"users": args.users, "embedding_size": args.embedding_size, "queries": args.queries,
+                       "k": args.k, "cpus": os.cpu_count()},
+              "benchmarks": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
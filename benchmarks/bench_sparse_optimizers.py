@@ -0,0 +1,101 @@
+"""
+Sparse Optimizer Benchmark
+
+Trains `RecommenderNet` for a few batches with each optimizer (`src/sparse_optimizers.py`)
+at growing `n_users` and reports the step time (p50/p90) and the memory held by the
+optimizer state. Batches are drawn from a power-law distribution over users and anime,
+like real rating data, so each batch touches only a small part of the user table.
+
+With dense Adam both the step time and the state grow with `n_users`. LazyAdam's step
+time grows much more slowly, with the same state as Adam. RowWiseAdagrad grows slowest
+and keeps about `1 / (2 * embedding_size)` of Adam's embedding state.
+
+Usage:
+    python -m benchmarks.bench_sparse_optimizers --users 10000 100000 300000
+    python -m benchmarks.bench_sparse_optimizers --optimizers Adam LazyAdam --steps 50 --output optimizers.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+import numpy as np
+from benchmarks.run_benchmarks import summarize
+from src.base_model import BaseModel
+from src.logger import get_logger
+from src.sparse_optimizers import OPTIMIZERS, optimizer_state_bytes
+from config.paths_config import *
+from utils.common_functions import read_yaml
+
+logger = get_logger(__name__)
+
+
+def power_law_ids(rng, n, size, exponent=1.1):
+    """`size` ids in [0, n) with Zipf-like frequencies."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def bench_optimizer(config, optimizer, n_users, n_anime, batch_size, steps, warmup, seed):
+    """Step-time summary and optimizer state memory of one optimizer at one table size."""
+    config = copy.deepcopy(config)
+    config["model"]["optimizer"] = optimizer
+    model = BaseModel(config_path=CONFIG_PATH, config=config).RecommenderNet(n_users, n_anime)
+
+    rng = np.random.default_rng(seed)
+    batches = [([power_law_ids(rng, n_users, batch_size), power_law_ids(rng, n_anime, batch_size)],
+                rng.random(batch_size).astype(np.float32)) for _ in range(min(steps, 10))]
+
+    for step in range(warmup):
+        model.train_on_batch(*batches[step % len(batches)])
+    latencies = []
+    for step in range(steps):
+        start = time.perf_counter()
+        model.train_on_batch(*batches[step % len(batches)])
+        latencies.append(time.perf_counter() - start)
+
+    summary = summarize(latencies)
+    summary.update({"optimizer_state_mb": optimizer_state_bytes(model.optimizer) / 2**20,
+                    "rows_touched_per_batch": int(len(np.unique(batches[0][0][0])))})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense and sparse optimizers as n_users grows.")
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--anime", type=int, default=17_000)
+    parser.add_argument("--optimizers", nargs="+", default=list(OPTIMIZERS), choices=OPTIMIZERS)
+    parser.add_argument("--batch-size", type=int, help="Default: training.batch_size from config.yaml.")
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    config = read_yaml(CONFIG_PATH)
+    batch_size = args.batch_size or config["training"]["batch_size"]
+
+    results = {}
+    for n_users in args.users:
+        for optimizer in args.optimizers:
+            summary = bench_optimizer(config, optimizer, n_users, args.anime, batch_size,
+                                      args.steps, args.warmup, args.seed)
+            results[f"{optimizer}_{n_users}"] = summary
+            logger.info(f"{optimizer} n_users={n_users}: step p50 {summary['p50_ms']:.1f} ms, "
+                        f"state {summary['optimizer_state_mb']:.1f} MB")
+
+    report = {"meta": {"users": args.users, "anime": args.anime, "batch_size": batch_size,
+                       "embedding_size": config["model"]["embedding_size"], "steps": args.steps,
+                       "cpus": os.cpu_count()},
+              "benchmarks": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Hybrid Equivalence Check
+
+Runs the integer-index `hybrid_recommendation` and `hybrid_recommendation_by_name` side
+by side on a synthetic fixture dataset and fails if any user's recommendations differ.
+`hybrid_recommendation_by_name` and its user-based stage `user_based_recommendations_by_name`
+are the previous name-based implementation, kept here as the reference; they are not part
+of the serving code. Synthetic titles are unique, so both
+implementations must agree exactly; they only diverge on duplicate titles, which the
+name-based path conflates.
+
+Usage:
+    python -m benchmarks.check_hybrid_equivalence --scale tiny
+    python -m benchmarks.check_hybrid_equivalence --workdir /tmp/fixture --users 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_data import SCALES, artifact_paths_for, build_artifacts
+from src.logger import get_logger
+from utils.app_state import app_state
+from utils.helpers import (candidate_mask, encoded_anime_names, find_similar_anime, find_similar_user, getAnimeFrame,
+                           get_user_preferences, hybrid_recommendation)
+
+logger = get_logger(__name__)
+
+# Each user is checked without filters and with each of these.
+FILTER_CASES = [
+    None,
+    {"include_genres": ["Action", "Sci-Fi"], "exclude_genres": ["Hentai"]},
+    {"types": ["TV"], "min_episodes": 12, "max_year": 2010},
+]
+
+
+def user_based_recommendations_by_name(similar_users_df, user_preferences_df, anime_df, ratings_df, n=5, allowed_names=None):
+    """Reference user-based stage: titles most often preferred by the similar users, by name."""
+    if similar_users_df is None or similar_users_df.empty:
+        return []
+    anime_list = []
+    for user_id in similar_users_df["similar_users"].values:
+        sim_user_prefs_df = get_user_preferences(int(user_id), ratings_df, anime_df)
+        if sim_user_prefs_df.empty:
+            continue
+        unwatched = sim_user_prefs_df[~sim_user_prefs_df["eng_version"].isin(user_preferences_df["eng_version"].values)]
+        if allowed_names is not None:
+            unwatched = unwatched[unwatched["eng_version"].isin(allowed_names)]
+        anime_list.extend(unwatched["eng_version"].tolist())
+    if not anime_list:
+        return []
+
+    recommendations = []
+    for anime_name in pd.Series(anime_list).value_counts().head(n * 2).index:
+        if len(recommendations) >= n:
+            break
+        if isinstance(anime_name, str) and not getAnimeFrame(anime_name, anime_df).empty:
+            recommendations.append(anime_name)
+    return recommendations
+
+
+def hybrid_recommendation_by_name(user_id, ratings_df, anime_df, user_weight=0.5, content_weight=0.5, n=5, filters=None):
+    """Reference hybrid recommender working on anime names and dataframes, as served before."""
+    synopsis_df = app_state.synopsis_df
+    allowed = candidate_mask(filters)
+    allowed_names = encoded_anime_names()[allowed] if allowed is not None else None
+
+    # User-based component: the preferences of similar users.
+    similar_users = find_similar_user(user_id, n=20)
+    user_preferences = get_user_preferences(user_id, ratings_df, anime_df)
+    user_rec_list = user_based_recommendations_by_name(similar_users, user_preferences, anime_df, ratings_df, n=n * 2,
+                                                       allowed_names=allowed_names)
+
+    # Content-based component: anime similar to the user's own top preferences.
+    content_recommended_anime_list = []
+    if not user_preferences.empty:
+        for anime_name_pref in user_preferences["eng_version"].head(n).tolist():
+            similar_animes_df = find_similar_anime(anime_name_pref, anime_df, synopsis_df, n=n, filters=filters)
+            if similar_animes_df is not None and not similar_animes_df.empty:
+                content_recommended_anime_list.extend(similar_animes_df[
+                    ~similar_animes_df["name"].isin(user_preferences["eng_version"].values)
+                ]["name"].tolist())
+        content_recommended_anime_list = list(pd.Series(content_recommended_anime_list).unique())
+
+    combined_scores = {}
+    for anime_name in user_rec_list:
+        combined_scores[anime_name] = combined_scores.get(anime_name, 0) + user_weight
+    for anime_name in content_recommended_anime_list:
+        combined_scores[anime_name] = combined_scores.get(anime_name, 0) + content_weight
+    animes_to_exclude = set(user_preferences["eng_version"].values)
+    final_scores = {anime: score for anime, score in combined_scores.items() if anime not in animes_to_exclude}
+
+    sorted_animes = sorted(final_scores.items(), key=lambda item: item[1], reverse=True)
+    return [anime_name for anime_name, score in sorted_animes[:n]]
+
+
+def check_users(user_ids, filter_cases=FILTER_CASES):
+    """Compares both implementations for every user and filter case; returns (mismatches, timings)."""
+    anime_df, rating_df = app_state.anime_df, app_state.rating_df
+    mismatches = []
+    timings = {"by_index": 0.0, "by_name": 0.0}
+    for user_id in user_ids:
+        for filters in filter_cases:
+            start = time.perf_counter()
+            by_index = hybrid_recommendation(user_id, filters=filters)
+            timings["by_index"] += time.perf_counter() - start
+            start = time.perf_counter()
+            by_name = hybrid_recommendation_by_name(user_id, rating_df, anime_df, filters=filters)
+            timings["by_name"] += time.perf_counter() - start
+            if by_index != by_name:
+                mismatches.append({"user_id": user_id, "filters": filters, "by_index": by_index, "by_name": by_name})
+    return mismatches, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the integer-index hybrid recommender against the name-based one.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="tiny")
+    parser.add_argument("--workdir", help="Reuse (or create) fixture artifacts here instead of a temporary directory.")
+    parser.add_argument("--users", type=int, default=100, help="Number of users to check.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="anime_hybrid_check_")
+    if not os.path.exists(os.path.join(workdir, "processed", "rating_df.csv")):
+        n_users, n_anime, mean_ratings = SCALES[args.scale]
+        build_artifacts(workdir, n_users, n_anime, mean_ratings, seed=args.seed)
+    app_state.reset(artifact_paths_for(workdir))
+    app_state.load()
+
+    rng = np.random.default_rng(args.seed)
+    user_ids = app_state.rating_df["user_id"].unique()
+    user_ids = [int(user) for user in rng.choice(user_ids, size=min(args.users, len(user_ids)), replace=False)]
+    mismatches, timings = check_users(user_ids)
+
+    checks = len(user_ids) * len(FILTER_CASES)
+    print(f"Checked {checks} recommendations for {len(user_ids)} users: {len(mismatches)} mismatches.")
+    print(f"by_index: {timings['by_index'] / checks * 1e3:.2f} ms/call, by_name: {timings['by_name'] / checks * 1e3:.2f} ms/call")
+    for mismatch in mismatches[:10]:
+        print(mismatch, file=sys.stderr)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Single-Flight Check
+
+Concurrency test for request coalescing in `app.py`. It starts `--threads` threads
+behind a barrier, and each posts the same recommendation request to the Flask app. The
+title's case varies between threads, but it is the same title after normalization. The
+recommendation function is wrapped to count its calls and sleep `--delay-ms`, so all
+requests overlap. The check fails unless exactly one computation ran and every thread
+got the same recommendations. It then runs the same for a user ID, and finally with
+distinct titles, which must not be coalesced.
+
+Usage:
+    python -m benchmarks.check_single_flight --threads 32
+    python -m benchmarks.check_single_flight --workdir /tmp/fixture --delay-ms 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.synthetic_data import SCALES, artifact_paths_for, build_artifacts
+from src.logger import get_logger
+from utils.app_state import app_state
+
+logger = get_logger(__name__)
+
+
+class CountingWrapper:
+    """Wraps a function, counting calls and delaying each so concurrent requests overlap."""
+
+    def __init__(self, fn, delay_s):
+        self.fn = fn
+        self.delay_s = delay_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay_s)
+        return self.fn(*args, **kwargs)
+
+
+def post_concurrently(client, forms):
+    """Posts every form from its own thread, all released at once; returns the JSON responses in order."""
+    barrier = threading.Barrier(len(forms))
+    responses = [None] * len(forms)
+
+    def post(i):
+        barrier.wait()
+        responses[i] = client.post("/", data=forms[i]).get_json()
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(len(forms))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def run_case(name, client, wrapper, forms, expected_calls):
+    wrapper.calls = 0
+    start = time.perf_counter()
+    responses = post_concurrently(client, forms)
+    elapsed = time.perf_counter() - start
+    distinct = {tuple(response["recommendations"] or []) for response in responses}
+    ok = wrapper.calls == expected_calls and (expected_calls > 1 or len(distinct) == 1)
+    print(f"{name}: {len(forms)} requests, {wrapper.calls} computations (expected {expected_calls}), "
+          f"{len(distinct)} distinct results, {elapsed * 1e3:.0f} ms -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that concurrent identical requests share one computation.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="tiny")
+    parser.add_argument("--workdir", help="Reuse (or create) fixture artifacts here instead of a temporary directory.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--delay-ms", type=float, default=100.0, help="Added to each computation so requests overlap.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="anime_single_flight_check_")
+    if not os.path.exists(os.path.join(workdir, "processed", "rating_df.csv")):
+        n_users, n_anime, mean_ratings = SCALES[args.scale]
+        build_artifacts(workdir, n_users, n_anime, mean_ratings, seed=args.seed)
+    app_state.reset(artifact_paths_for(workdir))
+
+    # Imported after the state points at the fixture; app.py starts loading on import.
+    import app as serving
+    import pipeline.prediction_pipeline as prediction_pipeline
+
+    serving.app_state.wait_until_ready(120)
+    # Coalescing, not admission control, is under test here.
+    serving.admission.controller.__init__(max_in_flight=args.threads, max_queue=args.threads, queue_timeout_s=5.0)
+    serving.admission.timeout_s = 60.0
+    client = serving.app.test_client()
+    delay_s = args.delay_ms / 1e3
+
+    titles = app_state.anime_df.sort_values("Members", ascending=False)["eng_version"].dropna().tolist()
+    user_id = int(app_state.rating_df["user_id"].iloc[0])
+    similar = CountingWrapper(prediction_pipeline.get_content_based_recommendations_for_anime, delay_s)
+    hybrid = CountingWrapper(prediction_pipeline.hybrid_recommendation, delay_s)
+    prediction_pipeline.get_content_based_recommendations_for_anime = similar
+    prediction_pipeline.hybrid_recommendation = hybrid
+
+    title_forms = [{"recommendation_type": "anime_name",
+                    "AnimeName": titles[0].upper() if i % 2 else titles[0].lower()} for i in range(args.threads)]
+    user_forms = [{"recommendation_type": "user_id", "UserID": str(user_id)}] * args.threads
+    distinct_forms = [{"recommendation_type": "anime_name", "AnimeName": title} for title in titles[:args.threads]]
+
+    results = [
+        run_case("same title", client, similar, title_forms, expected_calls=1),
+        run_case("same user", client, hybrid, user_forms, expected_calls=1),
+        run_case("distinct titles", client, similar, distinct_forms, expected_calls=len(distinct_forms)),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Embedding Compression Report
+
+Compares exact nearest-neighbour search on the full embeddings with the two-stage search
+on compressed ones (`src/embedding_compression.py`) for every method and dimension:
+recall@k against the exact neighbours, per-query latency of both searches and the memory
+of the matrix each first pass scans.
+
+Random embeddings have no structure for PCA to keep, so by default the synthetic
+embeddings are drawn from a low-rank subspace plus noise (`--intrinsic-dim`), which is
+closer to what a trained embedding layer looks like. Pass `--weights` to report on a
+real `user_weights.pkl` / `anime_weights.pkl` instead.
+
+Usage:
+    python -m benchmarks.compression_report --rows 50000 --dims 16 32 64
+    python -m benchmarks.compression_report --weights artifacts/model/weights/anime_weights.pkl
+"""
+
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+from benchmarks.run_benchmarks import summarize
+from src.embedding_compression import METHODS, EmbeddingCompressor, two_stage_top_k
+from src.logger import get_logger
+from src.numpy_inference import l2_normalize
+from utils.topk import top_k
+
+logger = get_logger(__name__)
+
+
+def low_rank_embeddings(rows, embedding_size, intrinsic_dim, noise, seed):
+    """Unit-norm embeddings lying close to a random `intrinsic_dim`-dimensional subspace."""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((intrinsic_dim, embedding_size)).astype(np.float32)
+    weights = rng.standard_normal((rows, intrinsic_dim)).astype(np.float32) @ basis
+    weights += noise * np.sqrt(intrinsic_dim) * rng.standard_normal((rows, embedding_size)).astype(np.float32)
+    return l2_normalize(weights)
+
+
+def exact_top_k(weights, query_index, k):
+    scores = weights @ weights[query_index]
+    scores[query_index] = -np.inf
+    return top_k(scores, k)
+
+
+def report_config(weights, queries, expected, method, dim, k, shortlist, seed):
+    """Recall, latency and memory of the two-stage search for one method and dimension."""
+    compressor = EmbeddingCompressor({"method": method, "dim": dim, "shortlist": shortlist, "random_state": seed})
+    start = time.perf_counter()
+    reduced = compressor.fit_transform(weights)
+    fit_s = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query_index, exact in zip(queries, expected):
+        query_time = time.perf_counter()
+        candidates, _ = two_stage_top_k(weights, reduced, query_index, k, shortlist)
+        latencies.append(time.perf_counter() - query_time)
+        hits += len(np.intersect1d(candidates, exact))
+
+    summary = summarize(latencies)
+    summary.update({"recall_at_k": hits / (len(queries) * k), "fit_s": fit_s,
+                    "first_pass_mb": reduced.nbytes / 2**20})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report recall and latency of compressed embedding search.")
+    parser.add_argument("--weights", help="Embedding matrix .pkl to compress (default: synthetic low-rank embeddings).")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--embedding-size", type=int, default=128)
+    parser.add_argument("--intrinsic-dim", type=int, default=24)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--dims", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--shortlist", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    if args.weights:
+        weights = np.asarray(joblib.load(args.weights), dtype=np.float32)
+    else:
+        weights = low_rank_embeddings(args.rows, args.embedding_size, args.intrinsic_dim, args.noise, args.seed)
+    queries = np.random.default_rng(args.seed).choice(len(weights), size=min(args.queries, len(weights)), replace=False)
+
+    latencies, expected = [], []
+    for query_index in queries:
+        query_time = time.perf_counter()
+        expected.append(exact_top_k(weights, query_index, args.k))
+        latencies.append(time.perf_counter() - query_time)
+    results = {"exact": summarize(latencies)}
+    results["exact"].update({"recall_at_k": 1.0, "first_pass_mb": weights.nbytes / 2**20})
+    logger.info(f"exact: p50 {results['exact']['p50_ms']:.3f} ms, {results['exact']['first_pass_mb']:.1f} MB")
+
+    for method in args.methods:
+        for dim in args.dims:
+            summary = report_config(weights, queries, expected, method, dim, args.k, args.shortlist, args.seed)
+            results[f"{method}_{dim}"] = summary
+            logger.info(f"{method} {dim}-d: recall@{args.k} {summary['recall_at_k']:.3f}, "
+                        f"p50 {summary['p50_ms']:.3f} ms, {summary['first_pass_mb']:.1f} MB")
+
+    report = {"meta": {"rows": len(weights), "embedding_size": weights.shape[1], "k": args.k,
+                       "shortlist": args.shortlist, "queries": len(queries), "weights": args.weights,
+                       "cpus": os.cpu_count()},
+              "benchmarks": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
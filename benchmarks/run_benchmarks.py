@@ -0,0 +1,203 @@
+"""
+Benchmark Runner
+
+Runs the data processing stages and the serving functions against a synthetic dataset
+and writes latency percentiles, throughput and peak RSS as JSON, so two runs can be
+compared for regressions.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scale small --output bench.json
+    python -m benchmarks.run_benchmarks --scale small --baseline bench.json --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from benchmarks.synthetic_data import SCALES, artifact_paths_for, generate_raw_dataset, write_random_embeddings
+from src.data_processing import DataProcessor
+from src.knn_graph import KnnGraphBuilder
+from src.logger import get_logger
+from utils.app_state import app_state
+from utils.helpers import find_similar_anime, find_similar_user, get_user_preferences
+from pipeline.prediction_pipeline import (predict_also_liked_anime, predict_anime_hybrid, predict_similar_anime,
+                                          predict_similar_synopsis, predict_top_rated_anime)
+
+logger = get_logger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds plus single-threaded throughput."""
+    latencies = np.asarray(latencies)
+    return {
+        "calls": int(len(latencies)),
+        "mean_ms": float(latencies.mean() * 1e3),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p90_ms": float(np.percentile(latencies, 90) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "max_ms": float(latencies.max() * 1e3),
+        "throughput_per_s": float(len(latencies) / latencies.sum()) if latencies.sum() > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(func, inputs, warmup=3):
+    """Calls `func` once per input after a few warm-up calls and summarizes the latencies."""
+    for value in inputs[:warmup]:
+        func(value)
+    latencies = []
+    for value in inputs:
+        start = time.perf_counter()
+        func(value)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_data_processing(raw_paths, output_dir):
+    """Times each DataProcessor stage once; returns (results, processor)."""
+    processor = DataProcessor(raw_paths["animelist"], output_dir,
+                              anime_file=raw_paths["anime"], synopsis_file=raw_paths["synopsis"])
+    stages = ["load_data", "filter_users", "scale_rating", "encode_data", "split_data",
+              "save_artifacts", "build_item_cooccurrence", "process_anime_data", "build_popularity_tables"]
+    results = {}
+    for stage in stages:
+        start = time.perf_counter()
+        getattr(processor, stage)()
+        results[f"data_processing.{stage}"] = {"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}
+    return results, processor
+
+
+def bench_knn_graph(weights_dir, output_dir, config=None):
+    """Times the offline user and anime neighbour graph build."""
+    start = time.perf_counter()
+    KnnGraphBuilder(config or {}).run(os.path.join(weights_dir, "user_weights.pkl"),
+                                      os.path.join(weights_dir, "anime_weights.pkl"), output_dir)
+    return {"knn_graph.build": {"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}}
+
+
+def bench_serving(artifact_paths, iterations, seed):
+    """Benchmarks the serving functions against the given artifacts."""
+    app_state.reset(artifact_paths)
+    start = time.perf_counter()
+    app_state.load()
+    results = {"serving.artifact_load": {"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}}
+
+    rng = np.random.default_rng(seed)
+    anime_df, rating_df, synopsis_df = app_state.anime_df, app_state.rating_df, app_state.synopsis_df
+    names = anime_df["eng_version"].dropna().values
+    names = list(rng.choice(names, size=iterations))
+    users = [int(user) for user in rng.choice(rating_df["user_id"].unique(), size=iterations)]
+
+    results["find_similar_anime"] = measure(lambda name: find_similar_anime(name, anime_df, synopsis_df, n=10), names)
+    results["find_similar_user"] = measure(lambda user: find_similar_user(user, n=20), users)
+    results["get_user_preferences"] = measure(lambda user: get_user_preferences(user, rating_df, anime_df), users)
+    results["predict_similar_anime"] = measure(predict_similar_anime, names)
+    results["predict_similar_synopsis"] = measure(predict_similar_synopsis, names)
+    results["predict_also_liked_anime"] = measure(predict_also_liked_anime, names)
+    results["predict_anime_hybrid"] = measure(predict_anime_hybrid, users)
+    results["predict_top_rated_anime"] = measure(predict_top_rated_anime, users)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns benchmarks whose p50 latency (or stage seconds) regressed by more than `tolerance`."""
+    regressions = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        key = "p50_ms" if "p50_ms" in current else "seconds"
+        if previous.get(key):
+            ratio = current[key] / previous[key]
+            if ratio > 1 + tolerance:
+                regressions[name] = {"metric": key, "baseline": previous[key], "current": current[key], "ratio": ratio}
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the recommendation benchmarks on a synthetic dataset.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int, help="Override the number of users for the scale.")
+    parser.add_argument("--anime", type=int, help="Override the number of anime for the scale.")
+    parser.add_argument("--iterations", type=int, default=50, help="Calls per serving benchmark.")
+    parser.add_argument("--embedding-size", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Directory for generated data (default: a temporary directory).")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    parser.add_argument("--baseline", help="Results JSON to compare against.")
+    parser.add_argument("--skip-knn", action="store_true", help="Serve without precomputed neighbour graphs.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before flagging a regression.")
+    args = parser.parse_args()
+
+    n_users, n_anime, mean_ratings = SCALES[args.scale]
+    n_users, n_anime = args.users or n_users, args.anime or n_anime
+    workdir = args.workdir or tempfile.mkdtemp(prefix="anime_bench_")
+
+    raw_paths = generate_raw_dataset(os.path.join(workdir, "raw"), n_users, n_anime, mean_ratings, args.seed)
+    processed_dir = os.path.join(workdir, "processed")
+    results, processor = bench_data_processing(raw_paths, processed_dir)
+
+    write_random_embeddings(os.path.join(workdir, "model", "weights"), len(processor.user2user_encoded),
+                            len(processor.anime2anime_encoded), args.embedding_size, args.seed)
+    if not args.skip_knn:
+        results.update(bench_knn_graph(os.path.join(workdir, "model", "weights"), os.path.join(workdir, "model", "knn")))
+    results.update(bench_serving(artifact_paths_for(workdir), args.iterations, args.seed))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "n_users": n_users,
+            "n_anime": n_anime,
+            "n_ratings": int(len(processor.rating_df)),
+            "iterations": args.iterations,
+            "embedding_size": args.embedding_size,
+        },
+        "benchmarks": results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["benchmarks"]
+        report["regressions"] = compare(results, baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+        logger.info(f"Benchmark results written to {args.output}")
+    else:
+        print(output)
+
+    if report.get("regressions"):
+        print(f"Regressions beyond {args.tolerance:.0%}: {sorted(report['regressions'])}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Synthetic Dataset Generator
+
+Generates `animelist.csv`, `anime.csv` and `anime_with_synopsis.csv` with the same
+columns the pipeline reads from the real Kaggle dataset, at any scale. User activity
+and anime popularity both follow power laws: most users rate a few dozen titles while a
+long tail rates thousands, and a small head of titles collects most of the ratings.
+
+`build_artifacts` additionally runs `DataProcessor` on the generated files and writes
+random unit-norm embeddings in place of trained weights, producing a complete artifact
+set that `AppState` can serve from without TensorFlow.
+"""
+
+import argparse
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from src.data_processing import DataProcessor
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Sci-Fi", "Romance", "Slice of Life",
+          "Mystery", "Supernatural", "Mecha", "Sports", "School", "Shounen", "Seinen", "Shoujo",
+          "Horror", "Psychological", "Music", "Historical", "Military", "Hentai"]
+TYPES = ["TV", "Movie", "OVA", "ONA", "Special", "Music"]
+SEASONS = ["Winter", "Spring", "Summer", "Fall"]
+WORDS = ["hero", "journey", "school", "battle", "love", "friend", "secret", "world", "power", "city",
+         "dream", "family", "magic", "robot", "war", "team", "mystery", "future", "past", "demon"]
+
+# Named scales for the benchmark CLI: (n_users, n_anime, mean ratings per user).
+SCALES = {
+    "tiny": (500, 400, 80),
+    "small": (5_000, 2_000, 120),
+    "medium": (30_000, 8_000, 150),
+    "large": (150_000, 17_000, 200),
+}
+
+
+def _power_law_counts(rng, n, mean, minimum, maximum, exponent=1.6):
+    """Draws `n` integer counts from a truncated Pareto distribution with roughly the given mean."""
+    raw = rng.pareto(exponent, size=n) + 1
+    counts = raw / raw.mean() * mean
+    return np.clip(counts, minimum, maximum).astype(np.int64)
+
+
+def generate_anime(rng, n_anime):
+    """Returns (anime_df, synopsis_df) shaped like `anime.csv` and `anime_with_synopsis.csv`."""
+    anime_ids = np.sort(rng.choice(np.arange(1, n_anime * 3), size=n_anime, replace=False))
+    n_genres = rng.integers(1, 5, size=n_anime)
+    genres = [", ".join(sorted(rng.choice(GENRES, size=k, replace=False))) for k in n_genres]
+    names = [f"{WORDS[i % len(WORDS)].title()} {WORDS[(i // len(WORDS)) % len(WORDS)].title()} {anime_id}"
+             for i, anime_id in enumerate(anime_ids)]
+    # Roughly a third of titles have no English name, like the real data.
+    english = np.where(rng.random(n_anime) < 0.35, "Unknown", [f"The {name}" for name in names])
+    scores = np.round(np.clip(rng.normal(6.8, 0.9, size=n_anime), 1.0, 9.9), 2).astype(str)
+    scores[rng.random(n_anime) < 0.1] = "Unknown"
+    members = (rng.pareto(1.2, size=n_anime) * 2000).astype(np.int64) + 10
+    episodes = np.where(rng.random(n_anime) < 0.05, "Unknown", rng.integers(1, 60, size=n_anime).astype(str))
+    premiered = [f"{rng.choice(SEASONS)} {year}" if rng.random() < 0.6 else "Unknown"
+                 for year in rng.integers(1970, 2021, size=n_anime)]
+
+    anime_df = pd.DataFrame({
+        "MAL_ID": anime_ids,
+        "Name": names,
+        "Score": scores,
+        "Genres": genres,
+        "English name": english,
+        "Japanese name": "Unknown",
+        "Type": rng.choice(TYPES, size=n_anime, p=[0.4, 0.2, 0.15, 0.1, 0.1, 0.05]),
+        "Episodes": episodes,
+        "Premiered": premiered,
+        "Members": members,
+        "Favorites": (members * rng.random(n_anime) * 0.05).astype(np.int64),
+    })
+    synopsis_df = pd.DataFrame({
+        "MAL_ID": anime_ids,
+        "Name": names,
+        "Score": scores,
+        "Genres": genres,
+        "sypnopsis": [" ".join(rng.choice(WORDS, size=rng.integers(20, 60))) for _ in range(n_anime)],
+    })
+    return anime_df, synopsis_df
+
+
+def generate_ratings(rng, n_users, anime_ids, mean_ratings_per_user):
+    """Returns a ratings frame shaped like `animelist.csv` with power-law user activity and item popularity."""
+    n_anime = len(anime_ids)
+    counts = _power_law_counts(rng, n_users, mean_ratings_per_user, minimum=5, maximum=n_anime // 2)
+    popularity = 1.0 / np.arange(1, n_anime + 1) ** 0.9
+    popularity = popularity[rng.permutation(n_anime)]
+    popularity /= popularity.sum()
+
+    # Oversample with replacement, then drop repeated (user, anime) pairs.
+    users = np.repeat(np.arange(n_users, dtype=np.int64), counts)
+    items = rng.choice(n_anime, size=len(users), p=popularity)
+    pairs = np.unique(users * n_anime + items)
+    users, items = pairs // n_anime, pairs % n_anime
+
+    # Per-user rating bias so percentiles differ across users; 0 means "watched, not rated".
+    bias = rng.normal(0, 1.5, size=n_users)
+    ratings = np.clip(np.round(rng.normal(7, 2, size=len(users)) + bias[users]), 0, 10).astype(np.int64)
+    return pd.DataFrame({
+        "user_id": users,
+        "anime_id": anime_ids[items],
+        "rating": ratings,
+        "watching_status": rng.integers(1, 7, size=len(users)),
+        "watched_episodes": rng.integers(0, 30, size=len(users)),
+    })
+
+
+def generate_raw_dataset(raw_dir, n_users, n_anime, mean_ratings_per_user=120, seed=42):
+    """Writes the three raw CSVs to `raw_dir` and returns their paths."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(raw_dir, exist_ok=True)
+    anime_df, synopsis_df = generate_anime(rng, n_anime)
+    rating_df = generate_ratings(rng, n_users, anime_df["MAL_ID"].values, mean_ratings_per_user)
+
+    paths = {
+        "animelist": os.path.join(raw_dir, "animelist.csv"),
+        "anime": os.path.join(raw_dir, "anime.csv"),
+        "synopsis": os.path.join(raw_dir, "anime_with_synopsis.csv"),
+    }
+    rating_df.to_csv(paths["animelist"], index=False)
+    anime_df.to_csv(paths["anime"], index=False)
+    synopsis_df.to_csv(paths["synopsis"], index=False)
+    logger.info(f"Synthetic dataset written to {raw_dir}: {n_users} users, {n_anime} anime, {len(rating_df)} ratings.")
+    return paths
+
+
+def write_random_embeddings(weights_dir, n_users, n_anime, embedding_size=128, seed=42):
+    """Writes unit-norm random user/anime embeddings and an identity recommender head in place of a trained model."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(weights_dir, exist_ok=True)
+    paths = {}
+    for name, n in (("user_weights", n_users), ("anime_weights", n_anime)):
+        weights = rng.normal(size=(n, embedding_size)).astype(np.float32)
+        weights /= np.linalg.norm(weights, axis=1, keepdims=True)
+        paths[name] = os.path.join(weights_dir, f"{name}.pkl")
+        joblib.dump(weights, paths[name])
+
+    paths["recommender_head"] = os.path.join(weights_dir, "recommender_head.pkl")
+    joblib.dump({"dense_kernel": 1.0, "dense_bias": 0.0, "bn_gamma": 1.0, "bn_beta": 0.0,
+                 "bn_moving_mean": 0.0, "bn_moving_variance": 1.0, "bn_epsilon": 0.001}, paths["recommender_head"])
+    return paths
+
+
+def artifact_paths_for(root_dir):
+    """Mapping of artifact name to path under `root_dir`, in the shape `AppState` expects."""
+    processed_dir = os.path.join(root_dir, "processed")
+    weights_dir = os.path.join(root_dir, "model", "weights")
+    paths = {
+        "anime_df": os.path.join(processed_dir, "anime_df.csv"),
+        "rating_df": os.path.join(processed_dir, "rating_df.csv"),
+        "synopsis_df": os.path.join(processed_dir, "synopsis_df.csv"),
+        "item_cooccurrence": os.path.join(processed_dir, "item_cooccurrence.pkl"),
+        "synopsis_index": os.path.join(processed_dir, "synopsis_index.pkl"),
+        "popularity": os.path.join(processed_dir, "popularity_tables.pkl"),
+        "anime_weights": os.path.join(weights_dir, "anime_weights.pkl"),
+        "user_weights": os.path.join(weights_dir, "user_weights.pkl"),
+        "recommender_head": os.path.join(weights_dir, "recommender_head.pkl"),
+        "compressed_embeddings": os.path.join(weights_dir, "compressed_embeddings.pkl"),
+    }
+    for name in ("anime2anime_encoded", "anime2anime_decoded", "user2user_encoded", "user2user_decoded"):
+        paths[name] = os.path.join(processed_dir, f"{name}.pkl")
+    for name in ("user_knn_indices", "user_knn_scores", "anime_knn_indices", "anime_knn_scores"):
+        paths[name] = os.path.join(root_dir, "model", "knn", f"{name}.npy")
+    return paths
+
+
+def build_artifacts(root_dir, n_users, n_anime, mean_ratings_per_user=120, embedding_size=128, seed=42, processor=None):
+    """
+    Generates raw data, processes it and writes embeddings under `root_dir`.
+
+    Returns a mapping of artifact name to path in the shape `AppState` expects.
+    """
+    raw_dir = os.path.join(root_dir, "raw")
+    processed_dir = os.path.join(root_dir, "processed")
+    weights_dir = os.path.join(root_dir, "model", "weights")
+
+    raw_paths = generate_raw_dataset(raw_dir, n_users, n_anime, mean_ratings_per_user, seed)
+    processor = processor or DataProcessor(raw_paths["animelist"], processed_dir,
+                                           anime_file=raw_paths["anime"], synopsis_file=raw_paths["synopsis"])
+    processor.run_data_processing()
+    write_random_embeddings(weights_dir, len(processor.user2user_encoded), len(processor.anime2anime_encoded),
+                            embedding_size, seed)
+    return artifact_paths_for(root_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic anime dataset.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int, help="Override the number of users for the scale.")
+    parser.add_argument("--anime", type=int, help="Override the number of anime for the scale.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--raw-only", action="store_true", help="Only write the raw CSVs.")
+    args = parser.parse_args()
+
+    n_users, n_anime, mean_ratings = SCALES[args.scale]
+    n_users, n_anime = args.users or n_users, args.anime or n_anime
+    if args.raw_only:
+        generate_raw_dataset(os.path.join(args.output_dir, "raw"), n_users, n_anime, mean_ratings, args.seed)
+    else:
+        build_artifacts(args.output_dir, n_users, n_anime, mean_ratings, seed=args.seed)
@@ -4,6 +4,7 @@ import os
 # Define base directory
 BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artifacts")
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config/config.yaml")
+STAGE_MANIFEST_PATH = os.path.join(BASE_DIR, "stage_manifest.json")
 
 ######################### Data Processing ########################
 # Define data directories
@@ -31,6 +32,15 @@ ANIME2ANIME_DECODED_PATH = os.path.join(PROCESSED_DIR, "anime2anime_decoded.pkl"
 USER2USER_ENCODED_PATH = os.path.join(PROCESSED_DIR, "user2user_encoded.pkl")
 USER2USER_DECODED_PATH = os.path.join(PROCESSED_DIR, "user2user_decoded.pkl")
 
+# Define item-item neighbour table path
+ITEM_COOCCURRENCE_PATH = os.path.join(PROCESSED_DIR, "item_cooccurrence.pkl")
+
+# Define synopsis TF-IDF neighbour table path
+SYNOPSIS_INDEX_PATH = os.path.join(PROCESSED_DIR, "synopsis_index.pkl")
+
+# Define popularity fallback tables path
+POPULARITY_TABLES_PATH = os.path.join(PROCESSED_DIR, "popularity_tables.pkl")
+
 ######################### Model Training ########################
 # Define model directories
 MODEL_DIR = os.path.join(BASE_DIR, "model")
@@ -38,5 +48,14 @@ WEIGHTS_DIR = os.path.join(MODEL_DIR, "weights")
 MODEL_FILE_PATH = os.path.join(MODEL_DIR, "model.h5")
 ANIME_WEIGHTS_FILE_PATH = os.path.join(WEIGHTS_DIR, "anime_weights.pkl")
 USER_WEIGHTS_FILE_PATH = os.path.join(WEIGHTS_DIR, "user_weights.pkl")
+RECOMMENDER_HEAD_PATH = os.path.join(WEIGHTS_DIR, "recommender_head.pkl")
+COMPRESSED_EMBEDDINGS_PATH = os.path.join(WEIGHTS_DIR, "compressed_embeddings.pkl")
+KNN_DIR = os.path.join(MODEL_DIR, "knn")
+USER_KNN_INDICES_PATH = os.path.join(KNN_DIR, "user_knn_indices.npy")
+USER_KNN_SCORES_PATH = os.path.join(KNN_DIR, "user_knn_scores.npy")
+ANIME_KNN_INDICES_PATH = os.path.join(KNN_DIR, "anime_knn_indices.npy")
+ANIME_KNN_SCORES_PATH = os.path.join(KNN_DIR, "anime_knn_scores.npy")
 CHECKPOINT_DIR = os.path.join(BASE_DIR, "model_checkpoints")
+SWEEP_DIR = os.path.join(BASE_DIR, "sweeps")
+EXPERIMENT_DIR = os.path.join(BASE_DIR, "experiments")
 CHECKPOINT_FILE_PATH = os.path.join(CHECKPOINT_DIR, "checkpoint.weights.h5")
\ No newline at end of file
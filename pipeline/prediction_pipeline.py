@@ -1,56 +1,95 @@
+import sys
 from config.paths_config import *
 from utils.helpers import *
 from src.logger import get_logger
 from src.custom_exception import CustomException
+from utils.app_state import app_state
+from utils.tracing import traced
+from utils.admission import DeadlineExceeded
 import pandas as pd
 
 logger = get_logger(__name__)
 
-# Load dataframes once
-try:
-    anime_df = pd.read_csv(PROCESSED_ANIME_DF)
-    ratings_df = pd.read_csv(PROCESSED_RATING_DF)
-    synopsis_df = pd.read_csv(PROCESSED_SYNOPSIS_DF) # Load synopsis_df needed for content-based
-    logger.info("DataFrames loaded successfully for prediction pipeline.")
-except FileNotFoundError as e:
-    logger.error(f"Error loading dataframes in prediction pipeline: {e}. Ensure paths are correct and data exists.", exc_info=True)
-    # Handle error appropriately, maybe exit or use placeholder data if applicable
-    anime_df, ratings_df, synopsis_df = None, None, None
-except Exception as e:
-    logger.error(f"Unexpected error loading dataframes: {e}", exc_info=True)
-    anime_df, ratings_df, synopsis_df = None, None, None
-    # Consider raising the exception or handling it based on application needs
-
-
-def predict_anime_hybrid(userID):
-    """Predicts anime using the hybrid recommendation system for a user ID."""
+@traced()
+def predict_anime_hybrid(userID, filters=None, deadline=None, diversity=None):
+    """Predicts anime using the hybrid recommendation system for a user ID, within an optional deadline."""
+    anime_df, ratings_df = app_state.anime_df, app_state.rating_df
     if anime_df is None or ratings_df is None:
          logger.error("Cannot run hybrid prediction: DataFrames not loaded.")
          return []
     try:
-        recommendation = hybrid_recommendation(user_id=userID, ratings_df=ratings_df, anime_df=anime_df, user_weight=0.5, content_weight=0.5)
+        recommendation = hybrid_recommendation(user_id=userID, user_weight=0.5, content_weight=0.5, filters=filters, deadline=deadline, diversity=diversity)
         return recommendation
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error during hybrid prediction for user {userID}: {e}", exc_info=True)
         raise CustomException(e, sys) # Re-raise as CustomException
 
 
-def predict_similar_anime(anime_name):
-    """Predicts similar anime based on content for a given anime name."""
+@traced()
+def predict_similar_anime(anime_name, filters=None, deadline=None, diversity=None):
+    """Predicts similar anime based on content for a given anime name, within an optional deadline."""
+    anime_df, synopsis_df = app_state.anime_df, app_state.synopsis_df
     if anime_df is None or synopsis_df is None:
         logger.error("Cannot run content-based prediction: DataFrames not loaded.")
         return []
     try:
         # Use the new helper function
-        recommendations = get_content_based_recommendations_for_anime(anime_name=anime_name, anime_df=anime_df, synopsis_df=synopsis_df, n=5)
+        recommendations = get_content_based_recommendations_for_anime(anime_name=anime_name, anime_df=anime_df, synopsis_df=synopsis_df, n=5, filters=filters, deadline=deadline, diversity=diversity)
         return recommendations
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error during content-based prediction for anime '{anime_name}': {e}", exc_info=True)
         raise CustomException(e, sys) # Re-raise as CustomException
 
 
+@traced()
+def predict_top_rated_anime(userID):
+    """Predicts anime a user would rate highest according to the RecommenderNet scorer."""
+    anime_df, ratings_df = app_state.anime_df, app_state.rating_df
+    if anime_df is None or ratings_df is None:
+        logger.error("Cannot run predicted-rating ranking: DataFrames not loaded.")
+        return []
+    try:
+        return get_predicted_rating_recommendations(user_id=userID, ratings_df=ratings_df, anime_df=anime_df, n=5)
+    except Exception as e:
+        logger.error(f"Error during predicted-rating ranking for user {userID}: {e}", exc_info=True)
+        raise CustomException(e, sys) # Re-raise as CustomException
+
+
+@traced()
+def predict_also_liked_anime(anime_name):
+    """Predicts anime that users who liked the given title also liked."""
+    anime_df = app_state.anime_df
+    if anime_df is None:
+        logger.error("Cannot run co-rated prediction: DataFrames not loaded.")
+        return []
+    try:
+        return get_also_liked_recommendations(anime_name=anime_name, anime_df=anime_df, n=5)
+    except Exception as e:
+        logger.error(f"Error during co-rated prediction for anime '{anime_name}': {e}", exc_info=True)
+        raise CustomException(e, sys) # Re-raise as CustomException
+
+
+@traced()
+def predict_similar_synopsis(anime_name):
+    """Predicts anime whose synopses read most like the given title's."""
+    anime_df = app_state.anime_df
+    if anime_df is None:
+        logger.error("Cannot run synopsis-based prediction: DataFrames not loaded.")
+        return []
+    try:
+        return find_similar_synopsis(anime_name=anime_name, anime_df=anime_df, n=5)
+    except Exception as e:
+        logger.error(f"Error during synopsis-based prediction for anime '{anime_name}': {e}", exc_info=True)
+        raise CustomException(e, sys) # Re-raise as CustomException
+
+
 def get_all_user_ids():
     """Returns a list of all unique user IDs from the ratings dataframe."""
+    ratings_df = app_state.rating_df
     if ratings_df is None:
         logger.error("Cannot get user IDs: ratings_df not loaded.")
         return []
@@ -65,6 +104,25 @@ def get_all_user_ids():
         logger.error(f"Error retrieving user IDs: {e}", exc_info=True)
         return []
 
+def warm_up(state, top_titles=10, sample_users=5, random_state=42):
+    """Runs recommendations for the most popular titles and a sample of users to warm caches."""
+    anime_df, ratings_df = state.anime_df, state.rating_df
+    titles = anime_df.sort_values(by="Members", ascending=False)["eng_version"].dropna().head(top_titles).tolist()
+    user_ids = pd.Series(ratings_df["user_id"].unique())
+    user_ids = user_ids.sample(n=min(sample_users, len(user_ids)), random_state=random_state).tolist()
+
+    for anime_name in titles:
+        try:
+            predict_similar_anime(anime_name)
+        except CustomException as e:
+            logger.warning(f"Warm-up failed for anime '{anime_name}': {e}")
+    for user_id in user_ids:
+        try:
+            predict_anime_hybrid(int(user_id))
+        except CustomException as e:
+            logger.warning(f"Warm-up failed for user {user_id}: {e}")
+    logger.info(f"Warm-up ran {len(titles)} title and {len(user_ids)} user recommendations.")
+
 if __name__ == "__main__":
     # Test hybrid prediction
     userID = 1980
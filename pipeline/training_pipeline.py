@@ -1,26 +1,91 @@
-import os
+
+import argparse
 from src.data_processing import DataProcessor
 from src.model_training import ModelTraining
+from src.base_model import BaseModel
+from src.numpy_inference import NumpyRecommenderScorer, l2_normalize
+from src.sparse_optimizers import get_optimizer
+from src.negative_sampling import NegativeSampler
+from src.item_cooccurrence import ItemCooccurrenceBuilder
+from src.synopsis_index import SynopsisIndexBuilder
+from src.popularity import PopularityBuilder
+from src.knn_graph import KnnGraphBuilder
+from src.embedding_compression import EmbeddingCompressor
+from src.stage_cache import Stage, StageRunner, source_files
 from config.paths_config import *
+from utils.anime_filters import split_genres
 from utils.common_functions import read_yaml
+from utils.shared_memory import SharedArrays
+from utils.topk import row_top_k, top_k
 from src.logger import get_logger
 from src.custom_exception import CustomException
 
+PROCESSED_OUTPUTS = [
+    X_TRAIN_ARRAY_PATH, X_TEST_ARRAY_PATH, Y_TRAIN_PATH, Y_TEST_PATH,
+    ANIME2ANIME_ENCODED_PATH, ANIME2ANIME_DECODED_PATH, USER2USER_ENCODED_PATH, USER2USER_DECODED_PATH,
+    PROCESSED_RATING_DF, PROCESSED_ANIME_DF, PROCESSED_SYNOPSIS_DF,
+    ITEM_COOCCURRENCE_PATH, SYNOPSIS_INDEX_PATH, POPULARITY_TABLES_PATH,
+]
+WEIGHT_OUTPUTS = [USER_WEIGHTS_FILE_PATH, ANIME_WEIGHTS_FILE_PATH]
+
+
+def build_stages(config):
+    """The training pipeline DAG: each stage's inputs, outputs and config parameters."""
+    stages = [
+        # Data Processing Step
+        Stage("data_processing",
+              lambda: DataProcessor(input_file=ANIMELIST_CSV, output_dir=PROCESSED_DIR, config=config).run_data_processing(),
+              inputs=[ANIMELIST_CSV, ANIME_CSV, SYNOPSIS_CSV]
+                     + source_files(DataProcessor, ItemCooccurrenceBuilder, SynopsisIndexBuilder, PopularityBuilder,
+                                    row_top_k, split_genres, SharedArrays),
+              outputs=PROCESSED_OUTPUTS,
+              params={key: config.get(key) for key in ("item_cooccurrence", "synopsis_index", "popularity")}),
+
+        # Model Training Step (the experiment tracker is only created when the stage actually runs)
+        Stage("model_training",
+              lambda: ModelTraining(data_path=PROCESSED_DIR, config=config).train_model(),
+              inputs=[X_TRAIN_ARRAY_PATH, X_TEST_ARRAY_PATH, Y_TRAIN_PATH, Y_TEST_PATH,
+                      USER2USER_ENCODED_PATH, ANIME2ANIME_ENCODED_PATH]
+                     + source_files(ModelTraining, BaseModel, NumpyRecommenderScorer, get_optimizer,
+                                    NegativeSampler),
+              outputs=[MODEL_FILE_PATH, RECOMMENDER_HEAD_PATH] + WEIGHT_OUTPUTS,
+              params={"model": config.get("model"), "training": config.get("training")},
+              deps=["data_processing"]),
+
+        # Neighbour Graph Step
+        Stage("knn_graph",
+              lambda: KnnGraphBuilder(config.get("knn_graph", {})).run(),
+              inputs=WEIGHT_OUTPUTS + source_files(KnnGraphBuilder, row_top_k),
+              outputs=[USER_KNN_INDICES_PATH, USER_KNN_SCORES_PATH, ANIME_KNN_INDICES_PATH, ANIME_KNN_SCORES_PATH],
+              params={"knn_graph": config.get("knn_graph")},
+              deps=["model_training"]),
+    ]
+
+    # Embedding Compression Step (serving switches to two-stage search when the artifact exists)
+    compression_config = config.get("embedding_compression", {})
+    if compression_config.get("enabled", False):
+        stages.append(Stage("embedding_compression",
+                            lambda: EmbeddingCompressor(compression_config).run(),
+                            inputs=WEIGHT_OUTPUTS + source_files(EmbeddingCompressor, l2_normalize, top_k),
+                            outputs=[COMPRESSED_EMBEDDINGS_PATH],
+                            params={"embedding_compression": compression_config},
+                            deps=["model_training"]))
+    return stages
+
+
 if __name__ == "__main__":
     logger = get_logger(__name__)
+    parser = argparse.ArgumentParser(description="Run the training pipeline, skipping stages whose inputs are unchanged.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if its outputs are up to date.")
+    args = parser.parse_args()
     try:
         logger.info("Starting the training pipeline...")
 
-        # Data Processing Step
-        processor = DataProcessor(input_file=ANIMELIST_CSV, output_dir=PROCESSED_DIR)
-        processor.run_data_processing()
-
-        # Model Training Step
-        model_trainer = ModelTraining(data_path=PROCESSED_DIR)
-        model_trainer.train_model()
+        runner = StageRunner(build_stages(read_yaml(CONFIG_PATH)), force=args.force)
+        runner.run()
 
         logger.info("Training pipeline executed successfully.")
 
     except Exception as e:
-        logger.error("Error in the training pipeline: ", str(e))
-        raise CustomException("Error in the training pipeline", e)
\ No newline at end of file
+        logger.error("Error in the training pipeline: %s", str(e))
+        raise CustomException("Error in the training pipeline", e)
@@ -3,13 +3,14 @@ from tensorflow.keras.layers import Input,Embedding,Dot,Flatten,Dense,Activation
 from utils.common_functions import read_yaml
 from src.logger import get_logger
 from src.custom_exception import CustomException
+from src.sparse_optimizers import get_optimizer
 
 logger = get_logger(__name__)
 
 class BaseModel:
-    def __init__(self, config_path):
+    def __init__(self, config_path, config=None):
         try:    
-            self.config = read_yaml(config_path)
+            self.config = config if config is not None else read_yaml(config_path)
             logger.info("Config file loaded successfully.")
         except Exception as e:
             raise CustomException("Error loading config file", e)
@@ -33,7 +34,7 @@ class BaseModel:
             model = Model(inputs=[user, anime], outputs=x)
             model.compile(
                 loss=self.config['model']['loss'],
-                optimizer=self.config['model']['optimizer'],
+                optimizer=get_optimizer(self.config['model']['optimizer']),
                 metrics=self.config['model']['metrics']
                 )
             
@@ -1,42 +1,158 @@
 import os
-import pandas as pd
-from google.cloud import storage
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from src.logger import get_logger
 from src.custom_exception import CustomException
+from src.storage_backends import get_backend
 from config.paths_config import *
 from utils.common_functions import read_yaml
 
 logger = get_logger(__name__)
 
 class DataIngestion:
-    def __init__(self, config):
+    def __init__(self, config, backend=None, raw_dir=RAW_DIR):
         self.config = config["data_ingestion"]
-        self.bucket_name = self.config["bucket_name"]
+        self.bucket_name = self.config.get("bucket_name")
         self.file_names = self.config["bucket_file_names"]
+        self.max_workers = self.config.get("max_workers", 8)
+        self.chunk_size = int(self.config.get("chunk_size_mb", 32) * 1024 * 1024)
+        self.raw_dir = raw_dir
+        self.manifest_path = os.path.join(raw_dir, "ingestion_manifest.json")
+        self.backend = backend if backend is not None else get_backend(self.config)
+        self._lock = threading.Lock()
 
-        os.makedirs(RAW_DIR, exist_ok=True)
+        os.makedirs(self.raw_dir, exist_ok=True)
+
+        logger.info(f"Data Ingestion initialized from {type(self.backend).__name__} ({self.bucket_name or self.config.get('local_root')}).")
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def is_up_to_date(self, info, manifest):
+        """True if the local copy was downloaded from this exact object version."""
+        local_file_path = os.path.join(self.raw_dir, info.name)
+        recorded = manifest.get(info.name)
+        return (recorded is not None and recorded["version"] == info.version
+                and os.path.exists(local_file_path) and os.path.getsize(local_file_path) == info.size)
+
+    def _plan(self, info):
+        """
+        Chunks of `info` still to download, resuming a partial download of the same version.
+
+        Done chunks are recorded by index, so a partial download is only resumed with the
+        chunk size it was started with; otherwise the indices would name other byte ranges.
+        """
+        part_path = os.path.join(self.raw_dir, f"{info.name}.part")
+        state_path = f"{part_path}.json"
+        chunks = [(start, min(start + self.chunk_size, info.size)) for start in range(0, info.size, self.chunk_size)]
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+
+        if (state is not None and state["version"] == info.version and state.get("chunk_size") == self.chunk_size
+                and os.path.exists(part_path)):
+            done = set(state["done"])
+            logger.info(f"Resuming {info.name}: {len(done)}/{len(chunks)} chunks already downloaded.")
+        else:
+            if state is not None:
+                logger.info(f"Restarting {info.name}: the partial download has a different version or chunk size.")
+            done, state = set(), {"version": info.version, "size": info.size, "chunk_size": self.chunk_size, "done": []}
+            with open(part_path, "wb") as f:
+                f.truncate(info.size)
+            self._write_json(state_path, state)
+        return [(i, start, end) for i, (start, end) in enumerate(chunks) if i not in done], state
+
+    def _download_chunk(self, info, state, index, start, end):
+        data = self.backend.read_range(info, start, end)
+        if len(data) != end - start:
+            raise IOError(f"Short read for {info.name} [{start}, {end}): got {len(data)} bytes")
+        part_path = os.path.join(self.raw_dir, f"{info.name}.part")
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            os.pwrite(fd, data, start)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # Recorded only once the bytes are on disk, so a resumed download never trusts a torn chunk.
+        with self._lock:
+            state["done"].append(index)
+            self._write_json(f"{part_path}.json", state)
+
+    def _finalize(self, info):
+        """Verifies the completed partial file against the object's checksum and moves it into place."""
+        part_path = os.path.join(self.raw_dir, f"{info.name}.part")
+        if os.path.getsize(part_path) != info.size:
+            raise IOError(f"{info.name} has {os.path.getsize(part_path)} bytes, expected {info.size}")
+        if info.md5 is not None:
+            digest = hashlib.md5()
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            if digest.hexdigest() != info.md5:
+                os.remove(part_path)
+                os.remove(f"{part_path}.json")
+                raise IOError(f"Checksum mismatch for {info.name}: got {digest.hexdigest()}, expected {info.md5}")
+        os.replace(part_path, os.path.join(self.raw_dir, info.name))
+        os.remove(f"{part_path}.json")
 
-        logger.info(f"Data Ingestion initialized from GCP Bucket : {self.bucket_name}.")
-    
     def download_csv_from_gcp(self):
         """
-        Download CSV files from GCP bucket and save them to the local directory.
+        Download the configured CSV files from the storage backend into the raw directory.
+        Files whose object version matches the last download are skipped; the rest are fetched
+        as byte-range chunks in a shared thread pool, resuming any partial download of the same version.
         """
         try:
-            client = storage.Client()
-            bucket = client.bucket(self.bucket_name)
-
-            for file in self.file_names:
-                local_file_path = os.path.join(RAW_DIR, file)
-                blob = bucket.blob(file)
-                blob.download_to_filename(local_file_path)
-                logger.info(f"Downloaded {file} from GCP bucket to {local_file_path}.")
-        
+            manifest = self._load_manifest()
+            infos = [self.backend.stat(file) for file in self.file_names]
+            stale = [info for info in infos if not self.is_up_to_date(info, manifest)]
+            for info in infos:
+                if info not in stale:
+                    logger.info(f"{info.name} is unchanged (version {info.version}), skipping download.")
+
+            remaining = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {}
+                for info in stale:
+                    chunks, state = self._plan(info)
+                    remaining[info.name] = len(chunks)
+                    for index, start, end in chunks:
+                        futures[executor.submit(self._download_chunk, info, state, index, start, end)] = info
+                    if not chunks:
+                        self._finalize(info)
+
+                for future in as_completed(futures):
+                    future.result()
+                    info = futures[future]
+                    remaining[info.name] -= 1
+                    if remaining[info.name] == 0:
+                        self._finalize(info)
+                        manifest[info.name] = info.to_dict()
+                        self._write_json(self.manifest_path, manifest)
+                        logger.info(f"Downloaded {info.name} ({info.size / 2**20:.1f} MB) to {self.raw_dir}.")
+
+            for info in stale:
+                manifest[info.name] = info.to_dict()
+            self._write_json(self.manifest_path, manifest)
+
         except Exception as e:
-            logger.error(f"Error downloading files from GCP: {e}")
-            raise CustomException("Failed to download the data", e)
-        
+            logger.error(f"Error downloading files from storage: {e}")
+            raise CustomException(f"Failed to download the data, {e}", e)
+
     def run_data_ingestion(self):
         """
         Run the data ingestion process.
@@ -48,11 +164,12 @@ class DataIngestion:
 
         except Exception as e:
             logger.error(f"Error during data ingestion: {str(e)}")
-        
+            raise CustomException(f"Data ingestion failed, {e}", e)
+
         finally:
             logger.info("Data ingestion process finished.")
 
 if __name__ == "__main__":
-    
+
     data_ingestion = DataIngestion(read_yaml(CONFIG_PATH))
     data_ingestion.run_data_ingestion()
@@ -7,14 +7,21 @@ from src.logger import get_logger
 from src.custom_exception import CustomException
 from config.paths_config import *
 from config.paths_config import ANIMELIST_CSV
+from src.item_cooccurrence import ItemCooccurrenceBuilder
+from src.synopsis_index import SynopsisIndexBuilder
+from src.popularity import PopularityBuilder
+from utils.common_functions import read_yaml
 import sys
 
 logger = get_logger(__name__)
 
 class DataProcessor:
-    def __init__(self, input_file:str , output_dir:str):
+    def __init__(self, input_file:str , output_dir:str, anime_file:str = ANIME_CSV, synopsis_file:str = SYNOPSIS_CSV, config:dict = None):
         self.input_file = input_file
         self.output_dir = output_dir
+        self.anime_file = anime_file
+        self.synopsis_file = synopsis_file
+        self.config = config if config is not None else read_yaml(CONFIG_PATH)
 
         self.rating_df = None
         self.anime_df = None
@@ -115,6 +122,14 @@ class DataProcessor:
         except Exception as e:
             raise CustomException(f"Failed to save artifacts, {e}",sys)
         
+    def build_item_cooccurrence(self):
+        try:
+            builder = ItemCooccurrenceBuilder(self.config.get("item_cooccurrence", {}))
+            neighbors, scores = builder.build(self.rating_df, len(self.user2user_encoded), len(self.anime2anime_encoded))
+            builder.save(neighbors, scores, os.path.join(self.output_dir, "item_cooccurrence.pkl"))
+        except Exception as e:
+            raise CustomException(f"Failed to build item co-occurrence neighbours, {e}",sys)
+
     def get_anime_name(self, df:pd.DataFrame, anime_id):
         try:
             name = df[df.anime_id == anime_id].eng_version.values[0]
@@ -126,11 +141,11 @@ class DataProcessor:
 
     def process_anime_data(self):
         try:
-            anime_df = pd.read_csv(ANIME_CSV)
+            anime_df = pd.read_csv(self.anime_file)
             anime_df = anime_df.replace("Unknown", np.nan)
 
             synopsis_cols = ["MAL_ID","Name","Genres","sypnopsis"]
-            synopsis_df = pd.read_csv(SYNOPSIS_CSV, usecols=synopsis_cols)
+            synopsis_df = pd.read_csv(self.synopsis_file, usecols=synopsis_cols)
             
             anime_df["anime_id"] = anime_df["MAL_ID"]
             anime_df["eng_version"] = anime_df["English name"]
@@ -140,11 +155,22 @@ class DataProcessor:
             anime_df = anime_df[["anime_id", "eng_version", "Score", "Genres", "Episodes", "Type", "Premiered", "Members"]]
             
             anime_df.to_csv(os.path.join(self.output_dir,"anime_df.csv"), index=False)
+            self.anime_df = anime_df
             synopsis_df.to_csv(os.path.join(self.output_dir,"synopsis_df.csv"), index=False)
 
+            builder = SynopsisIndexBuilder(self.config.get("synopsis_index", {}))
+            builder.save(builder.build(synopsis_df), os.path.join(self.output_dir, "synopsis_index.pkl"))
+
         except Exception as e:
             raise CustomException(f"Failed to save processed anime data, {e}",sys)
     
+    def build_popularity_tables(self):
+        try:
+            builder = PopularityBuilder(self.config.get("popularity", {}))
+            builder.save(builder.build(self.anime_df, self.rating_df), os.path.join(self.output_dir, "popularity_tables.pkl"))
+        except Exception as e:
+            raise CustomException(f"Failed to build popularity tables, {e}",sys)
+
     def run_data_processing(self):
         try:
             self.load_data()
@@ -153,7 +179,9 @@ class DataProcessor:
             self.encode_data()
             self.split_data()
             self.save_artifacts()
+            self.build_item_cooccurrence()
             self.process_anime_data()
+            self.build_popularity_tables()
             logger.info("Data processing completed successfully.")
         except Exception as e:
             raise CustomException(f"Failed to run data processing, {e}",sys)
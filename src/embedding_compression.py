@@ -0,0 +1,78 @@
+"""
+Embedding Compression Module
+
+Offline stage projecting the exported user and anime embeddings to a lower dimension
+with PCA or a Gaussian random projection, renormalized to unit length so dot products
+stay cosine similarities. Serving uses the reduced vectors for a cheap first pass that
+shortlists candidates, then re-ranks only the shortlist with the full vectors
+(`two_stage_top_k`), trading a little recall for far fewer multiply-adds per query.
+"""
+
+import sys
+import joblib
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.random_projection import GaussianRandomProjection
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from src.numpy_inference import l2_normalize
+from config.paths_config import *
+from utils.common_functions import read_yaml
+from utils.topk import top_k
+
+logger = get_logger(__name__)
+
+METHODS = ("pca", "random_projection")
+
+
+def two_stage_top_k(full, reduced, query_index, k, shortlist):
+    """Top-k rows most similar to row `query_index` (excluding itself): shortlist on `reduced`, re-rank on `full`."""
+    candidates = top_k(reduced @ reduced[query_index], max(shortlist, k) + 1)
+    candidates = candidates[candidates != query_index]
+    scores = full[candidates] @ full[query_index]
+    order = top_k(scores, k)
+    return candidates[order], scores[order]
+
+
+class EmbeddingCompressor:
+    def __init__(self, config):
+        self.config = config
+        self.method = config.get("method", "pca")
+        self.dim = config.get("dim", 32)
+        self.shortlist = config.get("shortlist", 200)
+        self.random_state = config.get("random_state", 42)
+        if self.method not in METHODS:
+            raise ValueError(f"Unknown compression method '{self.method}', expected one of {METHODS}")
+        logger.info(f"Embedding compressor initialized ({self.method} to {self.dim} dimensions).")
+
+    def fit_transform(self, weights):
+        """Projects `weights` to `dim` dimensions and renormalizes the rows."""
+        weights = np.asarray(weights, dtype=np.float32)
+        dim = min(self.dim, weights.shape[1])
+        if self.method == "pca":
+            projector = PCA(n_components=dim, random_state=self.random_state)
+        else:
+            projector = GaussianRandomProjection(n_components=dim, random_state=self.random_state)
+        return l2_normalize(projector.fit_transform(weights))
+
+    def run(self, user_weights_path=USER_WEIGHTS_FILE_PATH, anime_weights_path=ANIME_WEIGHTS_FILE_PATH,
+            output_path=COMPRESSED_EMBEDDINGS_PATH):
+        """Compresses the saved user and anime embeddings into one serving artifact."""
+        try:
+            compressed = {
+                "user": self.fit_transform(joblib.load(user_weights_path)),
+                "anime": self.fit_transform(joblib.load(anime_weights_path)),
+                "method": self.method,
+                "dim": self.dim,
+                "shortlist": self.shortlist,
+            }
+            joblib.dump(compressed, output_path)
+            logger.info(f"Compressed embeddings ({self.method}, {self.dim}-d) saved to {output_path}.")
+            return compressed
+        except Exception as e:
+            raise CustomException(f"Failed to compress embeddings, {e}", sys)
+
+
+if __name__ == "__main__":
+    compressor = EmbeddingCompressor(read_yaml(CONFIG_PATH).get("embedding_compression", {}))
+    compressor.run()
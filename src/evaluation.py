@@ -0,0 +1,349 @@
+"""
+Evaluation Module
+
+Offline ranking evaluation of the recommenders. For a sample of test users a fraction of
+their liked anime (rated at or above their 75th percentile, the same threshold serving
+uses for preferences) is held out, and every method ranks the catalogue from the
+remaining history. Reported per method: recall@k, NDCG@k and hit rate against the
+held-out titles, plus per-user latency.
+
+Test users are scored in batches across a process pool, each batch with a few matrix
+products instead of one serving call per user:
+
+* `popularity`: how many users like each anime.
+* `user_knn`: votes of the 20 most similar users (by user embedding), as in
+  `user_based_candidate_indices`.
+* `item_knn`: how often an anime is among the embedding neighbours of the user's
+  preferences, as in the content-based half of `hybrid_recommendation`.
+* `similar_anime`: neighbours of the user's top preference only, as served by
+  `find_similar_anime`.
+* `hybrid`: the weighted `user_knn` / `item_knn` membership blend of `hybrid_recommendation`.
+
+The batched methods mirror the served logic but are not identical to it (the served
+hybrid only expands the first few preferences). With `--served N` the real
+`hybrid_recommendation` and `find_similar_anime` are also run on N test users through
+`AppState`, so their exact quality and latency can be compared against the batched numbers.
+
+The embeddings were trained on all ratings, held-out ones included, so absolute numbers
+are optimistic; the tool is meant for comparing index, compression and caching variants
+against each other on the same split.
+
+Usage:
+    python -m src.evaluation --users 5000 --k 10 --output evaluation.json
+    python -m src.evaluation --workdir /tmp/fixture --served 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from src.knn_graph import block_knn
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+METHODS = ("popularity", "user_knn", "item_knn", "similar_anime", "hybrid")
+
+# Set per worker process by _init_worker so batches don't re-pickle the matrices.
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def liked_mask(rating_df):
+    """Rows rated at or above their user's 75th percentile rating."""
+    threshold = rating_df.groupby("user")["rating"].transform(lambda ratings: np.percentile(ratings, 75))
+    return (rating_df["rating"] >= threshold).to_numpy()
+
+
+def holdout_split(rating_df, n_test_users, holdout_fraction=0.2, min_liked=5, seed=42):
+    """
+    Holds out `holdout_fraction` of the liked ratings of up to `n_test_users` users with at
+    least `min_liked` liked anime. Returns (train_df, test_users, held_out_df).
+    """
+    rng = np.random.default_rng(seed)
+    liked = liked_mask(rating_df)
+    liked_counts = np.bincount(rating_df["user"].to_numpy()[liked])
+    eligible = np.flatnonzero(liked_counts >= min_liked)
+    test_users = np.sort(rng.choice(eligible, size=min(n_test_users, len(eligible)), replace=False))
+
+    candidates = rating_df[liked & np.isin(rating_df["user"].to_numpy(), test_users)]
+    # Random order within each user, then the first ceil(fraction * liked) rows of each are held out.
+    candidates = candidates.iloc[rng.permutation(len(candidates))]
+    rank = candidates.groupby("user").cumcount().to_numpy()
+    n_held = np.ceil(holdout_fraction * liked_counts[candidates["user"].to_numpy()]).astype(int)
+    held_out = candidates[rank < n_held]
+    return rating_df.drop(held_out.index), test_users, held_out
+
+
+def preference_matrix(rating_df, n_users, n_anime):
+    """Binary CSR user x anime matrix of each user's liked anime."""
+    liked = rating_df[liked_mask(rating_df)]
+    return sp.csr_matrix((np.ones(len(liked), dtype=np.float32), (liked["user"], liked["anime"])),
+                         shape=(n_users, n_anime))
+
+
+def neighbor_matrix(weights, n, block_size=2048):
+    """Sparse (rows x rows) 0/1 matrix marking each row's n nearest embedding neighbours."""
+    weights = np.ascontiguousarray(weights, dtype=np.float32)
+    indices = np.concatenate([block_knn(weights, start, min(start + block_size, len(weights)), n, 16384)[0]
+                              for start in range(0, len(weights), block_size)])
+    rows = np.repeat(np.arange(len(weights)), indices.shape[1])
+    return sp.csr_matrix((np.ones(indices.size, dtype=np.float32), (rows, indices.ravel())),
+                         shape=(len(weights), len(weights)))
+
+
+def _membership(scores, n):
+    """1.0 where an entry is among its row's top n positive scores."""
+    indices, values = row_top_k(scores, n)
+    member = np.zeros_like(scores)
+    np.put_along_axis(member, indices, (values > 0).astype(scores.dtype), axis=1)
+    return member
+
+
+def rank_batch(users, k, n_similar_users=20, user_weight=0.5, content_weight=0.5):
+    """Top-k encoded anime per method for a batch of encoded test users, with seconds per method."""
+    data = _worker_data
+    history = data["preferences"][users]
+    history_rows, history_cols = history.nonzero()
+    rankings, seconds = {}, {}
+
+    def rank(method, scores, start):
+        scores = np.asarray(scores, dtype=np.float32)
+        scores[history_rows, history_cols] = -np.inf
+        rankings[method] = row_top_k(scores, k)[0]
+        seconds[method] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rank("popularity", np.broadcast_to(data["popularity"], (len(users), len(data["popularity"]))).copy(), start)
+
+    start = time.perf_counter()
+    similarities = data["user_weights"][users] @ data["user_weights"].T
+    similarities[np.arange(len(users)), users] = -np.inf
+    similar, _ = row_top_k(similarities, n_similar_users)
+    similar_users = sp.csr_matrix((np.ones(similar.size, dtype=np.float32),
+                                   (np.repeat(np.arange(len(users)), similar.shape[1]), similar.ravel())),
+                                  shape=(len(users), data["preferences"].shape[0]))
+    votes = (similar_users @ data["preferences"]).toarray()
+    rank("user_knn", votes, start)
+
+    start = time.perf_counter()
+    content = (history @ data["anime_neighbors"]).toarray()
+    rank("item_knn", content, start)
+
+    start = time.perf_counter()
+    # Highest-popularity preference stands in for the title a user would search for.
+    top_preference = np.where(history.toarray() > 0, data["popularity"], -np.inf).argmax(axis=1)
+    rank("similar_anime", data["anime_neighbors"][top_preference].toarray(), start)
+
+    start = time.perf_counter()
+    hybrid = (user_weight * _membership(votes, 2 * k) + content_weight * (content > 0)
+              # Tie-breaks inside each membership level, strongest evidence first.
+              + 1e-3 * votes / max(votes.max(), 1) + 1e-6 * content / max(content.max(), 1))
+    rank("hybrid", hybrid, start)
+    return rankings, seconds
+
+
+def _rank_batch(users, k):
+    return users, *rank_batch(users, k)
+
+
+def ranking_metrics(rankings, relevant):
+    """Per-user recall@k, NDCG@k and hit flags; `relevant` is a CSR matrix of held-out anime per row, -1 pads `rankings`."""
+    k = rankings.shape[1]
+    valid = rankings >= 0
+    # Membership via sorted (row, anime) keys, so `relevant` never has to be densified.
+    n_cols = relevant.shape[1]
+    relevant = relevant.tocsr()
+    relevant.sort_indices()
+    relevant_keys = np.repeat(np.arange(relevant.shape[0]), np.diff(relevant.indptr)) * n_cols + relevant.indices
+    keys = (np.arange(len(rankings))[:, None] * n_cols + rankings).ravel()
+    found = np.minimum(np.searchsorted(relevant_keys, keys), max(len(relevant_keys) - 1, 0))
+    hits = (relevant_keys[found] == keys).reshape(rankings.shape) & valid if len(relevant_keys) else np.zeros_like(valid)
+    n_relevant = np.diff(relevant.indptr)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+    return {
+        "recall": hits.sum(axis=1) / n_relevant,
+        "ndcg": (hits * discounts).sum(axis=1) / ideal,
+        "hit": hits.any(axis=1),
+    }
+
+
+def summarize_method(metrics, user_seconds):
+    latencies_ms = np.asarray(user_seconds) * 1e3
+    return {
+        "recall_at_k": float(np.mean(metrics["recall"])),
+        "ndcg_at_k": float(np.mean(metrics["ndcg"])),
+        "hit_rate": float(np.mean(metrics["hit"])),
+        "users": int(len(metrics["recall"])),
+        "ms_per_user_p50": float(np.percentile(latencies_ms, 50)),
+        "ms_per_user_p95": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+class RankingEvaluator:
+    def __init__(self, artifact_paths, k=10, n_users=2000, holdout_fraction=0.2, min_liked=5,
+                 batch_size=256, n_jobs=None, content_neighbors=5, seed=42):
+        self.artifact_paths = artifact_paths
+        self.k = k
+        self.n_users = n_users
+        self.holdout_fraction = holdout_fraction
+        self.min_liked = min_liked
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.content_neighbors = content_neighbors
+        self.seed = seed
+
+    def prepare(self):
+        """Loads the artifacts, makes the hold-out split and builds the matrices every batch shares."""
+        try:
+            rating_df = pd.read_csv(self.artifact_paths["rating_df"])
+            user_weights = np.asarray(joblib.load(self.artifact_paths["user_weights"]), dtype=np.float32)
+            anime_weights = np.asarray(joblib.load(self.artifact_paths["anime_weights"]), dtype=np.float32)
+            n_users, n_anime = len(user_weights), len(anime_weights)
+
+            self.train_df, self.test_users, held_out = holdout_split(
+                rating_df, self.n_users, self.holdout_fraction, self.min_liked, self.seed)
+            test_rows = np.searchsorted(self.test_users, held_out["user"].to_numpy())
+            self.relevant = sp.csr_matrix((np.ones(len(held_out), dtype=np.float32), (test_rows, held_out["anime"])),
+                                          shape=(len(self.test_users), n_anime))
+
+            preferences = preference_matrix(self.train_df, n_users, n_anime)
+            self.data = {
+                "preferences": preferences,
+                "popularity": np.asarray(preferences.sum(axis=0), dtype=np.float32).ravel(),
+                "user_weights": user_weights,
+                "anime_neighbors": neighbor_matrix(anime_weights, self.content_neighbors),
+            }
+            logger.info(f"Holding out {len(held_out)} liked ratings of {len(self.test_users)} test users.")
+            return self
+        except Exception as e:
+            raise CustomException(f"Failed to prepare the evaluation data, {e}", sys)
+
+    def evaluate_batched(self):
+        """Ranking metrics and per-user latency of every batched method."""
+        batches = [self.test_users[start:start + self.batch_size]
+                   for start in range(0, len(self.test_users), self.batch_size)]
+        rankings = {method: np.empty((len(self.test_users), self.k), dtype=np.int64) for method in METHODS}
+        user_seconds = {method: [] for method in METHODS}
+
+        def collect(users, batch_rankings, batch_seconds):
+            rows = np.searchsorted(self.test_users, users)
+            for method in METHODS:
+                rankings[method][rows] = batch_rankings[method]
+                user_seconds[method].extend([batch_seconds[method] / len(users)] * len(users))
+
+        if self.n_jobs > 1 and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker, initargs=(self.data,)) as executor:
+                for result in executor.map(_rank_batch, batches, [self.k] * len(batches)):
+                    collect(*result)
+        else:
+            _init_worker(self.data)
+            for users in batches:
+                collect(*_rank_batch(users, self.k))
+
+        return {method: summarize_method(ranking_metrics(rankings[method], self.relevant), user_seconds[method])
+                for method in METHODS}
+
+    def evaluate_served(self, n_users):
+        """Quality and latency of the real serving functions on the first n test users."""
+        from utils.app_state import app_state
+        from utils.helpers import encoded_anime_names, find_similar_anime, hybrid_recommendation
+
+        with tempfile.TemporaryDirectory(prefix="anime_eval_") as tmp_dir:
+            # Serving must only see the training ratings, or held-out titles count as already watched.
+            train_path = os.path.join(tmp_dir, "rating_df.csv")
+            self.train_df.to_csv(train_path, index=False)
+            app_state.reset({**self.artifact_paths, "rating_df": train_path})
+            app_state.load()
+
+            names = encoded_anime_names()
+            encoded_by_name = {name: i for i, name in reversed(list(enumerate(names))) if pd.notna(name)}
+            user2user_decoded = app_state.user2user_decoded
+            popularity = self.data["popularity"]
+            results = {"served_hybrid": ([], []), "served_similar_anime": ([], [])}
+
+            for user in self.test_users[:n_users]:
+                user_id = user2user_decoded[int(user)]
+                start = time.perf_counter()
+                recommended = hybrid_recommendation(user_id, n=self.k)
+                results["served_hybrid"][1].append(time.perf_counter() - start)
+                results["served_hybrid"][0].append([encoded_by_name.get(name, -1) for name in recommended])
+
+                history = self.data["preferences"][int(user)].indices
+                top_preference = history[np.argmax(popularity[history])]
+                start = time.perf_counter()
+                similar = find_similar_anime(names[top_preference], app_state.anime_df, app_state.synopsis_df, n=self.k)
+                results["served_similar_anime"][1].append(time.perf_counter() - start)
+                results["served_similar_anime"][0].append([encoded_by_name.get(name, -1) for name in similar["name"]])
+
+        relevant = self.relevant[:min(n_users, len(self.test_users))]
+        summaries = {}
+        for method, (ranked, seconds) in results.items():
+            # Short lists are padded with -1, which never counts as a hit.
+            padded = np.full((len(ranked), self.k), -1, dtype=np.int64)
+            for row, indices in enumerate(ranked):
+                padded[row, :len(indices)] = indices[:self.k]
+            summaries[method] = summarize_method(ranking_metrics(padded, relevant), seconds)
+        return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline recall@k / NDCG@k evaluation of the recommenders.")
+    parser.add_argument("--workdir", help="Evaluate fixture artifacts under this directory instead of artifacts/.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--users", type=int, default=2000, help="Number of test users.")
+    parser.add_argument("--holdout-fraction", type=float, default=0.2)
+    parser.add_argument("--min-liked", type=int, default=5, help="Only users with at least this many liked anime are tested.")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--served", type=int, default=0, help="Also run the real serving functions for this many test users.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    if args.workdir:
+        from benchmarks.synthetic_data import artifact_paths_for
+        artifact_paths = artifact_paths_for(args.workdir)
+    else:
+        from utils.app_state import ARTIFACT_PATHS
+        artifact_paths = ARTIFACT_PATHS
+
+    evaluator = RankingEvaluator(artifact_paths, k=args.k, n_users=args.users, holdout_fraction=args.holdout_fraction,
+                                 min_liked=args.min_liked, batch_size=args.batch_size, n_jobs=args.n_jobs,
+                                 seed=args.seed).prepare()
+    start = time.perf_counter()
+    results = evaluator.evaluate_batched()
+    elapsed = time.perf_counter() - start
+    if args.served:
+        results.update(evaluator.evaluate_served(args.served))
+
+    for method, summary in results.items():
+        logger.info(f"{method:<22} recall@{args.k} {summary['recall_at_k']:.4f}  ndcg@{args.k} {summary['ndcg_at_k']:.4f}  "
+                    f"p50 {summary['ms_per_user_p50']:.3f} ms/user")
+    report = {"meta": {"k": args.k, "test_users": len(evaluator.test_users), "holdout_fraction": args.holdout_fraction,
+                       "batched_seconds": elapsed, "n_jobs": evaluator.n_jobs, "workdir": args.workdir},
+              "results": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Experiment Tracking Module
+
+A small tracker interface (`log_params`, `log_metric(s)`, `log_asset`, `close`) with two
+backends:
+
+* `CometTracker` wraps a `comet_ml.Experiment`. `comet_ml` is imported only when this
+  backend is created, so training does not need it installed.
+* `LocalTracker` appends metrics as JSON lines under `artifacts/experiments/<run>/`, so
+  runs work without any network.
+
+`AsyncTracker` puts any backend behind a bounded queue drained by a background thread.
+Logging calls return immediately and never raise into the training loop. The backend is
+created on that thread too, so a slow or unreachable Comet endpoint does not block
+training start-up. If the backend cannot be created, the tracker falls back to
+`LocalTracker`. When the queue is full, records are dropped and counted rather than
+stalling a training step.
+"""
+
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from src.logger import get_logger
+from config.paths_config import *
+
+logger = get_logger(__name__)
+
+
+class Tracker:
+    """No-op tracker; also the interface every backend implements."""
+
+    def log_params(self, params):
+        pass
+
+    def log_metric(self, name, value, step=None):
+        pass
+
+    def log_metrics(self, metrics, step=None):
+        for name, value in metrics.items():
+            self.log_metric(name, value, step=step)
+
+    def log_asset(self, path):
+        pass
+
+    def close(self):
+        pass
+
+
+class LocalTracker(Tracker):
+    """Writes params.json, metrics.jsonl and copies of logged assets into a run directory."""
+
+    def __init__(self, output_dir=EXPERIMENT_DIR, run_name=None, copy_assets=False):
+        self.run_dir = os.path.join(output_dir, run_name or time.strftime("%Y%m%d-%H%M%S"))
+        self.copy_assets = copy_assets
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._metrics_file = open(os.path.join(self.run_dir, "metrics.jsonl"), "a")
+        logger.info(f"Local experiment tracking to {self.run_dir}.")
+
+    def log_params(self, params):
+        with open(os.path.join(self.run_dir, "params.json"), "w") as f:
+            json.dump(params, f, indent=2, default=str)
+
+    def log_metric(self, name, value, step=None):
+        self._metrics_file.write(json.dumps({"name": name, "value": float(value), "step": step,
+                                             "time": time.time()}) + "\n")
+
+    def log_asset(self, path):
+        record = {"path": path, "bytes": os.path.getsize(path), "time": time.time()}
+        if self.copy_assets:
+            record["copy"] = shutil.copy2(path, self.run_dir)
+        with open(os.path.join(self.run_dir, "assets.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._metrics_file.close()
+
+
+class CometTracker(Tracker):
+    def __init__(self, api_key=None, project_name=None, workspace=None):
+        import comet_ml
+
+        self.experiment = comet_ml.Experiment(api_key=api_key, project_name=project_name, workspace=workspace)
+        logger.info("Comet ML experiment initialized successfully.")
+
+    def log_params(self, params):
+        self.experiment.log_parameters(params)
+
+    def log_metric(self, name, value, step=None):
+        self.experiment.log_metric(name, value, step=step)
+
+    def log_metrics(self, metrics, step=None):
+        self.experiment.log_metrics(metrics, step=step)
+
+    def log_asset(self, path):
+        self.experiment.log_asset(path)
+
+    def close(self):
+        self.experiment.end()
+
+
+class AsyncTracker(Tracker):
+    """Forwards calls to a backend on a background thread; the caller never blocks or sees backend errors."""
+
+    _STOP = object()
+
+    def __init__(self, factory, fallback=LocalTracker, queue_size=10000, close_timeout=30.0):
+        self.factory = factory
+        self.fallback = fallback
+        self.close_timeout = close_timeout
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="experiment-tracker", daemon=True)
+        self._thread.start()
+
+    def _create_backend(self):
+        try:
+            return self.factory()
+        except Exception as e:
+            logger.warning(f"Experiment tracker backend unavailable ({e}), falling back to local tracking.")
+            return self.fallback()
+
+    def _run(self):
+        backend = self._create_backend()
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            method, args = item
+            try:
+                getattr(backend, method)(*args)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Experiment tracker {method} failed: {e}")
+        try:
+            backend.close()
+        except Exception as e:
+            logger.warning(f"Experiment tracker close failed: {e}")
+
+    def _submit(self, method, *args):
+        try:
+            self._queue.put_nowait((method, args))
+        except queue.Full:
+            self.dropped += 1
+
+    def log_params(self, params):
+        self._submit("log_params", dict(params))
+
+    def log_metric(self, name, value, step=None):
+        self._submit("log_metric", name, value, step)
+
+    def log_metrics(self, metrics, step=None):
+        self._submit("log_metrics", dict(metrics), step)
+
+    def log_asset(self, path):
+        self._submit("log_asset", path)
+
+    def close(self):
+        """Flushes queued records (up to `close_timeout` seconds) and closes the backend."""
+        try:
+            self._queue.put(self._STOP, timeout=self.close_timeout)
+        except queue.Full:
+            pass
+        self._thread.join(self.close_timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Experiment tracker still flushing after {self.close_timeout}s, giving up.")
+        if self.dropped or self.failed:
+            logger.warning(f"Experiment tracker dropped {self.dropped} and failed {self.failed} records.")
+
+
+def create_tracker(config):
+    """Tracker for the `tracking` config section: backend comet, local or none, optionally asynchronous."""
+    backend = config.get("backend", "comet")
+    local_dir = config.get("local_dir") or EXPERIMENT_DIR
+    if backend == "none":
+        return Tracker()
+    if backend == "local":
+        factory = lambda: LocalTracker(local_dir, copy_assets=config.get("copy_assets", False))
+    elif backend == "comet":
+        factory = lambda: CometTracker(api_key=os.getenv("COMET_ML_API_KEY"),
+                                       project_name=os.getenv("COMET_ML_PROJECT_NAME"),
+                                       workspace=os.getenv("COMET_ML_WORKSPACE"))
+    else:
+        raise ValueError(f"Unknown tracking backend '{backend}', expected 'comet', 'local' or 'none'")
+
+    if config.get("async", True):
+        return AsyncTracker(factory, fallback=lambda: LocalTracker(local_dir),
+                            queue_size=config.get("queue_size", 10000))
+    return factory()
@@ -0,0 +1,153 @@
+"""
+Item Co-occurrence Module
+
+Builds a collaborative item-item neighbour table ("people who liked X also liked") from the
+ratings. Ratings at or above a like threshold form a binary sparse user x anime matrix X;
+co-occurrence counts are the item-item product X^T X, computed one block of anime columns at
+a time so only an (n_anime x block_size) dense slice is ever materialized. Blocks are spread
+across a process pool and each is reduced to its top-K neighbours immediately, so the result
+is two compact (n_anime x K) arrays of neighbour indices and similarity scores. The sparse
+matrices are copied once into shared memory, and the workers wrap those buffers instead of
+receiving their own pickled copy, so peak memory does not grow with `n_jobs`.
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.shared_memory import SharedArrays
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+SIMILARITIES = ("cosine", "jaccard")
+
+# Set per worker process by _init_worker; the matrices are views of the parent's shared memory.
+_worker_matrix = None
+_worker_item_matrix = None
+_worker_degrees = None
+_worker_blocks = None
+
+
+def share_matrices(matrix, item_matrix, degrees):
+    """Copies the CSC matrix, its CSR transpose and the degrees into shared memory blocks."""
+    return SharedArrays({
+        "data": matrix.data, "indices": matrix.indices, "indptr": matrix.indptr,
+        "item_data": item_matrix.data, "item_indices": item_matrix.indices, "item_indptr": item_matrix.indptr,
+        "degrees": degrees,
+    })
+
+
+def _init_worker(handles, shape):
+    global _worker_matrix, _worker_item_matrix, _worker_degrees, _worker_blocks
+    arrays, _worker_blocks = SharedArrays.attach(handles)
+    _worker_matrix = sp.csc_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    _worker_item_matrix = sp.csr_matrix((arrays["item_data"], arrays["item_indices"], arrays["item_indptr"]),
+                                        shape=shape[::-1], copy=False)
+    _worker_degrees = arrays["degrees"]
+
+
+def block_neighbors(matrix, item_matrix, degrees, start, end, top_k, similarity):
+    """Top-K co-rated neighbours for anime columns [start, end)."""
+    # (n_anime x block) co-occurrence counts, densified one block at a time.
+    counts = (item_matrix @ matrix[:, start:end]).toarray().T.astype(np.float32)
+    block_degrees = degrees[start:end, None]
+    if similarity == "cosine":
+        denominator = np.sqrt(block_degrees * degrees[None, :])
+    else:
+        denominator = block_degrees + degrees[None, :] - counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(denominator > 0, counts / denominator, 0.0).astype(np.float32)
+    # An anime is not its own neighbour.
+    scores[np.arange(end - start), np.arange(start, end)] = 0.0
+
+    neighbors, neighbor_scores = row_top_k(scores, top_k)
+    neighbors = neighbors.astype(np.int32)
+    # Pad items with fewer than K co-rated neighbours.
+    neighbors[neighbor_scores <= 0] = -1
+    neighbor_scores[neighbor_scores <= 0] = 0.0
+    return start, neighbors, neighbor_scores
+
+
+def _worker_block(start, end, top_k, similarity):
+    return block_neighbors(_worker_matrix, _worker_item_matrix, _worker_degrees, start, end, top_k, similarity)
+
+
+class ItemCooccurrenceBuilder:
+    def __init__(self, config):
+        self.config = config
+        self.top_k = config.get("top_k", 50)
+        self.similarity = config.get("similarity", "cosine")
+        self.like_threshold = config.get("like_threshold", 0.0)
+        self.block_size = config.get("block_size", 1024)
+        self.n_jobs = config.get("n_jobs", 1)
+
+        if self.similarity not in SIMILARITIES:
+            raise ValueError(f"Unknown co-occurrence similarity '{self.similarity}', expected one of {SIMILARITIES}")
+        logger.info(f"Item co-occurrence builder initialized ({self.similarity}, top {self.top_k}, blocks of {self.block_size}).")
+
+    def build_matrix(self, rating_df, n_users, n_anime):
+        """Binary user x anime CSR matrix of ratings at or above the like threshold."""
+        try:
+            liked = rating_df[rating_df["rating"] >= self.like_threshold]
+            matrix = sp.csr_matrix(
+                (np.ones(len(liked), dtype=np.float32), (liked["user"].values, liked["anime"].values)),
+                shape=(n_users, n_anime),
+            )
+            # Duplicate (user, anime) rows would otherwise be summed.
+            matrix.data[:] = 1.0
+            logger.info(f"Built {n_users}x{n_anime} like matrix with {matrix.nnz} entries.")
+            return matrix
+        except Exception as e:
+            raise CustomException(f"Failed to build the user x anime matrix, {e}", sys)
+
+    def build(self, rating_df, n_users, n_anime):
+        """Returns (neighbors, scores), each of shape (n_anime, top_k)."""
+        try:
+            matrix = self.build_matrix(rating_df, n_users, n_anime).tocsc()
+            item_matrix = matrix.T.tocsr()
+            degrees = np.asarray(matrix.sum(axis=0)).ravel().astype(np.float32)
+            top_k = min(self.top_k, max(n_anime - 1, 1))
+
+            neighbors = np.full((n_anime, top_k), -1, dtype=np.int32)
+            scores = np.zeros((n_anime, top_k), dtype=np.float32)
+            blocks = [(start, min(start + self.block_size, n_anime)) for start in range(0, n_anime, self.block_size)]
+
+            if self.n_jobs > 1 and len(blocks) > 1:
+                shape = matrix.shape
+                shared = share_matrices(matrix, item_matrix, degrees)
+                # Only the shared copy is needed from here on.
+                del matrix, item_matrix
+                try:
+                    with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                             initargs=(shared.handles, shape)) as executor:
+                        futures = [executor.submit(_worker_block, start, end, top_k, self.similarity) for start, end in blocks]
+                        results = (future.result() for future in futures)
+                        for start, block_ids, block_scores in results:
+                            neighbors[start:start + len(block_ids)] = block_ids
+                            scores[start:start + len(block_ids)] = block_scores
+                finally:
+                    shared.close()
+            else:
+                for start, end in blocks:
+                    _, block_ids, block_scores = block_neighbors(matrix, item_matrix, degrees, start, end, top_k, self.similarity)
+                    neighbors[start:end] = block_ids
+                    scores[start:end] = block_scores
+
+            logger.info(f"Computed top-{top_k} co-occurrence neighbours for {n_anime} anime in {len(blocks)} blocks.")
+            return neighbors, scores
+        except CustomException:
+            raise
+        except Exception as e:
+            raise CustomException(f"Failed to build item co-occurrence neighbours, {e}", sys)
+
+    def save(self, neighbors, scores, path=ITEM_COOCCURRENCE_PATH):
+        try:
+            joblib.dump({"neighbors": neighbors, "scores": scores, "similarity": self.similarity}, path)
+            logger.info(f"Item co-occurrence neighbours saved to {path}.")
+        except Exception as e:
+            raise CustomException(f"Failed to save item co-occurrence neighbours, {e}", sys)
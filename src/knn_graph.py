@@ -0,0 +1,124 @@
+"""
+kNN Graph Module
+
+Offline job computing the exact top-K neighbour lists of every user and every anime from
+the saved, L2-normalized embedding matrices, so serving can read neighbours instead of
+scoring the whole catalogue per request.
+
+Rows are split into query blocks that run in a process pool. Each worker memory-maps the
+embeddings, multiplies its query block against one candidate block at a time and merges
+that block's top-K into a running top-K, so a worker never holds more than
+(query_block x candidate_block) scores. Workers write their rows straight into shared
+`.npy` memmaps of neighbour indices (int32) and cosine scores (float32).
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+
+def block_knn(weights, start, end, top_k, candidate_block):
+    """Exact top-K neighbours (excluding self) of rows [start, end) of `weights`."""
+    queries = np.asarray(weights[start:end], dtype=np.float32)
+    n_rows = len(weights)
+    best_indices = np.empty((end - start, 0), dtype=np.int64)
+    best_scores = np.empty((end - start, 0), dtype=np.float32)
+
+    for candidate_start in range(0, n_rows, candidate_block):
+        candidate_end = min(candidate_start + candidate_block, n_rows)
+        scores = queries @ np.asarray(weights[candidate_start:candidate_end], dtype=np.float32).T
+        # Rows present in both blocks must not be their own neighbour.
+        overlap = np.arange(max(start, candidate_start), min(end, candidate_end))
+        scores[overlap - start, overlap - candidate_start] = -np.inf
+
+        block_indices, block_scores = row_top_k(scores, top_k)
+        merged_indices = np.concatenate((best_indices, block_indices + candidate_start), axis=1)
+        merged_scores = np.concatenate((best_scores, block_scores), axis=1)
+        keep, best_scores = row_top_k(merged_scores, top_k)
+        best_indices = np.take_along_axis(merged_indices, keep, axis=1)
+
+    return best_indices.astype(np.int32), best_scores
+
+
+def _worker_block(weights_path, indices_path, scores_path, start, end, top_k, candidate_block, blas_threads):
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=blas_threads):
+        weights = np.load(weights_path, mmap_mode="r")
+        block_indices, block_scores = block_knn(weights, start, end, top_k, candidate_block)
+    indices = np.load(indices_path, mmap_mode="r+")
+    scores = np.load(scores_path, mmap_mode="r+")
+    indices[start:end] = block_indices
+    scores[start:end] = block_scores
+    indices.flush()
+    scores.flush()
+    return end - start
+
+
+class KnnGraphBuilder:
+    def __init__(self, config):
+        self.config = config
+        self.top_k = config.get("top_k", 50)
+        self.query_block = config.get("query_block", 1024)
+        self.candidate_block = config.get("candidate_block", 16384)
+        self.n_jobs = config.get("n_jobs") or os.cpu_count() or 1
+        self.blas_threads = config.get("blas_threads", 1)
+        logger.info(f"kNN graph builder initialized (top {self.top_k}, {self.n_jobs} workers, "
+                    f"{self.query_block}x{self.candidate_block} blocks).")
+
+    def build(self, weights, indices_path, scores_path):
+        """Writes the (n_rows, top_k) neighbour indices and scores of `weights` to `.npy` files."""
+        try:
+            weights = np.ascontiguousarray(weights, dtype=np.float32)
+            n_rows = len(weights)
+            top_k = min(self.top_k, n_rows - 1)
+            start_time = time.perf_counter()
+
+            np.lib.format.open_memmap(indices_path, mode="w+", dtype=np.int32, shape=(n_rows, top_k)).flush()
+            np.lib.format.open_memmap(scores_path, mode="w+", dtype=np.float32, shape=(n_rows, top_k)).flush()
+            blocks = [(start, min(start + self.query_block, n_rows)) for start in range(0, n_rows, self.query_block)]
+
+            with tempfile.TemporaryDirectory(prefix="knn_") as tmp_dir:
+                weights_path = os.path.join(tmp_dir, "weights.npy")
+                np.save(weights_path, weights)
+                if self.n_jobs > 1 and len(blocks) > 1:
+                    with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                        futures = [executor.submit(_worker_block, weights_path, indices_path, scores_path, start, end,
+                                                   top_k, self.candidate_block, self.blas_threads)
+                                   for start, end in blocks]
+                        for future in futures:
+                            future.result()
+                else:
+                    for start, end in blocks:
+                        _worker_block(weights_path, indices_path, scores_path, start, end, top_k,
+                                      self.candidate_block, None)
+
+            logger.info(f"Top-{top_k} neighbours of {n_rows} rows written to {indices_path} "
+                        f"in {time.perf_counter() - start_time:.1f}s.")
+        except Exception as e:
+            raise CustomException(f"Failed to build kNN graph, {e}", sys)
+
+    def run(self, user_weights_path=USER_WEIGHTS_FILE_PATH, anime_weights_path=ANIME_WEIGHTS_FILE_PATH,
+            output_dir=KNN_DIR):
+        """Builds the user and anime neighbour graphs from the saved embedding weights."""
+        os.makedirs(output_dir, exist_ok=True)
+        for name, weights_path in (("user", user_weights_path), ("anime", anime_weights_path)):
+            self.build(joblib.load(weights_path),
+                       os.path.join(output_dir, f"{name}_knn_indices.npy"),
+                       os.path.join(output_dir, f"{name}_knn_scores.npy"))
+
+
+if __name__ == "__main__":
+    builder = KnnGraphBuilder(read_yaml(CONFIG_PATH).get("knn_graph", {}))
+    builder.run()
@@ -10,11 +10,32 @@ Features:
 - Automatic creation of logs directory if it doesn't exist
 - Daily log files with date stamps
 - Standardized log format with timestamp, log level, and message
+- Optional non-blocking mode: records are queued and written by a background thread,
+  which also does the message formatting, so the calling thread never touches the disk
+- Optional structured JSON output
+- Per-logger sampling and rate limiting of INFO/DEBUG records for hot paths
+  (WARNING and above are always kept)
 - Helper function to get logger instances for different components
+
+Configuration (environment variables, no code changes needed):
+- LOG_LEVEL: Minimum level, e.g. "INFO" (default) or "WARNING".
+- LOG_ASYNC: "true" to enable the queue-based non-blocking mode.
+- LOG_FORMAT: "text" (default) or "json".
+- LOG_SAMPLING: Comma-separated "logger=fraction" pairs, e.g. "utils.helpers=0.1".
+- LOG_RATE_LIMIT: Comma-separated "logger=records_per_second" pairs, e.g. "utils.helpers=50".
+  Logger names match themselves and their children ("utils" covers "utils.helpers").
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+import time
 from datetime import datetime
 
 # Directory to store log files
@@ -24,33 +45,155 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 # Create log file with current date in filename
 LOG_FILE = os.path.join(LOGS_DIR, f"log_{datetime.now().strftime('%Y-%m-%d')}.log")
 
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def _env_flag(name, default=False):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_mapping(name):
+    """Parses "key=value,key=value" from an environment variable into {key: float}."""
+    mapping = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = float(value)
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random fraction of records below WARNING."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket allowing at most `rate` records per second below WARNING."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats each record in the calling thread before enqueueing it;
+    here the record is only copied, so `%`-style arguments are rendered off the hot path.
+    """
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+
+def _build_handlers():
+    formatter = JsonFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else logging.Formatter(LOG_FORMAT)
+    file_handler = logging.FileHandler(LOG_FILE)
+    file_handler.setFormatter(formatter)
+
+    if not _env_flag("LOG_ASYNC"):
+        return [file_handler], None
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued when the interpreter exits.
+    atexit.register(listener.stop)
+    return [DeferredQueueHandler(log_queue)], listener
+
+
+LOG_LEVEL = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+_handlers, _listener = _build_handlers()
+
 # Configure basic logging settings for the application
 logging.basicConfig(
-    filename=LOG_FILE,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level = logging.INFO
+    handlers=_handlers,
+    level=LOG_LEVEL
 )
 
+_SAMPLING = _env_mapping("LOG_SAMPLING")
+_RATE_LIMITS = _env_mapping("LOG_RATE_LIMIT")
+
+
+def _lookup(mapping, name):
+    """Returns the setting for the most specific configured logger name covering `name`."""
+    while name:
+        if name in mapping:
+            return mapping[name]
+        name = name.rpartition(".")[0]
+    return None
+
+
 def get_logger(name):
     """
     Creates and returns a logger instance with the specified name.
-    
+
     This function provides a consistent way to obtain logger instances
     throughout the application, ensuring that all loggers have the same
-    configuration and log to the same file.
-    
+    configuration and log to the same file. Sampling and rate limits configured
+    for the logger's name (or a parent name) are attached once.
+
     Args:
-        name (str): The name for the logger, typically the module name 
+        name (str): The name for the logger, typically the module name
                    or component name that will be using this logger.
-    
+
     Returns:
         logging.Logger: A configured logger instance that will write logs
-                       to the application's log file with INFO level.
-    
+                       to the application's log file at the configured level.
+
     Example:
         >>> logger = get_logger(__name__)
-        >>> logger.info("Processing started")
+        >>> logger.info("Processing started for %s", item)
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    return logger
\ No newline at end of file
+    logger.setLevel(LOG_LEVEL)
+
+    if not getattr(logger, "_anime_recs_filters", False):
+        sample_rate = _lookup(_SAMPLING, name)
+        if sample_rate is not None:
+            logger.addFilter(SamplingFilter(sample_rate))
+        rate_limit = _lookup(_RATE_LIMITS, name)
+        if rate_limit is not None:
+            logger.addFilter(RateLimitFilter(rate_limit))
+        logger._anime_recs_filters = True
+    return logger
@@ -1,29 +1,68 @@
 import os
-import comet_ml
 import numpy as np
 import joblib
+import tensorflow as tf
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, LearningRateScheduler, TensorBoard
 from src.logger import get_logger
 from src.custom_exception import CustomException
 from src.base_model import BaseModel
+from src.numpy_inference import NumpyRecommenderScorer, export_recommender_head, verify_scorer
+from src.experiment_tracking import create_tracker
+from src.training_callbacks import ThroughputCallback
+from src.negative_sampling import build_implicit_datasets
 from config.paths_config import *
+from utils.common_functions import read_yaml
 from dotenv import load_dotenv
 
 logger = get_logger(__name__)
 
+def lr_schedule(training_config):
+    """Linear warm-up to `max_lr`, an optional plateau, then exponential decay towards `min_lr`."""
+    start_lr, min_lr, max_lr = training_config["start_lr"], training_config["min_lr"], training_config["max_lr"]
+    rampup_epochs, sustain_epochs = training_config["rampup_epochs"], training_config["sustain_epochs"]
+    exp_decay = training_config["exp_decay"]
+
+    def lrfn(epoch):
+        if epoch < rampup_epochs:
+            return (max_lr-start_lr)/rampup_epochs*epoch + start_lr
+        elif epoch < rampup_epochs+sustain_epochs:
+            return max_lr
+        else:
+            return(max_lr-min_lr)*exp_decay**(epoch-rampup_epochs-sustain_epochs)+min_lr
+    return lrfn
+
+def rating_dataset(X_array, y, batch_size, shuffle=True):
+    """`tf.data` pipeline of ((user, anime), rating) batches, with rows reshuffled every epoch like `fit` on arrays."""
+    users, anime = tf.constant(np.asarray(X_array[0])), tf.constant(np.asarray(X_array[1]))
+    ratings = tf.constant(np.asarray(y, dtype=np.float32))
+    n_rows = len(y)
+    n_batches = -(-n_rows // batch_size)
+
+    def epoch_batches(_):
+        order = tf.random.shuffle(tf.range(n_rows, dtype=tf.int64)) if shuffle else tf.range(n_rows, dtype=tf.int64)
+        return tf.data.Dataset.range(n_batches).map(lambda index: order[index * batch_size:(index + 1) * batch_size])
+
+    def gather(rows):
+        return (tf.gather(users, rows), tf.gather(anime, rows)), tf.gather(ratings, rows)
+
+    # One permutation per pass over the dataset; batches are gathered by index rather than row by row.
+    dataset = tf.data.Dataset.range(1).flat_map(epoch_batches)
+    return dataset.map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
 class ModelTraining:
-    def __init__(self, data_path):
+    def __init__(self, data_path, config=None):
         try:
             self.data_path = data_path
+            self.config = config if config is not None else read_yaml(CONFIG_PATH)
+            self.training_config = self.config["training"]
             logger.info("Model initialized successfully.")
 
             load_dotenv()
-            self.experiment = comet_ml.Experiment(
-                api_key=os.getenv("COMET_ML_API_KEY"),
-                project_name=os.getenv("COMET_ML_PROJECT_NAME"),
-                workspace=os.getenv("COMET_ML_WORKSPACE")
-                )
-            logger.info("Comet ML experiment initialized successfully.")
+            # Asynchronous by default: the backend (Comet or local files) connects in the background.
+            self.tracking_config = self.config.get("tracking", {})
+            self.tracker = create_tracker(self.tracking_config)
+            self.tracker.log_params({**{f"model.{k}": v for k, v in self.config["model"].items()},
+                                     **{f"training.{k}": v for k, v in self.training_config.items()}})
 
         except Exception as e:
             logger.error("Error initializing model: %s", str(e))
@@ -50,56 +89,45 @@ class ModelTraining:
             n_users = len(joblib.load(USER2USER_ENCODED_PATH))
             n_anime = len(joblib.load(ANIME2ANIME_ENCODED_PATH))
 
-            base_model = BaseModel(config_path=CONFIG_PATH)
+            base_model = BaseModel(config_path=CONFIG_PATH, config=self.config)
 
             model = base_model.RecommenderNet(n_users, n_anime)
 
-            start_lr = 0.00001
-            min_lr = 0.0001
-            max_lr = 0.00005
-            batch_size = 10000
-
-            ramup_epochs = 5
-            sustain_epochs = 0
-            exp_decay = 0.8
-
             os.makedirs(CHECKPOINT_DIR, exist_ok=True)
             os.makedirs(WEIGHTS_DIR, exist_ok=True)
             os.makedirs(MODEL_DIR, exist_ok=True)
 
-            def lrfn(epoch):
-                if epoch < ramup_epochs:
-                    return (max_lr-start_lr)/ramup_epochs*epoch + start_lr
-                elif epoch < ramup_epochs+sustain_epochs:
-                    return max_lr
-                else:
-                    return(max_lr-min_lr)*exp_decay**(epoch-ramup_epochs-sustain_epochs)+min_lr
-                
+            lrfn = lr_schedule(self.training_config)
             lr_callback = LearningRateScheduler(lambda epoch:lrfn(epoch), verbose = 0)
             model_checkpoint = ModelCheckpoint(filepath=CHECKPOINT_FILE_PATH, save_weights_only=True, monitor='val_loss', mode='min', save_best_only=True)
-            early_stopping = EarlyStopping(patience=5, monitor="val_loss", mode="min", restore_best_weights=True)
-            my_callbacks = [model_checkpoint, lr_callback, early_stopping]
+            early_stopping = EarlyStopping(patience=self.training_config["early_stopping_patience"], monitor="val_loss", mode="min", restore_best_weights=True)
+            throughput = ThroughputCallback(self.tracker, self.training_config["batch_size"],
+                                            log_every=self.tracking_config.get("log_every_batches", 50))
+            my_callbacks = [model_checkpoint, lr_callback, early_stopping, throughput]
+
+            implicit_config = self.training_config.get("implicit", {})
+            if implicit_config.get("enabled", False):
+                # Observed pairs as positives plus negatives sampled by the input pipeline.
+                train_data, validation_data = build_implicit_datasets(X_train_array, X_test_array, y_train, y_test,
+                                                                      n_anime, self.training_config["batch_size"],
+                                                                      implicit_config)
+                logger.info("Training on implicit feedback with sampled negatives.")
+            else:
+                train_data = rating_dataset(X_train_array, y_train, self.training_config["batch_size"])
+                validation_data = rating_dataset(X_test_array, y_test, self.training_config["batch_size"], shuffle=False)
+            # Timestamps each batch as the train step takes it, so the callback can tell input waits from compute.
+            fit_data = dict(x=throughput.instrument(train_data), validation_data=validation_data)
 
             try:
-                history = model.fit(
-                                    x = X_train_array,
-                                    y = y_train,
-                                    batch_size = batch_size,
-                                    epochs = 20,
+                model.fit(
+                                    **fit_data,
+                                    epochs = self.training_config["epochs"],
                                     verbose = 1,
-                                    validation_data = (X_test_array, y_test),
                                     callbacks = my_callbacks
                                 )
                 model.load_weights(CHECKPOINT_FILE_PATH)
                 logger.info("Model trained successfully.")
 
-                for epoch in range(len(history.history['loss'])):
-                    train_loss = history.history['loss'][epoch]
-                    val_loss = history.history['val_loss'][epoch]
-
-                    self.experiment.log_metric("train_loss", train_loss, step=epoch)
-                    self.experiment.log_metric("val_loss", val_loss, step=epoch)
-
             except Exception as e:
                 logger.error("Error during model training: %s", str(e))
                 raise CustomException("Error during model training", e)
@@ -109,6 +137,8 @@ class ModelTraining:
         except Exception as e:
             logger.error("Error in train_model: %s", str(e))
             raise CustomException("Error in train_model", e)
+        finally:
+            self.tracker.close()
     
     def extract_weights(self, name, model):
         try:
@@ -132,9 +162,14 @@ class ModelTraining:
             joblib.dump(user_weights, USER_WEIGHTS_FILE_PATH)
             joblib.dump(anime_weights, ANIME_WEIGHTS_FILE_PATH)
 
-            self.experiment.log_asset(MODEL_FILE_PATH)
-            self.experiment.log_asset(USER_WEIGHTS_FILE_PATH)
-            self.experiment.log_asset(ANIME_WEIGHTS_FILE_PATH)
+            # Dense + BatchNorm parameters so serving can score pairs without TensorFlow.
+            head = export_recommender_head(model, RECOMMENDER_HEAD_PATH)
+            verify_scorer(model, NumpyRecommenderScorer(user_weights, anime_weights, head))
+
+            self.tracker.log_asset(MODEL_FILE_PATH)
+            self.tracker.log_asset(USER_WEIGHTS_FILE_PATH)
+            self.tracker.log_asset(ANIME_WEIGHTS_FILE_PATH)
+            self.tracker.log_asset(RECOMMENDER_HEAD_PATH)
 
             logger.info("User and Anime weights saved successfully.")
         except Exception as e:
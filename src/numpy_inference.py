@@ -0,0 +1,128 @@
+"""
+NumPy Inference Module
+
+Reproduces `BaseModel.RecommenderNet` predictions without TensorFlow. The network is
+
+    sigmoid(BatchNorm(Dense(cosine(user_embedding, anime_embedding))))
+
+and, in inference mode, Dense(1) followed by BatchNormalization is a single affine map of
+the cosine similarity. `export_recommender_head` extracts the Dense and BatchNorm
+parameters from a trained Keras model; together with the L2-normalized embeddings that
+`ModelTraining` already saves, `NumpyRecommenderScorer` computes the same predicted
+(scaled) rating for any batch of (user, anime) pairs with plain matrix products.
+"""
+
+import sys
+import joblib
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+
+logger = get_logger(__name__)
+
+# Epsilon used by Keras' l2_normalize inside Dot(normalize=True).
+L2_EPSILON = 1e-12
+
+
+def l2_normalize(weights):
+    """Row-normalizes an embedding matrix exactly like Keras' Dot(normalize=True)."""
+    weights = np.asarray(weights, dtype=np.float32)
+    norms = np.sqrt(np.maximum(np.sum(weights * weights, axis=1, keepdims=True), L2_EPSILON))
+    return weights / norms
+
+
+def export_recommender_head(model, path=RECOMMENDER_HEAD_PATH):
+    """Extracts the Dense and BatchNormalization parameters of a RecommenderNet and saves them."""
+    try:
+        dense = next(layer for layer in model.layers if layer.__class__.__name__ == "Dense")
+        batch_norm = next(layer for layer in model.layers if layer.__class__.__name__ == "BatchNormalization")
+
+        kernel, bias = dense.get_weights()
+        gamma, beta, moving_mean, moving_variance = batch_norm.get_weights()
+        head = {
+            "dense_kernel": float(np.ravel(kernel)[0]),
+            "dense_bias": float(np.ravel(bias)[0]),
+            "bn_gamma": float(np.ravel(gamma)[0]),
+            "bn_beta": float(np.ravel(beta)[0]),
+            "bn_moving_mean": float(np.ravel(moving_mean)[0]),
+            "bn_moving_variance": float(np.ravel(moving_variance)[0]),
+            "bn_epsilon": float(batch_norm.epsilon),
+        }
+        joblib.dump(head, path)
+        logger.info(f"Recommender head parameters exported to {path}.")
+        return head
+    except Exception as e:
+        raise CustomException(f"Failed to export recommender head parameters, {e}", sys)
+
+
+class NumpyRecommenderScorer:
+    """Batch scorer reproducing RecommenderNet's predicted rating from exported parameters."""
+
+    def __init__(self, user_weights, anime_weights, head):
+        self.user_weights = user_weights
+        self.anime_weights = anime_weights
+        # Fold Dense(1) and inference-mode BatchNorm into one affine map: z = scale * cosine + shift.
+        inv_std = head["bn_gamma"] / np.sqrt(head["bn_moving_variance"] + head["bn_epsilon"])
+        self.scale = np.float32(head["dense_kernel"] * inv_std)
+        self.shift = np.float32((head["dense_bias"] - head["bn_moving_mean"]) * inv_std + head["bn_beta"])
+
+    @classmethod
+    def from_files(cls, user_weights_path=USER_WEIGHTS_FILE_PATH, anime_weights_path=ANIME_WEIGHTS_FILE_PATH,
+                   head_path=RECOMMENDER_HEAD_PATH):
+        try:
+            return cls(l2_normalize(joblib.load(user_weights_path)), l2_normalize(joblib.load(anime_weights_path)),
+                       joblib.load(head_path))
+        except Exception as e:
+            raise CustomException(f"Failed to load recommender scorer, {e}", sys)
+
+    def _activate(self, cosine):
+        return 1.0 / (1.0 + np.exp(-(self.scale * cosine + self.shift)))
+
+    def predict(self, users, animes):
+        """Predicted scaled rating for each (encoded user, encoded anime) pair."""
+        users = np.asarray(users, dtype=np.int64)
+        animes = np.asarray(animes, dtype=np.int64)
+        cosine = np.einsum("ij,ij->i", self.user_weights[users], self.anime_weights[animes])
+        return self._activate(cosine)
+
+    def score_user(self, user, animes=None):
+        """Predicted scaled ratings of one encoded user for the given (default: all) encoded anime."""
+        candidates = self.anime_weights if animes is None else self.anime_weights[np.asarray(animes, dtype=np.int64)]
+        return self._activate(candidates @ self.user_weights[user])
+
+    def top_k_for_user(self, user, k=10, exclude=None):
+        """Encoded anime indices and predicted ratings of the user's top-k, skipping `exclude`."""
+        scores = self.score_user(user)
+        if exclude is not None and len(exclude):
+            scores[np.asarray(exclude, dtype=np.int64)] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+
+def verify_scorer(model, scorer, n_samples=1000, atol=1e-4, random_state=42):
+    """Checks the NumPy scorer against Keras predictions on random pairs; returns the max abs error."""
+    rng = np.random.default_rng(random_state)
+    users = rng.integers(0, len(scorer.user_weights), size=n_samples)
+    animes = rng.integers(0, len(scorer.anime_weights), size=n_samples)
+    expected = np.ravel(model.predict([users, animes], batch_size=n_samples, verbose=0))
+    max_error = float(np.max(np.abs(expected - scorer.predict(users, animes))))
+    if max_error > atol:
+        raise ValueError(f"NumPy scorer deviates from the Keras model by {max_error:.2e} (tolerance {atol:.0e})")
+    logger.info(f"NumPy scorer matches the Keras model on {n_samples} pairs (max abs error {max_error:.2e}).")
+    return max_error
+
+
+if __name__ == "__main__":
+    # Export the head of an already trained model without retraining.
+    from tensorflow.keras.models import load_model
+    import src.sparse_optimizers  # registers LazyAdam / RowWiseAdagrad for models compiled with them
+
+    model = load_model(MODEL_FILE_PATH)
+    export_recommender_head(model)
+    scorer = NumpyRecommenderScorer(l2_normalize(model.get_layer("user_embedding").get_weights()[0]),
+                                    l2_normalize(model.get_layer("anime_embedding").get_weights()[0]),
+                                    joblib.load(RECOMMENDER_HEAD_PATH))
+    verify_scorer(model, scorer)
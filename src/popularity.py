@@ -0,0 +1,87 @@
+"""
+Popularity Module
+
+Precomputes the fallback recommendations served when personalised ones cannot be made
+(unknown users, users without preferences, titles that are not in the catalogue). Every
+anime gets a popularity score blending its audience size (`Members`) with a
+Bayesian-weighted average of its `Score`, where the number of ratings in `rating_df`
+decides how far a score is trusted over the catalogue mean. The top titles are stored
+as short name lists for the whole catalogue, for each genre and for each type, so
+serving a fallback is a dictionary lookup and a slice.
+"""
+
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.anime_filters import split_genres
+
+logger = get_logger(__name__)
+
+
+def _normalize(values):
+    """Scales values to [0, 1]; constant inputs map to 0."""
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
+
+
+class PopularityBuilder:
+    def __init__(self, config):
+        self.config = config
+        self.top_n = config.get("top_n", 50)
+        self.members_weight = config.get("members_weight", 0.5)
+        self.min_votes_quantile = config.get("min_votes_quantile", 0.75)
+        logger.info(f"Popularity builder initialized (top {self.top_n}, members weight {self.members_weight}).")
+
+    def score(self, anime_df, rating_df):
+        """Popularity score per anime_df row."""
+        members = pd.to_numeric(anime_df["Members"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        scores = pd.to_numeric(anime_df["Score"], errors="coerce")
+        votes = anime_df["anime_id"].map(rating_df["anime_id"].value_counts()).fillna(0).to_numpy(dtype=np.float64)
+
+        # Weighted rating: titles with few ratings are pulled towards the catalogue mean.
+        mean_score = scores.mean() if scores.notna().any() else 0.0
+        scores = scores.fillna(mean_score).to_numpy(dtype=np.float64)
+        min_votes = max(np.quantile(votes, self.min_votes_quantile), 1.0)
+        weighted = votes / (votes + min_votes) * scores + min_votes / (votes + min_votes) * mean_score
+
+        return self.members_weight * _normalize(np.log1p(members)) + (1 - self.members_weight) * _normalize(weighted)
+
+    def _top_names(self, frame, order):
+        names = frame["eng_version"].to_numpy()[order]
+        names = pd.unique(names[pd.notna(names)])
+        return list(names[:self.top_n])
+
+    def build(self, anime_df, rating_df):
+        """Returns the fallback tables: global, per-genre and per-type top name lists."""
+        try:
+            anime_df = anime_df.drop_duplicates("anime_id").reset_index(drop=True)
+            order = np.argsort(-self.score(anime_df, rating_df), kind="stable")
+            ranked = anime_df.iloc[order].reset_index(drop=True)
+
+            genres = ranked["Genres"].map(split_genres)
+            tables = {
+                "global": self._top_names(ranked, np.arange(len(ranked))),
+                "genres": {},
+                "types": {},
+            }
+            for genre in sorted({genre for row in genres for genre in row}):
+                rows = np.flatnonzero(genres.map(lambda row: genre in row).to_numpy())
+                tables["genres"][genre] = self._top_names(ranked, rows)
+            for anime_type, rows in ranked.groupby("Type", sort=True).indices.items():
+                tables["types"][anime_type] = self._top_names(ranked, np.sort(rows))
+
+            logger.info(f"Popularity tables built: {len(tables['genres'])} genres, {len(tables['types'])} types.")
+            return tables
+        except Exception as e:
+            raise CustomException(f"Failed to build popularity tables, {e}", sys)
+
+    def save(self, tables, path=POPULARITY_TABLES_PATH):
+        try:
+            joblib.dump(tables, path)
+            logger.info(f"Popularity tables saved to {path}.")
+        except Exception as e:
+            raise CustomException(f"Failed to save popularity tables, {e}", sys)
@@ -0,0 +1,136 @@
+"""
+Sparse Optimizers Module
+
+Optimizers that update only the embedding rows present in a batch.
+
+The gradient of an `Embedding` layer reaches the optimizer as a `tf.IndexedSlices`: one
+row per looked-up id. Keras' built-in Adam densifies it, so every step reads and writes
+the moment slots of the whole user and anime tables, even though a batch touches only a
+few thousand rows. With `n_users` in the hundreds of thousands, that dominates the step.
+
+* `LazyAdam` applies the Adam update to the touched rows of the variable and its two
+  slots only. Rows that are absent from a batch keep their moments unchanged instead of
+  decaying them. This is the usual lazy-Adam approximation. Memory is the same as Adam:
+  two slots the size of each table. Repeated ids in a batch are summed before the update,
+  so a row's step matches dense Adam on the summed gradient.
+* `RowWiseAdagrad` keeps a single accumulator per embedding row, holding the mean squared
+  gradient of that row, and updates touched rows only. Its state is `1 / embedding_size`
+  of one Adam slot.
+
+Dense gradients (Dense and BatchNorm layers) fall back to the regular update in both.
+Select one with `model.optimizer` in `config.yaml`: "Adam", "LazyAdam" or "RowWiseAdagrad".
+
+Both subclass the Keras 3 optimizer (`update_step`, the `_momentums`/`_velocities` slots and
+`variable.path`), so they need TensorFlow 2.16 or newer; `requirements.txt` pins it.
+"""
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.initializers import Constant
+from tensorflow.keras.optimizers import Adam, Optimizer
+from tensorflow.keras.utils import register_keras_serializable
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+OPTIMIZERS = ("Adam", "LazyAdam", "RowWiseAdagrad")
+
+
+def _dedupe(gradient):
+    """Unique row indices of an IndexedSlices gradient and the summed gradient of each row."""
+    indices, positions = tf.unique(gradient.indices)
+    values = tf.math.unsorted_segment_sum(gradient.values, positions, tf.shape(indices)[0])
+    return indices, values
+
+
+@register_keras_serializable(package="anime_recommender")
+class LazyAdam(Adam):
+    """Adam that updates the variable and moment rows of sparse gradients only."""
+
+    def __init__(self, **kwargs):
+        if kwargs.get("amsgrad"):
+            raise ValueError("LazyAdam does not support amsgrad")
+        super().__init__(**kwargs)
+
+    def update_step(self, gradient, variable, learning_rate):
+        if not isinstance(gradient, tf.IndexedSlices):
+            return super().update_step(gradient, variable, learning_rate)
+
+        dtype = variable.dtype
+        lr = tf.cast(learning_rate, dtype)
+        local_step = tf.cast(self.iterations + 1, dtype)
+        beta_1 = tf.cast(self.beta_1, dtype)
+        beta_2 = tf.cast(self.beta_2, dtype)
+        alpha = lr * tf.sqrt(1 - tf.pow(beta_2, local_step)) / (1 - tf.pow(beta_1, local_step))
+
+        indices, values = _dedupe(gradient)
+        values = tf.cast(values, dtype)
+        m = self._momentums[self._get_variable_index(variable)]
+        v = self._velocities[self._get_variable_index(variable)]
+
+        m_rows = beta_1 * tf.gather(m, indices) + (1 - beta_1) * values
+        v_rows = beta_2 * tf.gather(v, indices) + (1 - beta_2) * tf.square(values)
+        self.assign(m, tf.IndexedSlices(m_rows, indices))
+        self.assign(v, tf.IndexedSlices(v_rows, indices))
+        self.assign_sub(variable, tf.IndexedSlices(alpha * m_rows / (tf.sqrt(v_rows) + self.epsilon), indices))
+
+
+@register_keras_serializable(package="anime_recommender")
+class RowWiseAdagrad(Optimizer):
+    """Adagrad with one accumulator per row of every 2-D variable (per element for 1-D ones)."""
+
+    def __init__(self, learning_rate=0.01, initial_accumulator_value=0.1, epsilon=1e-7,
+                 name="row_wise_adagrad", **kwargs):
+        super().__init__(learning_rate=learning_rate, name=name, **kwargs)
+        self.initial_accumulator_value = initial_accumulator_value
+        self.epsilon = epsilon
+
+    def build(self, var_list):
+        if self.built:
+            return
+        super().build(var_list)
+        self._accumulators = []
+        for variable in var_list:
+            shape = (variable.shape[0], 1) if len(variable.shape) == 2 else variable.shape
+            self._accumulators.append(self.add_variable(
+                shape=shape, initializer=Constant(self.initial_accumulator_value),
+                dtype=variable.dtype, name=f"{variable.path.replace('/', '_')}_accumulator"))
+
+    def update_step(self, gradient, variable, learning_rate):
+        lr = tf.cast(learning_rate, variable.dtype)
+        accumulator = self._accumulators[self._get_variable_index(variable)]
+        row_wise = len(variable.shape) == 2
+
+        if isinstance(gradient, tf.IndexedSlices):
+            indices, values = _dedupe(gradient)
+            values = tf.cast(values, variable.dtype)
+            squares = tf.reduce_mean(tf.square(values), axis=1, keepdims=True) if row_wise else tf.square(values)
+            rows = tf.gather(accumulator, indices) + squares
+            self.assign(accumulator, tf.IndexedSlices(rows, indices))
+            self.assign_sub(variable, tf.IndexedSlices(lr * values / tf.sqrt(rows + self.epsilon), indices))
+            return
+
+        gradient = tf.cast(gradient, variable.dtype)
+        squares = tf.reduce_mean(tf.square(gradient), axis=1, keepdims=True) if row_wise else tf.square(gradient)
+        self.assign_add(accumulator, squares)
+        self.assign_sub(variable, lr * gradient / tf.sqrt(accumulator + self.epsilon))
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({"initial_accumulator_value": self.initial_accumulator_value, "epsilon": self.epsilon})
+        return config
+
+
+def get_optimizer(name):
+    """Keras optimizer for `model.optimizer`; built-in names are passed through as strings."""
+    if name == "LazyAdam":
+        return LazyAdam()
+    if name == "RowWiseAdagrad":
+        return RowWiseAdagrad()
+    return name
+
+
+def optimizer_state_bytes(optimizer):
+    """Bytes held by the optimizer's slot variables (excluding the iteration counter and learning rate)."""
+    return sum(int(np.prod(variable.shape)) * np.dtype(variable.dtype).itemsize
+               for variable in optimizer.variables if len(variable.shape) > 0)
@@ -0,0 +1,176 @@
+"""
+Stage Cache Module
+
+Runs the training pipeline as a small DAG of stages and skips every stage whose inputs
+have not changed since its outputs were produced. A stage's fingerprint is a SHA-256 over
+the content hashes of its input files (data and the source files implementing it) and
+its config parameters. Dependencies only order the stages: a downstream stage lists the
+upstream outputs it reads as inputs, so it reruns when those change and is still skipped
+when an upstream rerun reproduces identical files. Fingerprints, output files and timings
+are recorded in a JSON manifest next to the artifacts.
+
+Hashing large raw CSVs on every run would itself take a while, so file digests are cached
+in the manifest under each file's (size, mtime) and only recomputed when either changes.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+
+logger = get_logger(__name__)
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_files(*objects):
+    """Source files defining the given classes/functions, to fingerprint a stage's code."""
+    return [inspect.getsourcefile(obj) for obj in objects]
+
+
+def _expand(paths):
+    """Input paths with directories replaced by the files they contain, in a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+    return files
+
+
+class Stage:
+    """One pipeline step: `run()` reads `inputs` and writes `outputs`, configured by `params`."""
+
+    def __init__(self, name, run, inputs=(), outputs=(), params=None, deps=()):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.deps = list(deps)
+
+
+class StageRunner:
+    def __init__(self, stages, manifest_path=STAGE_MANIFEST_PATH, force=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.manifest_path = manifest_path
+        self.force = force
+        self.manifest = self._load_manifest()
+        self.timings = []
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stages": {}, "files": {}}
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def file_digest(self, path):
+        """SHA-256 of a file, reused from the manifest while its size and mtime are unchanged."""
+        stat = os.stat(path)
+        cached = self.manifest["files"].get(path)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        digest = _sha256_file(path)
+        self.manifest["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def order(self):
+        """Stage names in dependency order; raises on unknown dependencies and cycles."""
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Stage '{path[-1]}' depends on unknown stage '{name}'")
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return ordered
+
+    def fingerprint(self, stage):
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Stage '{stage.name}' is missing inputs: {missing}")
+        payload = {
+            "inputs": {path: self.file_digest(path) for path in _expand(stage.inputs)},
+            "params": stage.params,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_fresh(self, stage, fingerprint):
+        record = self.manifest["stages"].get(stage.name)
+        return (not self.force and record is not None and record["fingerprint"] == fingerprint
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def run(self):
+        """Runs every stale stage in dependency order and returns the per-stage timings."""
+        pipeline_start = time.perf_counter()
+        for name in self.order():
+            try:
+                self.run_stage(self.stages[name])
+            except Exception as e:
+                raise CustomException(f"Stage '{name}' failed, {e}", sys)
+        self.log_summary(time.perf_counter() - pipeline_start)
+        return self.timings
+
+    def run_stage(self, stage):
+        start = time.perf_counter()
+        fingerprint = self.fingerprint(stage)
+        hash_s = time.perf_counter() - start
+
+        if self.is_fresh(stage, fingerprint):
+            status = "skipped"
+            logger.info(f"Stage '{stage.name}' is up to date, skipping.")
+        else:
+            status = "ran"
+            logger.info(f"Running stage '{stage.name}'...")
+            stage.run()
+            missing = [path for path in stage.outputs if not os.path.exists(path)]
+            if missing:
+                raise FileNotFoundError(f"Stage '{stage.name}' did not produce outputs: {missing}")
+
+        seconds = time.perf_counter() - start
+        self.timings.append({"stage": stage.name, "status": status, "seconds": seconds, "hash_seconds": hash_s})
+        self.manifest["stages"][stage.name] = {"fingerprint": fingerprint, "outputs": stage.outputs,
+                                               "status": status, "seconds": seconds,
+                                               "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        # Saved after every stage so a later failure keeps the finished stages cached.
+        self._save_manifest()
+
+    def log_summary(self, total_s):
+        lines = [f"  {t['stage']:<24} {t['status']:<8} {t['seconds']:>9.2f}s (hashing {t['hash_seconds']:.2f}s)"
+                 for t in self.timings]
+        logger.info("Stage summary:\n" + "\n".join(lines) + f"\n  {'total':<24} {'':<8} {total_s:>9.2f}s")
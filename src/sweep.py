@@ -0,0 +1,225 @@
+"""
+Sweep Module
+
+Hyperparameter sweep for the recommender. The processed training and validation arrays
+are loaded once and copied into `multiprocessing.shared_memory` blocks; every trial
+process attaches to those blocks instead of reloading `X_train_array.pkl`. Trials run in
+a process pool, each limited to `threads_per_trial` TensorFlow/BLAS threads so parallel
+trials do not oversubscribe the cores.
+
+A trial is a set of overrides of `config.yaml` keys (`model.embedding_size`,
+`training.batch_size`, `training.max_lr`, ...) drawn from the `sweep.search_space`
+grid. Bad trials are stopped early with the median stopping rule: after `grace_epochs`,
+a trial whose best val_loss so far is worse than the median of the other trials' best
+val_loss at the same epoch is stopped. Results are written as a leaderboard (CSV and
+JSON) under `artifacts/sweeps/`, best val_loss first.
+
+Usage:
+    python -m src.sweep
+    python -m src.sweep --n-trials 12 --n-parallel 4 --threads-per-trial 2
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import joblib
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml
+from utils.shared_memory import SharedArrays
+
+logger = get_logger(__name__)
+
+# Set per trial process by _init_trial_worker.
+_worker_arrays = None
+_worker_blocks = None
+_worker_histories = None
+
+
+def _init_trial_worker(handles, threads, histories):
+    global _worker_arrays, _worker_blocks, _worker_histories
+    # Thread limits must be in place before TensorFlow is first imported in this process.
+    for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                     "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[variable] = str(threads)
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    _worker_arrays, _worker_blocks = SharedArrays.attach(handles)
+    _worker_histories = histories
+
+
+def apply_overrides(config, params):
+    """Copy of `config` with dotted keys (`training.batch_size`) replaced by the trial's values."""
+    config = copy.deepcopy(config)
+    for key, value in params.items():
+        section, _, name = key.rpartition(".")
+        target = config
+        for part in section.split(".") if section else []:
+            target = target.setdefault(part, {})
+        target[name] = value
+    return config
+
+
+def median_stopping_callback(trial_id, histories, grace_epochs, min_trials):
+    """Keras callback stopping a trial whose best val_loss trails the median of the other trials."""
+    from tensorflow.keras.callbacks import Callback
+
+    class MedianStopping(Callback):
+        def __init__(self):
+            super().__init__()
+            self.best = np.inf
+            self.pruned_at = None
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.best = min(self.best, (logs or {}).get("val_loss", np.inf))
+            histories[trial_id] = histories.get(trial_id, []) + [self.best]
+            if epoch + 1 < grace_epochs:
+                return
+            others = [history[epoch] for other_id, history in histories.items()
+                      if other_id != trial_id and len(history) > epoch]
+            if len(others) >= min_trials and self.best > np.median(others):
+                logger.info(f"Trial {trial_id} stopped at epoch {epoch + 1}: best val_loss {self.best:.5f} "
+                            f"> median {np.median(others):.5f} of {len(others)} trials.")
+                self.pruned_at = epoch + 1
+                self.model.stop_training = True
+
+    return MedianStopping()
+
+
+def run_trial(trial_id, params, config, sweep_config):
+    """Trains one configuration on the shared arrays and returns its leaderboard row."""
+    from tensorflow.keras.callbacks import EarlyStopping, LearningRateScheduler
+    from src.base_model import BaseModel
+    from src.model_training import lr_schedule
+
+    start = time.perf_counter()
+    config = apply_overrides(config, params)
+    training_config = config["training"]
+    arrays = _worker_arrays
+
+    model = BaseModel(config_path=CONFIG_PATH, config=config).RecommenderNet(int(arrays["n_users"][0]),
+                                                                             int(arrays["n_anime"][0]))
+    lrfn = lr_schedule(training_config)
+    pruning = median_stopping_callback(trial_id, _worker_histories, sweep_config.get("grace_epochs", 3),
+                                       sweep_config.get("min_trials", 3))
+    callbacks = [LearningRateScheduler(lambda epoch: lrfn(epoch), verbose=0),
+                 EarlyStopping(patience=training_config["early_stopping_patience"], monitor="val_loss", mode="min"),
+                 pruning]
+    history = model.fit(x=[arrays["x_train_user"], arrays["x_train_anime"]], y=arrays["y_train"],
+                        batch_size=training_config["batch_size"], epochs=training_config["epochs"], verbose=0,
+                        validation_data=([arrays["x_test_user"], arrays["x_test_anime"]], arrays["y_test"]),
+                        callbacks=callbacks).history
+
+    best_epoch = int(np.argmin(history["val_loss"]))
+    row = {"trial": trial_id, **params,
+           "val_loss": float(history["val_loss"][best_epoch]), "best_epoch": best_epoch + 1,
+           "epochs_run": len(history["val_loss"]), "pruned_at": pruning.pruned_at,
+           "wall_seconds": time.perf_counter() - start}
+    for metric in config["model"]["metrics"]:
+        if f"val_{metric}" in history:
+            row[f"val_{metric}"] = float(history[f"val_{metric}"][best_epoch])
+    return row
+
+
+class SweepRunner:
+    def __init__(self, config, output_dir=SWEEP_DIR):
+        self.config = config
+        self.sweep_config = config.get("sweep", {})
+        self.n_parallel = self.sweep_config.get("n_parallel", 2)
+        self.threads_per_trial = self.sweep_config.get("threads_per_trial", 2)
+        self.n_trials = self.sweep_config.get("n_trials")
+        self.seed = self.sweep_config.get("seed", 42)
+        self.search_space = self.sweep_config.get("search_space", {})
+        self.output_dir = os.path.join(output_dir, time.strftime("%Y%m%d-%H%M%S"))
+        logger.info(f"Sweep runner initialized ({self.n_parallel} parallel trials, "
+                    f"{self.threads_per_trial} threads each).")
+
+    def trials(self):
+        """Parameter sets to try: the full search-space grid, or `n_trials` sampled from it."""
+        keys = sorted(self.search_space)
+        grid = [dict(zip(keys, values)) for values in itertools.product(*(self.search_space[key] for key in keys))]
+        if self.n_trials and self.n_trials < len(grid):
+            rng = np.random.default_rng(self.seed)
+            grid = [grid[i] for i in sorted(rng.choice(len(grid), size=self.n_trials, replace=False))]
+        return grid
+
+    def load_arrays(self):
+        """The processed training and validation arrays, loaded once for every trial."""
+        X_train_array, X_test_array = joblib.load(X_TRAIN_ARRAY_PATH), joblib.load(X_TEST_ARRAY_PATH)
+        return {
+            "x_train_user": np.asarray(X_train_array[0]), "x_train_anime": np.asarray(X_train_array[1]),
+            "y_train": np.asarray(joblib.load(Y_TRAIN_PATH), dtype=np.float32),
+            "x_test_user": np.asarray(X_test_array[0]), "x_test_anime": np.asarray(X_test_array[1]),
+            "y_test": np.asarray(joblib.load(Y_TEST_PATH), dtype=np.float32),
+            "n_users": np.array([len(joblib.load(USER2USER_ENCODED_PATH))]),
+            "n_anime": np.array([len(joblib.load(ANIME2ANIME_ENCODED_PATH))]),
+        }
+
+    def run(self, arrays=None):
+        """Runs every trial and returns the leaderboard, best val_loss first."""
+        trials = self.trials()
+        shared = None
+        try:
+            shared = SharedArrays(arrays if arrays is not None else self.load_arrays())
+            logger.info(f"Running {len(trials)} trials over {sorted(self.search_space)}.")
+            # Spawned workers, so TensorFlow is never initialized before a fork.
+            context = multiprocessing.get_context("spawn")
+            with context.Manager() as manager:
+                histories = manager.dict()
+                rows = []
+                with ProcessPoolExecutor(max_workers=self.n_parallel, mp_context=context,
+                                         initializer=_init_trial_worker,
+                                         initargs=(shared.handles, self.threads_per_trial, histories)) as executor:
+                    futures = {executor.submit(run_trial, trial_id, params, self.config, self.sweep_config): trial_id
+                               for trial_id, params in enumerate(trials)}
+                    for future in as_completed(futures):
+                        row = future.result()
+                        rows.append(row)
+                        logger.info(f"Trial {row['trial']} finished: val_loss {row['val_loss']:.5f} "
+                                    f"in {row['wall_seconds']:.1f}s ({row['epochs_run']} epochs).")
+
+            leaderboard = pd.DataFrame(rows).sort_values("val_loss", kind="stable").reset_index(drop=True)
+            self.save(leaderboard)
+            return leaderboard
+        except Exception as e:
+            raise CustomException(f"Sweep failed, {e}", sys)
+        finally:
+            if shared is not None:
+                shared.close()
+
+    def save(self, leaderboard):
+        os.makedirs(self.output_dir, exist_ok=True)
+        leaderboard.to_csv(os.path.join(self.output_dir, "leaderboard.csv"), index=False)
+        with open(os.path.join(self.output_dir, "leaderboard.json"), "w") as f:
+            json.dump({"search_space": self.search_space, "trials": leaderboard.to_dict(orient="records")},
+                      f, indent=2, default=str)
+        logger.info(f"Leaderboard saved to {self.output_dir}:\n{leaderboard.to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a hyperparameter sweep over the recommender.")
+    parser.add_argument("--n-trials", type=int, help="Override sweep.n_trials.")
+    parser.add_argument("--n-parallel", type=int, help="Override sweep.n_parallel.")
+    parser.add_argument("--threads-per-trial", type=int, help="Override sweep.threads_per_trial.")
+    parser.add_argument("--epochs", type=int, help="Override training.epochs for every trial.")
+    args = parser.parse_args()
+
+    config = read_yaml(CONFIG_PATH)
+    for key, value in (("n_trials", args.n_trials), ("n_parallel", args.n_parallel),
+                       ("threads_per_trial", args.threads_per_trial)):
+        if value is not None:
+            config.setdefault("sweep", {})[key] = value
+    if args.epochs is not None:
+        config["training"]["epochs"] = args.epochs
+    SweepRunner(config).run()
@@ -0,0 +1,74 @@
+"""
+Synopsis Index Module
+
+Builds a text-similarity index over the `sypnopsis` column of `synopsis_df`. Synopses are
+tokenized into a sparse, L2-normalized TF-IDF matrix, so cosine similarity between two
+titles is a sparse dot product. The all-pairs product is computed one block of rows at a
+time and reduced to each title's top-K neighbours straight away, which keeps memory at
+(block_size x n_titles) and leaves serving with a table lookup per query.
+"""
+
+import sys
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+
+class SynopsisIndexBuilder:
+    def __init__(self, config):
+        self.config = config
+        self.top_k = config.get("top_k", 50)
+        self.block_size = config.get("block_size", 2048)
+        self.vectorizer = TfidfVectorizer(
+            stop_words="english",
+            max_features=config.get("max_features", 50000),
+            min_df=config.get("min_df", 2),
+            max_df=config.get("max_df", 1.0),
+            sublinear_tf=True,
+            dtype=np.float32,
+        )
+        logger.info(f"Synopsis index builder initialized (top {self.top_k}, blocks of {self.block_size}).")
+
+    def build(self, synopsis_df):
+        """Returns the index as a dict of anime_ids, neighbors (row positions) and scores."""
+        try:
+            texts = synopsis_df["sypnopsis"].fillna("").astype(str).values
+            anime_ids = synopsis_df["MAL_ID"].values.astype(np.int64)
+            matrix = self.vectorizer.fit_transform(texts).tocsr()
+            n_titles = matrix.shape[0]
+            top_k = min(self.top_k, max(n_titles - 1, 1))
+            logger.info(f"TF-IDF matrix built: {n_titles} synopses, {matrix.shape[1]} terms, {matrix.nnz} non-zeros.")
+
+            neighbors = np.full((n_titles, top_k), -1, dtype=np.int32)
+            scores = np.zeros((n_titles, top_k), dtype=np.float32)
+            matrix_t = matrix.T.tocsc()
+            for start in range(0, n_titles, self.block_size):
+                end = min(start + self.block_size, n_titles)
+                block = (matrix[start:end] @ matrix_t).toarray()
+                # A title is not its own neighbour.
+                block[np.arange(end - start), np.arange(start, end)] = 0.0
+                block_ids, block_scores = row_top_k(block, top_k)
+                block_ids = block_ids.astype(np.int32)
+                # Titles sharing no terms are padding, not neighbours.
+                block_ids[block_scores <= 0] = -1
+                block_scores[block_scores <= 0] = 0.0
+                neighbors[start:end] = block_ids
+                scores[start:end] = block_scores
+
+            logger.info(f"Computed top-{top_k} synopsis neighbours for {n_titles} titles.")
+            return {"anime_ids": anime_ids, "neighbors": neighbors, "scores": scores}
+        except Exception as e:
+            raise CustomException(f"Failed to build synopsis index, {e}", sys)
+
+    def save(self, index, path=SYNOPSIS_INDEX_PATH):
+        try:
+            joblib.dump(index, path)
+            logger.info(f"Synopsis index saved to {path}.")
+        except Exception as e:
+            raise CustomException(f"Failed to save synopsis index, {e}", sys)
@@ -0,0 +1,127 @@
+"""
+Training Callbacks Module
+
+Keras callbacks that report to an experiment tracker while `fit` runs instead of after it
+returns.
+
+`ThroughputCallback` times every training batch and splits it into two parts:
+
+* data wait: from the train step asking the input pipeline for a batch until it gets one.
+* compute: the rest of the step, from `on_train_batch_begin` to `on_train_batch_end`.
+
+Keras fetches the input inside the compiled train step, so callbacks alone cannot see the
+wait. `instrument` therefore wraps the end of the training `tf.data` pipeline. It records
+the host time of each `get_next` request and the time the batch comes out of the
+pipeline's final prefetch buffer. Both stamps run synchronously in the step's `get_next`,
+because prefetch injection is turned off for the wrapper. A batch that was already
+buffered is delivered at once. A stalled pipeline shows up as the delay between the two.
+Each step's wait is paired with its own compute time. Without `instrument`, only step and
+compute times are reported.
+
+Every `log_every` batches, it reports step time (mean/p95 over the per-step totals),
+examples per second and the fraction of step time spent waiting for input. A high wait
+fraction points at an input-pipeline stall. Epoch-level losses and the epoch's
+throughput are logged at the end of each epoch.
+"""
+
+import collections
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+
+class ThroughputCallback(Callback):
+    def __init__(self, tracker, batch_size, log_every=50):
+        super().__init__()
+        self.tracker = tracker
+        self.batch_size = batch_size
+        self.log_every = log_every
+        self.global_step = 0
+        self.instrumented = False
+        # (requested, delivered) times recorded by the instrumented pipeline; appended from tf.data threads.
+        self._deliveries = collections.deque(maxlen=64)
+        self._reset_window()
+
+    def _reset_window(self):
+        self._steps = []
+        self._waits = []
+
+    def _record_request(self):
+        return time.perf_counter()
+
+    def _record_delivery(self, requested):
+        self._deliveries.append((float(requested), time.perf_counter()))
+        return 0.0
+
+    def instrument(self, dataset):
+        """`dataset` with the time the train step asked for each batch and the time it got it recorded."""
+        def requested(_):
+            return tf.py_function(self._record_request, [], tf.float64)
+
+        def delivered(request_time, element):
+            stamp = tf.py_function(self._record_delivery, [request_time], tf.float64)
+            with tf.control_dependencies([stamp]):
+                return tf.nest.map_structure(tf.identity, element)
+
+        # Zip pulls from its inputs in order, so the request is stamped before the batch is taken from the pipeline.
+        requests = tf.data.Dataset.from_tensors(0).repeat().map(requested)
+        options = tf.data.Options()
+        # Both stamps have to run when the step pulls the batch, not ahead of it in an injected prefetch.
+        options.experimental_optimization.inject_prefetch = False
+        options.experimental_optimization.map_parallelization = False
+        self.instrumented = True
+        return tf.data.Dataset.zip((requests, dataset)).map(delivered).with_options(options)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._epoch_steps = 0
+        self._epoch_wait = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        end = time.perf_counter()
+        step = end - self._batch_start
+        # Batches requested since the step began are the ones it consumed.
+        wait = sum(delivered - requested for requested, delivered in self._deliveries if requested >= self._batch_start)
+        self._deliveries.clear()
+        self._steps.append(step)
+        self._waits.append(wait)
+        self.global_step += 1
+        self._epoch_steps += 1
+        if len(self._steps) >= self.log_every:
+            self._flush(logs)
+
+    def _flush(self, logs=None):
+        steps, waits = np.asarray(self._steps), np.asarray(self._waits)
+        step = steps.mean()
+        metrics = {
+            "step_time_ms": step * 1e3,
+            "step_time_p95_ms": np.percentile(steps, 95) * 1e3,
+            "compute_ms": (steps - waits).mean() * 1e3,
+            "examples_per_sec": self.batch_size / step if step > 0 else 0.0,
+        }
+        if self.instrumented:
+            metrics["data_wait_ms"] = waits.mean() * 1e3
+            metrics["data_wait_p95_ms"] = np.percentile(waits, 95) * 1e3
+            metrics["data_wait_fraction"] = waits.sum() / steps.sum() if steps.sum() > 0 else 0.0
+        if logs and "loss" in logs:
+            metrics["batch_loss"] = logs["loss"]
+        self.tracker.log_metrics(metrics, step=self.global_step)
+        self._epoch_wait += waits.sum()
+        self._reset_window()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self._steps:
+            self._flush()
+        elapsed = time.perf_counter() - self._epoch_start
+        # Same metric names the training loop logged after `fit` before this callback existed.
+        metrics = {("train_loss" if name == "loss" else name): float(value) for name, value in (logs or {}).items()
+                   if np.isscalar(value)}
+        metrics["epoch_seconds"] = elapsed
+        metrics["epoch_examples_per_sec"] = self._epoch_steps * self.batch_size / elapsed if elapsed > 0 else 0.0
+        if self.instrumented:
+            metrics["epoch_data_wait_fraction"] = self._epoch_wait / elapsed if elapsed > 0 else 0.0
+        self.tracker.log_metrics(metrics, step=epoch)
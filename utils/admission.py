@@ -0,0 +1,227 @@
+"""
+Admission Control Module
+
+Keeps the recommendation routes responsive under overload instead of letting every
+request queue up and time out together.
+
+* `AdmissionController` caps the recommendations computed at once (`max_in_flight`).
+  Up to `max_queue` further requests wait for a slot, for at most `queue_timeout_s` and
+  never past their own deadline. Beyond that, requests are shed immediately.
+* `Deadline` is created when a request arrives and passed down the serving path.
+  `hybrid_recommendation` and `find_similar_anime` check it between stages and stop
+  with `DeadlineExceeded` instead of finishing work nobody is waiting for. The check is cooperative, so a stage
+  that has already started still runs to completion.
+* `ResultCache` keeps recent successful results, keyed by request.
+
+`serve` ties them together. A request that is shed, times out in the queue or exceeds
+its deadline is degraded: it gets its last cached result, then the precomputed
+popularity list, and only then `ServiceUnavailable` (HTTP 503). Every admitted, shed and
+degraded request is counted in `/metrics`.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from src.logger import get_logger
+from utils.metrics import (ADMISSION_EVENTS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, CACHE_EVENTS, DEGRADED_REQUESTS,
+                           QUEUE_WAIT_SECONDS)
+
+logger = get_logger(__name__)
+
+_RESULT_HIT = CACHE_EVENTS.labels("results", "hit")
+_RESULT_MISS = CACHE_EVENTS.labels("results", "miss")
+
+
+class DeadlineExceeded(Exception):
+    """Raised by `Deadline.check` once a request has used up its time budget."""
+
+
+class Overloaded(Exception):
+    """Raised by `AdmissionController.admit` when a request is not given a slot; `reason` says why."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ServiceUnavailable(Exception):
+    """No result and no fallback could be served; the route answers 503."""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """Absolute point in time by which a request has to be answered."""
+
+    def __init__(self, timeout_s):
+        self.timeout_s = timeout_s
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage=None):
+        """Raises `DeadlineExceeded` when the deadline has passed; called between recommendation stages."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.timeout_s * 1e3:.0f} ms exceeded"
+                                   + (f" before {stage}" if stage else ""))
+
+
+class AdmissionController:
+    """Bounded number of requests in flight plus a bounded, time-limited wait for a slot."""
+
+    def __init__(self, max_in_flight=8, max_queue=32, queue_timeout_s=0.5):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def admit(self, deadline=None):
+        """Context manager holding a slot for the request, or raising `Overloaded`."""
+        if not self._slots.acquire(blocking=False):
+            self._wait_for_slot(deadline)
+        with self._lock:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight)
+        return _Admission(self)
+
+    def _wait_for_slot(self, deadline):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                raise Overloaded("queue_full")
+            self.waiting += 1
+            ADMISSION_QUEUED.set(self.waiting)
+        start = time.perf_counter()
+        try:
+            timeout = self.queue_timeout_s if deadline is None else min(self.queue_timeout_s, deadline.remaining())
+            if not self._slots.acquire(timeout=timeout):
+                raise Overloaded("queue_timeout")
+        finally:
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+            with self._lock:
+                self.waiting -= 1
+                ADMISSION_QUEUED.set(self.waiting)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight)
+        self._slots.release()
+
+
+class _Admission:
+    __slots__ = ("_controller",)
+
+    def __init__(self, controller):
+        self._controller = controller
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._controller._release()
+        return False
+
+
+class ResultCache:
+    """Thread-safe LRU of recent results with a time-to-live."""
+
+    def __init__(self, max_entries=10000, ttl_s=600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_s:
+                _RESULT_MISS.inc()
+                return None
+            self._entries.move_to_end(key)
+        _RESULT_HIT.inc()
+        return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def normalize_title(name):
+    """Title as the name lookup (`getAnimeFrame`) compares it: lower-cased."""
+    return str(name).lower()
+
+
+def request_key(kind, key, filters=None):
+    """Hashable cache key for a recommendation request and its filters; titles differing only in case share one."""
+    key = normalize_title(key) if kind == "anime" else int(key)
+    filter_items = tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                                for name, value in (filters or {}).items()))
+    return kind, key, filter_items
+
+
+class AdmissionPolicy:
+    """Admission, deadlines and the degradation ladder for one app, built from the `admission` config."""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.timeout_s = config.get("deadline_ms", 1000) / 1e3
+        self.retry_after = config.get("retry_after_s", 1)
+        self.controller = AdmissionController(config.get("max_in_flight", 8), config.get("max_queue", 32),
+                                              config.get("queue_timeout_ms", 500) / 1e3)
+        self.cache = ResultCache(config.get("cache_entries", 10000), config.get("cache_ttl_s", 600))
+
+    def serve(self, kind, key, compute, fallback=None, filters=None):
+        """
+        Returns `(result, source)`, where source is "computed", "cache" or "popularity".
+
+        `compute(deadline)` produces the full result. `fallback()` returns the precomputed
+        popularity list. Raises `ServiceUnavailable` when neither the cache nor the
+        fallback has an answer.
+        """
+        cache_key = request_key(kind, key, filters)
+        if not self.enabled:
+            return compute(None), "computed"
+
+        deadline = Deadline(self.timeout_s)
+        try:
+            with self.controller.admit(deadline):
+                ADMISSION_EVENTS.labels("admitted").inc()
+                deadline.check("compute")
+                result = compute(deadline)
+        except Overloaded as e:
+            ADMISSION_EVENTS.labels(e.reason).inc()
+            return self.degrade(cache_key, e.reason, fallback)
+        except DeadlineExceeded as e:
+            logger.warning(f"{kind} request for {key!r}: {e}.")
+            return self.degrade(cache_key, "deadline", fallback)
+
+        if result:
+            self.cache.put(cache_key, result)
+        return result, "computed"
+
+    def degrade(self, cache_key, reason, fallback=None):
+        """Cached result, else popularity fallback, else `ServiceUnavailable`."""
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            DEGRADED_REQUESTS.labels(reason, "cache").inc()
+            return cached, "cache"
+        popular = fallback() if fallback is not None else None
+        if popular:
+            DEGRADED_REQUESTS.labels(reason, "popularity").inc()
+            return popular, "popularity"
+        DEGRADED_REQUESTS.labels(reason, "rejected").inc()
+        raise ServiceUnavailable(reason, retry_after=self.retry_after)
@@ -0,0 +1,119 @@
+"""
+Anime Filters Module
+
+Columnar anime metadata aligned with the encoded anime indices used by the embeddings:
+one uint64 genre bitmask per anime plus type, episode count and premiere year arrays.
+A filter spec is turned into a single boolean mask over every encoded anime with a few
+vectorized comparisons, so recommenders can drop non-matching candidates before top-k
+selection instead of post-filtering a short list.
+
+Filter specs are plain dicts, for example::
+
+    {"include_genres": ["Action", "Sci-Fi"], "exclude_genres": ["Hentai"],
+     "types": ["TV"], "min_episodes": 12, "max_year": 2010}
+"""
+
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+FILTER_KEYS = ("include_genres", "exclude_genres", "types", "min_episodes", "max_episodes", "min_year", "max_year")
+LIST_KEYS = ("include_genres", "exclude_genres", "types")
+MAX_GENRES = 64
+
+
+def split_genres(genres):
+    """Splits a comma-separated Genres value into stripped genre names."""
+    if not isinstance(genres, str):
+        return []
+    return [genre.strip() for genre in genres.split(",") if genre.strip()]
+
+
+def parse_filters(values):
+    """Builds a filter spec from string values (e.g. form fields); empty values are dropped."""
+    filters = {}
+    for key in FILTER_KEYS:
+        value = values.get(key)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if key in LIST_KEYS:
+            filters[key] = [item.strip() for item in value.split(",") if item.strip()] if isinstance(value, str) else list(value)
+        else:
+            filters[key] = float(value)
+    return filters or None
+
+
+class AnimeMetadata:
+    """Genre bitmasks and range-filterable columns for every encoded anime index."""
+
+    def __init__(self, genre_bits, genre_index, types, episodes, premiered_years):
+        self.genre_bits = genre_bits
+        self.genre_index = genre_index
+        self.types = types
+        self.episodes = episodes
+        self.premiered_years = premiered_years
+
+    @classmethod
+    def from_frame(cls, anime_df, anime2anime_decoded):
+        """Aligns anime_df columns with encoded indices; anime missing from anime_df match no filter values."""
+        rows = anime_df.drop_duplicates("anime_id").set_index("anime_id")
+        anime_ids = [anime2anime_decoded[i] for i in range(len(anime2anime_decoded))]
+        rows = rows.reindex(anime_ids)
+
+        genre_lists = [split_genres(genres) for genres in rows["Genres"].values]
+        genre_names = sorted({genre for genres in genre_lists for genre in genres})
+        if len(genre_names) > MAX_GENRES:
+            raise ValueError(f"{len(genre_names)} distinct genres do not fit in a {MAX_GENRES}-bit mask")
+        genre_index = {genre: np.uint64(1) << np.uint64(bit) for bit, genre in enumerate(genre_names)}
+
+        genre_bits = np.zeros(len(anime_ids), dtype=np.uint64)
+        for position, genres in enumerate(genre_lists):
+            for genre in genres:
+                genre_bits[position] |= genre_index[genre]
+
+        types = rows["Type"].fillna("").astype(str).values
+        episodes = pd.to_numeric(rows["Episodes"], errors="coerce").to_numpy(dtype=np.float64)
+        years = rows["Premiered"].astype(str).str.extract(r"(\d{4})")[0]
+        premiered_years = pd.to_numeric(years, errors="coerce").to_numpy(dtype=np.float64)
+
+        logger.info(f"Anime metadata built for {len(anime_ids)} anime with {len(genre_names)} genres.")
+        return cls(genre_bits, genre_index, types, episodes, premiered_years)
+
+    def genre_mask(self, genres):
+        """Bitmask of the given genre names; unknown genres are ignored with a warning."""
+        mask = np.uint64(0)
+        for genre in genres:
+            bit = self.genre_index.get(genre)
+            if bit is None:
+                logger.warning(f"Unknown genre in filter: {genre}")
+                continue
+            mask |= bit
+        return mask
+
+    def candidate_mask(self, filters):
+        """Boolean mask over encoded anime indices that satisfy every filter, or None for no filters."""
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filter keys: {sorted(unknown)}")
+
+        mask = np.ones(len(self.genre_bits), dtype=bool)
+        if filters.get("include_genres"):
+            mask &= (self.genre_bits & self.genre_mask(filters["include_genres"])) != 0
+        if filters.get("exclude_genres"):
+            mask &= (self.genre_bits & self.genre_mask(filters["exclude_genres"])) == 0
+        if filters.get("types"):
+            mask &= np.isin(self.types, list(filters["types"]))
+        # NaN comparisons are False, so anime with unknown values drop out of range filters.
+        if filters.get("min_episodes") is not None:
+            mask &= self.episodes >= filters["min_episodes"]
+        if filters.get("max_episodes") is not None:
+            mask &= self.episodes <= filters["max_episodes"]
+        if filters.get("min_year") is not None:
+            mask &= self.premiered_years >= filters["min_year"]
+        if filters.get("max_year") is not None:
+            mask &= self.premiered_years <= filters["max_year"]
+        return mask
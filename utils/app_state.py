@@ -0,0 +1,239 @@
+"""
+Application State Module
+
+Holds the processed dataframes and model artifacts used for serving behind a single
+object instead of loading them as a side effect of importing `utils.helpers`.
+Artifacts are loaded lazily on first access, or eagerly in a background thread via
+`AppState.start`, which can also run a warm-up pass before the state reports ready.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from config.paths_config import *
+from src.logger import get_logger
+from utils.metrics import ARTIFACT_LOADS, ARTIFACT_LOAD_SECONDS, CACHE_EVENTS
+
+logger = get_logger(__name__)
+
+# Artifacts required for serving, in load order.
+ARTIFACT_PATHS = {
+    "anime_df": PROCESSED_ANIME_DF,
+    "rating_df": PROCESSED_RATING_DF,
+    "synopsis_df": PROCESSED_SYNOPSIS_DF,
+    "anime_weights": ANIME_WEIGHTS_FILE_PATH,
+    "user_weights": USER_WEIGHTS_FILE_PATH,
+    "anime2anime_encoded": ANIME2ANIME_ENCODED_PATH,
+    "anime2anime_decoded": ANIME2ANIME_DECODED_PATH,
+    "user2user_encoded": USER2USER_ENCODED_PATH,
+    "user2user_decoded": USER2USER_DECODED_PATH,
+    "recommender_head": RECOMMENDER_HEAD_PATH,
+    "item_cooccurrence": ITEM_COOCCURRENCE_PATH,
+    "synopsis_index": SYNOPSIS_INDEX_PATH,
+    "popularity": POPULARITY_TABLES_PATH,
+    "user_knn_indices": USER_KNN_INDICES_PATH,
+    "user_knn_scores": USER_KNN_SCORES_PATH,
+    "anime_knn_indices": ANIME_KNN_INDICES_PATH,
+    "anime_knn_scores": ANIME_KNN_SCORES_PATH,
+    "compressed_embeddings": COMPRESSED_EMBEDDINGS_PATH,
+}
+
+# Artifacts whose absence disables a feature instead of failing readiness.
+OPTIONAL_ARTIFACTS = {"recommender_head", "item_cooccurrence", "synopsis_index", "popularity",
+                      "user_knn_indices", "user_knn_scores", "anime_knn_indices", "anime_knn_scores",
+                      "compressed_embeddings"}
+
+# Artifacts served by an attached `user_search` instead of being loaded into this process.
+SEARCH_ARTIFACTS = {"user_weights"}
+
+# Artifacts whose files identify the model version results are computed with.
+MODEL_VERSION_ARTIFACTS = ("user_weights", "anime_weights")
+
+_ARTIFACT_HIT = CACHE_EVENTS.labels("artifacts", "hit")
+_ARTIFACT_MISS = CACHE_EVENTS.labels("artifacts", "miss")
+
+STARTING = "starting"
+LOADING = "loading"
+LOADED = "loaded"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+
+def _load_artifact(path):
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    if path.endswith(".npy"):
+        # Memory-mapped so large neighbour tables are paged in on demand.
+        return np.load(path, mmap_mode="r")
+    return joblib.load(path)
+
+
+class AppState:
+    """Lazily loaded serving artifacts plus startup/readiness bookkeeping."""
+
+    def __init__(self, artifact_paths=None):
+        self._lock = threading.RLock()
+        self.reset(artifact_paths)
+
+    def reset(self, artifact_paths=None):
+        """Drops loaded artifacts and optionally points the state at different artifact paths."""
+        with self._lock:
+            self.artifact_paths = dict(artifact_paths or ARTIFACT_PATHS)
+            self._artifacts = {}
+            self._derived = {}
+            # Optional out-of-process user search (utils.sharded_search), attached by the app.
+            self.user_search = None
+            self._thread = None
+
+            self.status = STARTING
+            self.error = None
+            self.model_version = None
+            self.created_at = time.perf_counter()
+            self.load_seconds = None
+            self.warmup_seconds = None
+            self.ready_seconds = None
+
+    def __getattr__(self, name):
+        # Only reached when regular attribute lookup fails, i.e. for artifact names.
+        if name.startswith("_") or name not in self.__dict__.get("artifact_paths", {}):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return self.get(name)
+
+    def get(self, name):
+        """Returns an artifact by name, loading all artifacts on first access."""
+        if name not in self.artifact_paths:
+            return None
+        artifacts = self._artifacts
+        if name in artifacts:
+            _ARTIFACT_HIT.inc()
+            return artifacts[name]
+        _ARTIFACT_MISS.inc()
+        self.load()
+        return self._artifacts.get(name)
+
+    def derived(self, name, builder):
+        """Returns a value computed from the artifacts by `builder(state)`, built once and cached until reset."""
+        derived = self._derived
+        if name in derived:
+            return derived[name]
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def load(self):
+        """Loads every artifact once. Missing artifacts are logged and left as None."""
+        with self._lock:
+            if self.status not in (STARTING, LOADING):
+                return
+            self.status = LOADING
+            start = time.perf_counter()
+            missing = []
+
+            for name, path in self.artifact_paths.items():
+                if name in SEARCH_ARTIFACTS and self.user_search is not None:
+                    # Rows are fetched from the shard processes; the full matrix never lives here.
+                    self._artifacts[name] = None
+                    logger.info(f"Artifact {name} is served by the sharded user search, not loaded.")
+                    continue
+                if not os.path.exists(path):
+                    ARTIFACT_LOADS.labels(name, "missing").inc()
+                    self._artifacts[name] = None
+                    if name in OPTIONAL_ARTIFACTS:
+                        logger.warning(f"Optional artifact not found: {name} at {path}. Dependent features are disabled.")
+                        continue
+                    logger.error(f"Artifact file not found: {name} at {path}. Ensure training pipeline ran successfully.")
+                    missing.append(name)
+                    continue
+                try:
+                    artifact_start = time.perf_counter()
+                    self._artifacts[name] = _load_artifact(path)
+                    artifact_seconds = time.perf_counter() - artifact_start
+                    ARTIFACT_LOADS.labels(name, "success").inc()
+                    ARTIFACT_LOAD_SECONDS.labels(name).observe(artifact_seconds)
+                    logger.info(f"Loaded artifact {name} in {artifact_seconds:.3f}s.")
+                except Exception as e:
+                    logger.error(f"Unexpected error loading artifact {name} from {path}: {e}", exc_info=True)
+                    ARTIFACT_LOADS.labels(name, "error").inc()
+                    self._artifacts[name] = None
+                    if name not in OPTIONAL_ARTIFACTS:
+                        missing.append(name)
+
+            if self.user_search is not None and self._artifacts.get("compressed_embeddings") is not None:
+                logger.info("Compressed user embeddings are not used: user queries go to the sharded user search.")
+            self.load_seconds = time.perf_counter() - start
+            self.model_version = self._model_version()
+            if missing:
+                self.error = f"Artifacts not available: {', '.join(missing)}"
+                self.status = FAILED
+                logger.error(f"Artifact loading failed after {self.load_seconds:.2f}s. {self.error}")
+            else:
+                self.status = LOADED
+                logger.info(f"All artifacts loaded successfully in {self.load_seconds:.2f}s.")
+
+    def _model_version(self):
+        """Short identifier of the loaded embeddings (size and mtime of the weight files)."""
+        stats = [f"{stat.st_size}-{stat.st_mtime_ns}" for stat in
+                 (os.stat(self.artifact_paths[name]) for name in MODEL_VERSION_ARTIFACTS
+                  if os.path.exists(self.artifact_paths.get(name, "")))]
+        return hashlib.sha1("|".join(stats).encode()).hexdigest()[:12] if stats else None
+
+    def warm_up(self, warmup):
+        """Runs the warm-up callable against this state, timing it."""
+        self.status = WARMING_UP
+        start = time.perf_counter()
+        try:
+            warmup(self)
+        except Exception as e:
+            # A failed warm-up only means colder caches; serving can still proceed.
+            logger.warning(f"Warm-up pass failed: {e}", exc_info=True)
+        self.warmup_seconds = time.perf_counter() - start
+        logger.info(f"Warm-up pass finished in {self.warmup_seconds:.2f}s.")
+
+    def start(self, background=True, warmup=None):
+        """Loads artifacts and runs the optional warm-up, in a background thread by default."""
+        if background:
+            self._thread = threading.Thread(target=self._startup, args=(warmup,), name="app-state-startup", daemon=True)
+            self._thread.start()
+        else:
+            self._startup(warmup)
+
+    def _startup(self, warmup):
+        self.load()
+        if self.status == FAILED:
+            return
+        if warmup is not None:
+            self.warm_up(warmup)
+        self.ready_seconds = time.perf_counter() - self.created_at
+        self.status = READY
+        logger.info(f"Application ready {self.ready_seconds:.2f}s after cold start "
+                    f"(load: {self.load_seconds:.2f}s, warm-up: {self.warmup_seconds or 0:.2f}s).")
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until the startup thread finishes; returns whether the state is ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_ready()
+
+    def is_ready(self):
+        return self.status == READY
+
+    def readiness(self):
+        """Returns a JSON-serialisable readiness report."""
+        return {
+            "status": self.status,
+            "ready": self.is_ready(),
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "ready_seconds": self.ready_seconds,
+            "model_version": self.model_version,
+            "error": self.error,
+        }
+
+
+app_state = AppState()
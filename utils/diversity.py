@@ -0,0 +1,71 @@
+"""
+Diversity Module
+
+Maximal marginal relevance (MMR) re-ranking of recommendation candidates. Ranking by
+cosine similarity alone tends to fill the list with near-duplicates, such as the sequels
+and seasons of the query title. MMR builds the list one pick at a time. Each pick is the
+candidate with the best
+
+    lambda * relevance - (1 - lambda) * max cosine similarity to the anime already picked
+
+so `lambda` 1 keeps the relevance order and lower values trade relevance for variety.
+
+`mmr` is incremental. Relevance is fixed, so only the redundancy term changes between
+picks, and it can only grow. After each pick, one matrix-vector product against the new
+pick updates a running per-candidate maximum. Picking k of m candidates with d-dimensional
+embeddings therefore costs O(k * m * d) numpy work and never forms the m x m similarity
+matrix.
+
+`DiversityReranker` is built from the `diversity` config. `find_similar_anime` and
+`hybrid_recommendation` use it to shortlist `candidates` anime and re-rank them down to n.
+"""
+
+import numpy as np
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def mmr(relevance, embeddings, k, lambda_=0.7):
+    """Positions of the `k` candidates picked by maximal marginal relevance, in pick order."""
+    relevance = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(relevance))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    weighted_relevance = lambda_ * relevance
+    redundancy_weight = 1.0 - lambda_
+    selected = np.empty(k, dtype=np.int64)
+    max_similarity = None
+    scores = weighted_relevance.copy()
+    for i in range(k):
+        pick = int(np.argmax(scores))
+        selected[i] = pick
+        if i == k - 1:
+            break
+        similarity = embeddings @ embeddings[pick]
+        max_similarity = similarity if max_similarity is None else np.maximum(max_similarity, similarity,
+                                                                              out=max_similarity)
+        np.subtract(weighted_relevance, redundancy_weight * max_similarity, out=scores)
+        scores[selected[:i + 1]] = -np.inf
+    return selected
+
+
+class DiversityReranker:
+    """MMR settings from the `diversity` config: `lambda` and the shortlist size (`candidates`)."""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get("enabled", False)
+        self.lambda_ = float(config.get("lambda", 0.7))
+        self.candidates = int(config.get("candidates", 50))
+        if not 0.0 <= self.lambda_ <= 1.0:
+            raise ValueError(f"diversity.lambda must be between 0 and 1, got {self.lambda_}.")
+        if self.candidates < 1:
+            raise ValueError(f"diversity.candidates must be positive, got {self.candidates}.")
+
+    def rerank(self, relevance, embeddings, k):
+        """Positions of the `k` candidates to serve, most relevant-yet-novel first."""
+        return mmr(relevance, embeddings, k, self.lambda_)
@@ -1,49 +1,72 @@
-import os # Import os module
 import pandas as pd
 import numpy as np
-import joblib
-import sys # Ensure sys is imported
-from config.paths_config import *
 from src.logger import get_logger
-from src.custom_exception import CustomException
+from utils.app_state import app_state
+from src.numpy_inference import NumpyRecommenderScorer
+from src.embedding_compression import two_stage_top_k
+from utils.metrics import FALLBACKS, STAGE_SECONDS
+from utils.tracing import traced
+from utils.anime_filters import AnimeMetadata
+from utils.admission import DeadlineExceeded
+from utils.topk import top_k
 
 # Ensure logger is initialized at the top
 logger = get_logger(__name__)
 
-# Load data and artifacts once when the module is imported
-try:
-    # Check if paths are valid before loading
-    required_paths = {
-        "PROCESSED_SYNOPSIS_DF": PROCESSED_SYNOPSIS_DF,
-        "ANIME_WEIGHTS_FILE_PATH": ANIME_WEIGHTS_FILE_PATH,
-        "USER_WEIGHTS_FILE_PATH": USER_WEIGHTS_FILE_PATH,
-        "ANIME2ANIME_ENCODED_PATH": ANIME2ANIME_ENCODED_PATH,
-        "ANIME2ANIME_DECODED_PATH": ANIME2ANIME_DECODED_PATH,
-        "USER2USER_ENCODED_PATH": USER2USER_ENCODED_PATH,
-        "USER2USER_DECODED_PATH": USER2USER_DECODED_PATH
-    }
-    for name, path in required_paths.items():
-        if not os.path.exists(path):
-             logger.error(f"Artifact file not found: {name} at {path}. Ensure training pipeline ran successfully.")
-             raise FileNotFoundError(f"Missing artifact: {name} at {path}")
-
-    synopsis_df = pd.read_csv(PROCESSED_SYNOPSIS_DF)
-    anime_weights = joblib.load(ANIME_WEIGHTS_FILE_PATH)
-    user_weights = joblib.load(USER_WEIGHTS_FILE_PATH)
-    anime2anime_encoded = joblib.load(ANIME2ANIME_ENCODED_PATH)
-    anime2anime_decoded = joblib.load(ANIME2ANIME_DECODED_PATH)
-    user2user_encoded = joblib.load(USER2USER_ENCODED_PATH)
-    user2user_decoded = joblib.load(USER2USER_DECODED_PATH)
-    logger.info("All artifacts loaded successfully.")
-
-except FileNotFoundError as e:
-    logger.error(f"Error loading artifacts: {e}. Ensure training pipeline ran successfully and paths in config are correct.", exc_info=True)
-    synopsis_df, anime_weights, user_weights, anime2anime_encoded, anime2anime_decoded, user2user_encoded, user2user_decoded = [None] * 7
-
-except Exception as e:
-    logger.error(f"Unexpected error loading artifacts: {e}", exc_info=True)
-    synopsis_df, anime_weights, user_weights, anime2anime_encoded, anime2anime_decoded, user2user_encoded, user2user_decoded = [None] * 7
-    raise CustomException(e, sys)
+# Per-stage latency histograms, resolved once so timing a stage is a single context manager.
+_SIMILAR_ANIME_SECONDS = STAGE_SECONDS.labels("similar_anime")
+_SIMILAR_USERS_SECONDS = STAGE_SECONDS.labels("similar_users")
+_USER_PREFERENCES_SECONDS = STAGE_SECONDS.labels("user_preferences")
+_USER_BASED_SECONDS = STAGE_SECONDS.labels("user_based")
+_CONTENT_BASED_SECONDS = STAGE_SECONDS.labels("content_based")
+_COMBINE_SECONDS = STAGE_SECONDS.labels("combine")
+_DIVERSITY_SECONDS = STAGE_SECONDS.labels("diversity")
+
+def _build_anime_ids_by_name(state):
+    """First anime_id for every lower-cased eng_version, matching getAnimeFrame's name lookup."""
+    anime_df = state.anime_df.dropna(subset=["eng_version"])
+    anime_ids = pd.Series(anime_df["anime_id"].values, index=anime_df["eng_version"].str.lower().values)
+    return anime_ids[~anime_ids.index.duplicated()].to_dict()
+
+def anime_id_for_name(name):
+    """anime_id of a title, matched case-insensitively like getAnimeFrame, or None."""
+    return app_state.derived("anime_ids_by_name", _build_anime_ids_by_name).get(str(name).lower())
+
+def _build_encoded_ids_by_name():
+    """First encoded anime index for every display name."""
+    names = encoded_anime_names()
+    return {name: index for index, name in reversed(list(enumerate(names))) if pd.notna(name)}
+
+def popular_recommendations(n=5, filters=None, reason="cold_start"):
+    """
+    Precomputed popular titles matching `filters`.
+
+    Candidates come from the tables of the requested genres, then those of the requested
+    types, then the global table. They are then checked against every filter with
+    `candidate_mask`, so excluded genres and episode/year ranges are respected too.
+    """
+    tables = app_state.get("popularity")
+    if tables is None:
+        logger.warning("Cannot serve popular anime: popularity tables not loaded.")
+        return []
+    FALLBACKS.labels(reason).inc()
+    names = []
+    for genre in (filters or {}).get("include_genres") or []:
+        names += tables["genres"].get(genre, [])
+    for anime_type in (filters or {}).get("types") or []:
+        names += tables["types"].get(anime_type, [])
+    names += tables["global"]
+
+    allowed = candidate_mask(filters)
+    if allowed is not None:
+        ids_by_name = app_state.derived("encoded_ids_by_name", lambda state: _build_encoded_ids_by_name())
+        encoded = pd.unique(np.array([ids_by_name.get(name, -1) for name in names], dtype=np.int64))
+        encoded = encoded[encoded >= 0]
+        names = encoded_anime_names()[encoded[allowed[encoded]]].tolist()
+    else:
+        names = list(pd.unique(np.array(names, dtype=object)))
+    logger.info("Serving %d popular anime as fallback (%s).", min(n, len(names)), reason)
+    return names[:n]
 
 def getAnimeFrame(user_input, df):
     """Fetches the anime details row from the dataframe based on ID or name."""
@@ -88,13 +111,101 @@ def getSynopsis(user_input, df):
         logger.error(f"Error in getSynopsis for input '{user_input}': {e}", exc_info=True)
         return "Synopsis retrieval error."
 
-def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=False):
-    """Finds similar animes based on embedding weights."""
+def knn_neighbors(kind, encoded_index, n):
+    """Precomputed (indices, scores) neighbours of an encoded user or anime, or None if the graph can't serve n."""
+    indices, scores = app_state.get(f"{kind}_knn_indices"), app_state.get(f"{kind}_knn_scores")
+    # Rows are checked against the encoding, not the weights, which live in the shard processes under sharded search.
+    encoded = app_state.get(f"{kind}2{kind}_encoded")
+    if indices is None or scores is None or encoded is None or n > indices.shape[1] or len(indices) != len(encoded):
+        return None
+    return np.asarray(indices[encoded_index], dtype=np.int64), np.asarray(scores[encoded_index])
+
+def knn_graph_width(kind):
+    """Neighbours stored per row of the kNN graph, or None when no graph is loaded."""
+    indices = app_state.get(f"{kind}_knn_indices")
+    return None if indices is None else indices.shape[1]
+
+def two_stage_neighbors(kind, encoded_index, n):
+    """
+    Neighbours shortlisted on the compressed embeddings and re-ranked on the full ones, or None if not compressed.
+
+    Re-ranking needs the full weight matrix, so under sharded search the compressed user
+    embeddings are not used and user queries go to the (exact) sharded search instead.
+    """
+    compressed, weights = app_state.get("compressed_embeddings"), app_state.get(f"{kind}_weights")
+    if compressed is None or weights is None or len(compressed[kind]) != len(weights):
+        return None
+    return two_stage_top_k(weights, compressed[kind], encoded_index, n, compressed["shortlist"])
+
+def precomputed_neighbors(kind, encoded_index, n):
+    """Neighbours from the kNN graph, else from the two-stage compressed search, else None."""
+    neighbors = knn_neighbors(kind, encoded_index, n)
+    return neighbors if neighbors is not None else two_stage_neighbors(kind, encoded_index, n)
+
+def diverse_anime_neighbors(encoded_anime, n, diversity, allowed=None):
+    """(indices, similarities) of n neighbours of an anime, MMR re-ranked from a `diversity.candidates` shortlist."""
+    weights = app_state.anime_weights
+    pool = max(n, diversity.candidates)
+    width = knn_graph_width("anime")
+    if allowed is None and width is not None and n <= width:
+        # A shortlist wider than the graph would skip it and brute-force every request.
+        pool = min(pool, width)
+    graph = precomputed_neighbors("anime", encoded_anime, pool) if allowed is None else None
+    if graph is not None:
+        candidates, relevance = graph[0][:pool], graph[1][:pool]
+    else:
+        dists = weights @ weights[encoded_anime]
+        if allowed is not None:
+            dists = np.where(allowed, dists, -np.inf)
+        candidates = top_k(dists, pool + 1)
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        candidates = candidates[candidates != encoded_anime][:pool]
+        relevance = dists[candidates]
+    with _DIVERSITY_SECONDS.time():
+        picked = diversity.rerank(relevance, weights[candidates], n)
+    return candidates[picked], relevance[picked]
+
+def user_embeddings_available():
+    """Whether user embedding rows can be served, from memory or from the sharded user search."""
+    return app_state.user_weights is not None or app_state.user_search is not None
+
+def user_embedding(encoded_user):
+    """Embedding row of an encoded user, fetched from its shard when the matrix is not loaded here."""
+    user_weights = app_state.user_weights
+    if user_weights is not None:
+        return user_weights[encoded_user]
+    return app_state.user_search.row(encoded_user)
+
+def _build_anime_metadata(state):
+    return AnimeMetadata.from_frame(state.anime_df, state.anime2anime_decoded)
+
+def candidate_mask(filters):
+    """Boolean mask over encoded anime indices matching a filter spec, or None when there are no filters."""
+    if not filters:
+        return None
+    return app_state.derived("anime_metadata", _build_anime_metadata).candidate_mask(filters)
+
+@traced()
+def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=False, filters=None, diversity=None,
+                       deadline=None):
+    """
+    Finds similar animes based on embedding weights, optionally restricted to anime matching `filters`.
+
+    With a `diversity` reranker (`utils.diversity.DiversityReranker`), a larger shortlist is
+    MMR re-ranked so the n results are not all sequels of each other. With a `deadline`,
+    the title lookup, the neighbour search and the result assembly each check it first.
+    """
+    check = deadline.check if deadline is not None else (lambda stage: None)
+    anime_weights = app_state.anime_weights
+    anime2anime_encoded = app_state.anime2anime_encoded
+    anime2anime_decoded = app_state.anime2anime_decoded
     if anime_weights is None or anime2anime_encoded is None or anime2anime_decoded is None:
         logger.error("Cannot find similar anime: Artifacts not loaded.")
         return pd.DataFrame(columns=["name", "similarity", "genre", "synopsis"])
 
     try:
+        check("title_lookup")
         anime_frame_initial = getAnimeFrame(name, anime_df)
         if anime_frame_initial.empty:
             logger.warning(f"Could not find anime frame for input name/ID: {name}")
@@ -112,26 +223,43 @@ def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=
             logger.warning(f"Encoded index {encoded_index} is invalid or out of bounds for weights array (length {len(weights)}). Name: '{name}', ID: {index}")
             return pd.DataFrame(columns=["name", "similarity", "genre", "synopsis"])
 
-        dists = np.dot(weights, weights[encoded_index])
-        sorted_dists_indices = np.argsort(dists)
+        check("similar_anime")
+        allowed = candidate_mask(filters)
+        if diversity is not None and not (neg or return_dist):
+            graph = diverse_anime_neighbors(encoded_index, n, diversity, allowed)
+        else:
+            graph = None if (neg or return_dist or allowed is not None) else precomputed_neighbors("anime", encoded_index, n)
+        if graph is not None:
+            # Precomputed (or MMR re-ranked) neighbours, reversed into the ascending order of the argsort path.
+            closest_indices, closest_similarities = graph[0][:n][::-1], graph[1][:n][::-1]
+        else:
+            dists = np.dot(weights, weights[encoded_index])
+            if allowed is not None:
+                # Push non-matching candidates to the far end of the ranking before selecting.
+                dists = np.where(allowed, dists, np.inf if neg else -np.inf)
+            sorted_dists_indices = np.argsort(dists)
 
-        num_results = n + 1
+            num_results = n + 1
 
-        if neg:
-            closest_indices = sorted_dists_indices[:num_results]
-        else:
-            closest_indices = sorted_dists_indices[-num_results:]
+            if neg:
+                closest_indices = sorted_dists_indices[:num_results]
+            else:
+                closest_indices = sorted_dists_indices[-num_results:]
+            if allowed is not None:
+                closest_indices = closest_indices[allowed[closest_indices]]
+            closest_similarities = dists[closest_indices]
 
-        logger.info(f"Finding {n} anime closest to '{name}' (ID: {index})")
+        logger.info("Finding %s anime closest to '%s' (ID: %s)", n, name, index)
 
         if return_dist:
             return dists, closest_indices
 
+        check("similar_anime_details")
         SimilarityArray = []
         processed_decoded_ids = set()
 
         # Iterate through the indices of closest animes
-        for close_idx in reversed(closest_indices): # Process from most similar down
+        for close_idx, similarity in zip(reversed(closest_indices), reversed(closest_similarities)): # Process from most similar down
             if len(SimilarityArray) >= n:
                  break # Stop once we have enough valid recommendations
 
@@ -168,11 +296,6 @@ def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=
             try:
                 anime_name = anime_frame["eng_version"].values[0]
                 genre = anime_frame["Genres"].values[0]
-                # Ensure index is valid before accessing distance
-                if close_idx < 0 or close_idx >= len(dists):
-                     logger.warning(f"Similarity index {close_idx} out of bounds for dists array.")
-                     continue
-                similarity = dists[close_idx]
 
                 SimilarityArray.append({
                     "name": anime_name,
@@ -201,6 +324,8 @@ def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=
     
         return Frame.head(n) # Return top N valid results
 
+    except DeadlineExceeded:
+        raise
     except KeyError as e:
          logger.error(f"KeyError during initial lookup for '{name}': {e}. Check anime_df columns.", exc_info=True)
          return pd.DataFrame(columns=["name", "similarity", "genre", "synopsis"])
@@ -211,9 +336,13 @@ def find_similar_anime(name, anime_df, synopsis_df, n=5, return_dist=False, neg=
         logger.error(f"General Error in find_similar_anime for '{name}': {e}", exc_info=True)
         return pd.DataFrame(columns=["name", "similarity", "genre", "synopsis"])
 
+@traced()
 def find_similar_user(user_id, n=5, return_dist=False, neg=False):
     """Finds similar users based on embedding weights."""
-    if user_weights is None or user2user_encoded is None or user2user_decoded is None:
+    user_weights = app_state.user_weights
+    user2user_encoded = app_state.user2user_encoded
+    user2user_decoded = app_state.user2user_decoded
+    if not user_embeddings_available() or user2user_encoded is None or user2user_decoded is None:
         logger.error("Cannot find similar user: Artifacts not loaded.")
         return pd.DataFrame(columns=["similar_users", "similarity"])
 
@@ -224,22 +353,35 @@ def find_similar_user(user_id, n=5, return_dist=False, neg=False):
             logger.warning(f"User ID {user_id} not found in user2user_encoded map.")
             return pd.DataFrame(columns=["similar_users", "similarity"])
 
-        weights = user_weights
-        if not isinstance(encoded_index, (int, np.integer)) or encoded_index < 0 or encoded_index >= len(weights):
-            logger.warning(f"Encoded index {encoded_index} is invalid or out of bounds for user weights array (length {len(weights)}). User ID: {user_id}")
-            return pd.DataFrame(columns=["similar_users", "similarity"])
-
-        dists = np.dot(weights, weights[encoded_index])
-        sorted_dists_indices = np.argsort(dists)
+        graph = None if (neg or return_dist) else precomputed_neighbors("user", encoded_index, n)
+        if graph is None and user_weights is None:
+            # Sharded search: the embeddings live in the shard processes, which rank the candidates.
+            if return_dist or neg:
+                logger.error("Cannot compute full user distances: user embeddings are held by the search shards.")
+                return pd.DataFrame(columns=["similar_users", "similarity"])
+            similar_ids, similarities = app_state.user_search.similar_users(user_id, n=n)
+            return pd.DataFrame({"similar_users": similar_ids, "similarity": similarities})
+
+        if graph is not None:
+            # Precomputed neighbours, reversed into the ascending order of the argsort path.
+            closest_indices, closest_similarities = graph[0][:n][::-1], graph[1][:n][::-1]
+        else:
+            weights = user_weights
+            if not isinstance(encoded_index, (int, np.integer)) or encoded_index < 0 or encoded_index >= len(weights):
+                logger.warning(f"Encoded index {encoded_index} is invalid or out of bounds for user weights array (length {len(weights)}). User ID: {user_id}")
+                return pd.DataFrame(columns=["similar_users", "similarity"])
+            dists = np.dot(weights, weights[encoded_index])
+            sorted_dists_indices = np.argsort(dists)
 
-        num_results = n + 1 # +1 to exclude the input user itself later
+            num_results = n + 1 # +1 to exclude the input user itself later
 
-        if neg:
-            closest_indices = sorted_dists_indices[:num_results]
-        else:
-            closest_indices = sorted_dists_indices[-num_results:]
+            if neg:
+                closest_indices = sorted_dists_indices[:num_results]
+            else:
+                closest_indices = sorted_dists_indices[-num_results:]
+            closest_similarities = dists[closest_indices]
 
-        logger.info(f"Finding {n} users closest to User ID: {user_id}")
+        logger.info("Finding %s users closest to User ID: %s", n, user_id)
 
         if return_dist:
             return dists, closest_indices
@@ -247,7 +389,7 @@ def find_similar_user(user_id, n=5, return_dist=False, neg=False):
         SimilarityArray = []
         processed_decoded_ids = set()
 
-        for close_idx in reversed(closest_indices): # Process from most similar down
+        for close_idx, similarity in zip(reversed(closest_indices), reversed(closest_similarities)): # Process from most similar down
             if len(SimilarityArray) >= n:
                 break
 
@@ -265,12 +407,6 @@ def find_similar_user(user_id, n=5, return_dist=False, neg=False):
                 continue
 
             try:
-                 # Ensure index is valid before accessing distance
-                if close_idx < 0 or close_idx >= len(dists):
-                     logger.warning(f"User similarity index {close_idx} out of bounds for dists array.")
-                     continue
-                similarity = dists[close_idx]
-
                 SimilarityArray.append({
                     "similar_users": decoded_id,
                     "similarity": similarity
@@ -298,6 +434,7 @@ def find_similar_user(user_id, n=5, return_dist=False, neg=False):
         logger.error(f"General Error in find_similar_user for User ID {user_id}: {e}", exc_info=True)
         return pd.DataFrame(columns=["similar_users", "similarity"])
 
+@traced()
 def get_user_preferences(user_id, ratings_df, anime_df, verbose=0):
     """Gets the preferred animes for a user based on their higher ratings."""
     if ratings_df is None or anime_df is None:
@@ -307,7 +444,7 @@ def get_user_preferences(user_id, ratings_df, anime_df, verbose=0):
     try:
         animes_watched_by_user = ratings_df[ratings_df["user_id"] == user_id]
         if animes_watched_by_user.empty:
-            logger.info(f"User {user_id} has no ratings data.")
+            logger.info("User %s has no ratings data.", user_id)
             return pd.DataFrame(columns=["eng_version", "Genres"])
 
         # Use a threshold if percentile calculation fails (e.g., few ratings)
@@ -325,7 +462,7 @@ def get_user_preferences(user_id, ratings_df, anime_df, verbose=0):
         # Filter by percentile/threshold
         animes_watched_by_user = animes_watched_by_user[animes_watched_by_user["rating"] >= user_rating_percentile]
         if animes_watched_by_user.empty:
-             logger.info(f"User {user_id} has no ratings at or above the 75th percentile ({user_rating_percentile:.2f}).")
+             logger.info("User %s has no ratings at or above the 75th percentile (%.2f).", user_id, user_rating_percentile)
              # Optionally, could return all watched animes or an empty frame
              return pd.DataFrame(columns=["eng_version", "Genres"])
 
@@ -337,7 +474,7 @@ def get_user_preferences(user_id, ratings_df, anime_df, verbose=0):
         anime_df_rows = anime_df_rows[["eng_version", "Genres"]].drop_duplicates()
 
         if verbose != 0:
-            logger.info(f"User {user_id} preferences based on {len(anime_df_rows)} animes rated >= {user_rating_percentile:.2f}")
+            logger.info("User %s preferences based on %d animes rated >= %.2f", user_id, len(anime_df_rows), user_rating_percentile)
             # logger.info(f"Top 5 preferred animes for user {user_id}:\n{anime_df_rows.head(5)}") # Avoid printing large frames to log
 
         return anime_df_rows
@@ -349,197 +486,334 @@ def get_user_preferences(user_id, ratings_df, anime_df, verbose=0):
         logger.error(f"Error in get_user_preferences for user {user_id}: {e}", exc_info=True)
         return pd.DataFrame(columns=["eng_version", "Genres"])
 
-def get_user_based_recommendations(similar_users_df, user_preferences_df, anime_df, ratings_df, synopsis_df, n=5):
-    """Generates recommendations based on similar users' preferences."""
-    if similar_users_df is None or similar_users_df.empty:
-        logger.warning("Cannot generate user-based recommendations: No similar users provided.")
-        return pd.DataFrame(columns=["name", "number_of_user_preferences", "genre", "synopsis"])
-
-    if user_preferences_df is None: # Allow empty user_preferences_df
-         logger.warning("User preferences DataFrame is None, proceeding without filtering watched items.")
-         user_preferences_df = pd.DataFrame(columns=["eng_version"]) # Create empty frame to avoid errors
+@traced()
+def get_content_based_recommendations_for_anime(anime_name, anime_df, synopsis_df, n=5, filters=None, diversity=None,
+                                                deadline=None):
+    """Generates content-based recommendations for a given anime name, raising `DeadlineExceeded` past `deadline`."""
+    logger.info("--- Starting Content-Based Recommendation for Anime: %s ---", anime_name)
+    try:
+        if isinstance(anime_name, str) and anime_name.lower() not in app_state.derived("anime_ids_by_name", _build_anime_ids_by_name):
+            logger.warning(f"Anime '{anime_name}' not found, serving popular anime instead.")
+            return popular_recommendations(n=n, filters=filters, reason="unknown_title")
+        with _SIMILAR_ANIME_SECONDS.time():
+            similar_animes_df = find_similar_anime(anime_name, anime_df, synopsis_df, n=n, filters=filters, diversity=diversity,
+                                                   deadline=deadline)
+        if similar_animes_df is None or similar_animes_df.empty:
+            logger.warning(f"Could not find similar anime for '{anime_name}'.")
+            return []
 
-    recommended_animes = []
-    anime_list = [] # Collect potential anime names from similar users
+        recommendations = similar_animes_df["name"].tolist()
+        logger.info("Found %d content-based recommendations for '%s': %s", len(recommendations), anime_name, recommendations)
+        logger.info("--- Finished Content-Based Recommendation for Anime: %s ---", anime_name)
+        return recommendations
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_content_based_recommendations_for_anime for '{anime_name}': {e}", exc_info=True)
+        return []
 
-    try:
-        for user_id in similar_users_df["similar_users"].values:
-            # Get preferences of the similar user
-            sim_user_prefs_df = get_user_preferences(int(user_id), ratings_df, anime_df)
-
-            if not sim_user_prefs_df.empty:
-                # Filter out animes the target user has already preferred/watched
-                pref_list_unwatched = sim_user_prefs_df[
-                    ~sim_user_prefs_df["eng_version"].isin(user_preferences_df["eng_version"].values)
-                ]
-                if not pref_list_unwatched.empty:
-                    anime_list.extend(pref_list_unwatched["eng_version"].tolist())
-
-        if not anime_list:
-            logger.warning("No potential recommendations found from similar users' preferences.")
-            return pd.DataFrame(columns=["name", "number_of_user_preferences", "genre", "synopsis"])
-
-        # Count occurrences of each anime suggested by similar users
-        anime_counts = pd.Series(anime_list).value_counts()
-        sorted_list = anime_counts.head(n * 2) # Get more candidates initially
-
-        logger.info(f"Found {len(anime_counts)} unique anime candidates from similar users.")
-
-        processed_recommendations = []
-        # Fetch details for the top candidates
-        for anime_name, count in sorted_list.items():
-            if len(processed_recommendations) >= n:
-                break
 
-            if isinstance(anime_name, str):
-                try:
-                    frame = getAnimeFrame(anime_name, anime_df)
-                    if frame.empty:
-                        logger.warning(f"Could not get frame for recommended anime: {anime_name}")
-                        continue
-
-                    anime_id = frame["anime_id"].values[0]
-                    genre = frame["Genres"].values[0]
-                    synopsis = getSynopsis(anime_id, synopsis_df) # Use ID for synopsis
-
-                    processed_recommendations.append({
-                        # "anime_id": anime_id, # Keep internally if needed
-                        "name": anime_name,
-                        "number_of_user_preferences": count,
-                        "genre": genre,
-                        "synopsis": synopsis
-                    })
-                except KeyError as e:
-                    logger.error(f"KeyError processing user-based recommendation '{anime_name}': {e}", exc_info=True)
-                    continue
-                except IndexError as e:
-                    logger.error(f"IndexError processing user-based recommendation '{anime_name}': {e}", exc_info=True)
-                    continue
-                except Exception as e:
-                    logger.error(f"Error processing user-based recommendation '{anime_name}': {e}", exc_info=True)
-                    continue
-            else:
-                 logger.warning(f"Skipping non-string anime name in recommendation list: {anime_name}")
+@traced()
+def get_predicted_rating_recommendations(user_id, ratings_df, anime_df, n=5):
+    """Ranks every anime for a user by RecommenderNet's predicted rating, skipping titles they rated."""
+    head = app_state.get("recommender_head")
+    user_weights, anime_weights = app_state.user_weights, app_state.anime_weights
+    user2user_encoded, anime2anime_decoded = app_state.user2user_encoded, app_state.anime2anime_decoded
+    if head is None or not user_embeddings_available() or anime_weights is None:
+        logger.warning("Cannot rank by predicted rating: recommender head or weights not loaded.")
+        return []
 
-        if not processed_recommendations:
-             logger.warning("Could not fetch details for any top user-based candidates.")
-             return pd.DataFrame(columns=["name", "number_of_user_preferences", "genre", "synopsis"])
+    try:
+        encoded_user = user2user_encoded.get(user_id)
+        if encoded_user is None:
+            logger.warning(f"User ID {user_id} not found in user2user_encoded map.")
+            return []
 
-        return pd.DataFrame(processed_recommendations).head(n)
+        rated = ratings_df.loc[ratings_df["user_id"] == user_id, "anime"].values
+        if user_weights is None:
+            # Score against the single row fetched from the user's shard.
+            scorer = NumpyRecommenderScorer(user_embedding(encoded_user)[None, :], anime_weights, head)
+            top_indices, top_scores = scorer.top_k_for_user(0, k=n * 2, exclude=rated)
+        else:
+            scorer = NumpyRecommenderScorer(user_weights, anime_weights, head)
+            top_indices, top_scores = scorer.top_k_for_user(encoded_user, k=n * 2, exclude=rated)
 
+        recommendations = []
+        for encoded_anime in top_indices:
+            if len(recommendations) >= n:
+                break
+            anime_frame = getAnimeFrame(anime2anime_decoded.get(int(encoded_anime)), anime_df)
+            if anime_frame.empty:
+                continue
+            recommendations.append(anime_frame["eng_version"].values[0])
+        logger.info("Top %d predicted-rating recommendations for user %s: %s", len(recommendations), user_id, recommendations)
+        return recommendations
     except KeyError as e:
-        logger.error(f"KeyError in get_user_based_recommendations: {e}. Check DataFrame columns.", exc_info=True)
-        return pd.DataFrame(columns=["name", "number_of_user_preferences", "genre", "synopsis"])
+        logger.error(f"KeyError in get_predicted_rating_recommendations for user {user_id}: {e}. Check DataFrame columns.", exc_info=True)
+        return []
     except Exception as e:
-        logger.error(f"General Error in get_user_based_recommendations: {e}", exc_info=True)
-        return pd.DataFrame(columns=["name", "number_of_user_preferences", "genre", "synopsis"])
+        logger.error(f"Error in get_predicted_rating_recommendations for user {user_id}: {e}", exc_info=True)
+        return []
+
+def _build_encoded_anime_names(state):
+    """Display name for every encoded anime index (None where the title is missing from anime_df)."""
+    anime_df, anime2anime_decoded = state.anime_df, state.anime2anime_decoded
+    names_by_id = anime_df.drop_duplicates("anime_id").set_index("anime_id")["eng_version"]
+    anime_ids = pd.Series([anime2anime_decoded[i] for i in range(len(anime2anime_decoded))])
+    names = anime_ids.map(names_by_id)
+    return names.where(names.notna(), None).to_numpy(dtype=object)
+
+def encoded_anime_names():
+    """Cached array mapping encoded anime indices to display names."""
+    return app_state.derived("encoded_anime_names", _build_encoded_anime_names)
+
+@traced()
+def get_also_liked_recommendations(anime_name, anime_df, n=5):
+    """Answers "people who liked X also liked" from the precomputed co-occurrence neighbours of a title."""
+    table = app_state.get("item_cooccurrence")
+    anime2anime_encoded = app_state.anime2anime_encoded
+    if table is None or anime2anime_encoded is None:
+        logger.warning("Cannot find co-rated anime: item co-occurrence table not loaded.")
+        return []
 
-def get_content_based_recommendations_for_anime(anime_name, anime_df, synopsis_df, n=5):
-    """Generates content-based recommendations for a given anime name."""
-    logger.info(f"--- Starting Content-Based Recommendation for Anime: {anime_name} ---")
     try:
-        similar_animes_df = find_similar_anime(anime_name, anime_df, synopsis_df, n=n)
-        if similar_animes_df is None or similar_animes_df.empty:
-            logger.warning(f"Could not find similar anime for '{anime_name}'.")
+        anime_frame = getAnimeFrame(anime_name, anime_df)
+        if anime_frame.empty:
+            logger.warning(f"Anime '{anime_name}' not found in anime_df.")
+            return []
+        encoded_index = anime2anime_encoded.get(anime_frame.anime_id.values[0])
+        if encoded_index is None:
+            logger.warning(f"Anime ID for '{anime_name}' not found in anime2anime_encoded map.")
             return []
 
-        recommendations = similar_animes_df["name"].tolist()
-        logger.info(f"Found {len(recommendations)} content-based recommendations for '{anime_name}': {recommendations}")
-        logger.info(f"--- Finished Content-Based Recommendation for Anime: {anime_name} ---")
+        names = encoded_anime_names()
+        recommendations = []
+        for neighbor in table["neighbors"][encoded_index]:
+            if neighbor < 0 or len(recommendations) >= n:
+                break
+            if names[neighbor] is not None:
+                recommendations.append(names[neighbor])
+        logger.info("Found %d co-rated recommendations for '%s': %s", len(recommendations), anime_name, recommendations)
         return recommendations
     except Exception as e:
-        logger.error(f"Error in get_content_based_recommendations_for_anime for '{anime_name}': {e}", exc_info=True)
+        logger.error(f"Error in get_also_liked_recommendations for '{anime_name}': {e}", exc_info=True)
         return []
 
+def _build_anime_names_by_id(state):
+    """Display name for every anime_id in anime_df that has one."""
+    names = state.anime_df.drop_duplicates("anime_id").set_index("anime_id")["eng_version"].dropna()
+    return names.to_dict()
+
+def _build_synopsis_positions(state):
+    """Row position in the synopsis index for every anime_id."""
+    return {int(anime_id): position for position, anime_id in enumerate(state.synopsis_index["anime_ids"])}
+
+@traced()
+def find_similar_synopsis(anime_name, anime_df, n=5):
+    """Finds anime whose synopses are most similar by TF-IDF cosine similarity."""
+    index = app_state.get("synopsis_index")
+    if index is None:
+        logger.warning("Cannot find similar synopses: synopsis index not loaded.")
+        return []
 
-def hybrid_recommendation(user_id, ratings_df, anime_df, user_weight=0.5, content_weight=0.5, n=5):
-    """Generates hybrid recommendations combining user-based and content-based approaches."""
-    logger.info(f"--- Starting Hybrid Recommendation for User ID: {user_id} ---")
-
-    # --- 1. User-Based Component --- 
-    logger.info("Step 1: Finding similar users...")
-    similar_users = find_similar_user(user_id, n=20) # Find more similar users initially
-    if similar_users.empty:
-        logger.warning(f"No similar users found for {user_id}. Cannot proceed with user-based part.")
-        # Optionally: Fallback to pure content-based or return empty
-        # For now, continue to content-based, but user-based score will be 0
+    try:
+        anime_frame = getAnimeFrame(anime_name, anime_df)
+        if anime_frame.empty:
+            logger.warning(f"Anime '{anime_name}' not found in anime_df.")
+            return []
+        position = app_state.derived("synopsis_positions", _build_synopsis_positions).get(int(anime_frame.anime_id.values[0]))
+        if position is None:
+            logger.warning(f"No synopsis indexed for '{anime_name}'.")
+            return []
 
-    logger.info("Step 2: Getting target user preferences...")
-    user_preferences = get_user_preferences(user_id, ratings_df, anime_df)
+        names_by_id = app_state.derived("anime_names_by_id", _build_anime_names_by_id)
+        anime_ids = index["anime_ids"]
+        recommendations = []
+        for neighbor in index["neighbors"][position]:
+            if neighbor < 0 or len(recommendations) >= n:
+                break
+            neighbor_name = names_by_id.get(int(anime_ids[neighbor]))
+            if neighbor_name is not None:
+                recommendations.append(neighbor_name)
+        logger.info("Found %d synopsis-similar recommendations for '%s': %s", len(recommendations), anime_name, recommendations)
+        return recommendations
+    except Exception as e:
+        logger.error(f"Error in find_similar_synopsis for '{anime_name}': {e}", exc_info=True)
+        return []
 
-    logger.info("Step 3: Getting recommendations from similar users...")
-    user_recommended_animes_df = get_user_based_recommendations(similar_users, user_preferences, anime_df, ratings_df, synopsis_df, n=n*2) # Get more candidates
+def _build_anime_positions(state):
+    """Row position of each encoded anime's first row in anime_df, or -1 when it is missing."""
+    anime_df, anime2anime_decoded = state.anime_df, state.anime2anime_decoded
+    positions = pd.Series(np.arange(len(anime_df)), index=anime_df["anime_id"].values)
+    positions = positions[~positions.index.duplicated()]
+    anime_ids = pd.Series([anime2anime_decoded[i] for i in range(len(anime2anime_decoded))])
+    return anime_ids.map(positions).fillna(-1).to_numpy(dtype=np.int64)
+
+def _build_user_ratings(state):
+    """Ratings grouped by encoded user as CSR-style (indptr, anime, rating) arrays."""
+    ratings_df = state.rating_df
+    users = ratings_df["user"].to_numpy(dtype=np.int64)
+    order = np.argsort(users, kind="stable")
+    counts = np.bincount(users, minlength=len(state.user2user_encoded))
+    return {
+        "indptr": np.concatenate(([0], np.cumsum(counts))),
+        "anime": ratings_df["anime"].to_numpy(dtype=np.int64)[order],
+        "rating": ratings_df["rating"].to_numpy(dtype=np.float64)[order],
+    }
 
-    user_rec_list = []
-    if not user_recommended_animes_df.empty:
-        user_rec_list = user_recommended_animes_df["name"].tolist()
-        logger.info(f"Found {len(user_rec_list)} initial user-based recommendations: {user_rec_list}")
-    else:
-        logger.warning("No recommendations generated from similar users.")
-
-    # --- 2. Content-Based Component --- 
-    logger.info("Step 4: Finding content-based recommendations based on user preferences...")
-    content_recommended_anime_list = []
-    # Use user's *own* preferences to find similar content
-    if not user_preferences.empty:
-        # Consider top N preferences for finding similar content
-        top_pref_animes = user_preferences["eng_version"].head(n).tolist()
-        logger.info(f"Finding content similar to top preferences: {top_pref_animes}")
-        for anime_name_pref in top_pref_animes:
-            try:
-                # Find anime similar to this preferred anime
-                similar_animes_df = find_similar_anime(anime_name_pref, anime_df, synopsis_df, n=n)
-                if similar_animes_df is not None and not similar_animes_df.empty:
-                    # Add names, ensuring they are not already in the user's preferences
-                    new_recs = similar_animes_df[
-                        ~similar_animes_df["name"].isin(user_preferences["eng_version"].values)
-                    ]["name"].tolist()
-                    content_recommended_anime_list.extend(new_recs)
-                    logger.debug(f"Found {len(new_recs)} content-based recs similar to '{anime_name_pref}'")
-                else:
-                    logger.debug(f"No content-based similar animes found for preferred anime: '{anime_name_pref}'")
-            except Exception as e:
-                logger.error(f"Error getting content-based recs for preferred anime '{anime_name_pref}': {e}", exc_info=True)
-                continue
-        # De-duplicate content recommendations
-        content_recommended_anime_list = list(pd.Series(content_recommended_anime_list).unique())
-        logger.info(f"Found {len(content_recommended_anime_list)} unique content-based recommendations (based on user prefs): {content_recommended_anime_list[:10]}...")
-    else:
-        logger.warning(f"User {user_id} has no preferences, cannot generate content-based recommendations based on them.")
-
-    # --- 3. Combine Scores --- 
-    logger.info("Step 5: Combining user-based and content-based scores...")
-    combined_scores = {}
-
-    # Add scores from user-based recommendations
-    # Use the count/rank from user_recommended_animes_df if available for weighting?
-    # Simple approach: constant weight for being in the list
-    for anime_name in user_rec_list:
-        combined_scores[anime_name] = combined_scores.get(anime_name, 0) + user_weight
-
-    # Add scores from content-based recommendations
-    for anime_name in content_recommended_anime_list:
-        # Avoid double-counting heavily if an item is in both lists
-        # Option 1: Simple addition
-        combined_scores[anime_name] = combined_scores.get(anime_name, 0) + content_weight
-        # Option 2: Maximize score (if it appears in both, gets max weight)
-        # combined_scores[anime_name] = max(combined_scores.get(anime_name, 0), content_weight)
-
-    # Filter out animes already preferred by the user
-    animes_to_exclude = set(user_preferences["eng_version"].values)
-    final_scores = {anime: score for anime, score in combined_scores.items() if anime not in animes_to_exclude}
-
-    if not final_scores:
-        logger.warning(f"No combined recommendations generated for user {user_id} after filtering.")
-        # Fallback? Recommend top popular animes?
+def encoded_user_preferences(encoded_user):
+    """Encoded anime a user rated at or above their 75th percentile, in anime_df order."""
+    user_ratings = app_state.derived("user_ratings", _build_user_ratings)
+    start, end = user_ratings["indptr"][encoded_user], user_ratings["indptr"][encoded_user + 1]
+    if start == end:
+        return np.empty(0, dtype=np.int64)
+    ratings = user_ratings["rating"][start:end]
+    threshold = np.percentile(ratings, 75)
+    preferred = np.unique(user_ratings["anime"][start:end][ratings >= threshold])
+
+    positions = app_state.derived("anime_positions", _build_anime_positions)[preferred]
+    order = np.argsort(positions, kind="stable")
+    return preferred[order][positions[order] >= 0]
+
+def similar_user_indices(encoded_user, n=20):
+    """Encoded indices of the n users closest to a user in embedding space, most similar first."""
+    graph = precomputed_neighbors("user", encoded_user, n)
+    if graph is not None:
+        return graph[0][:n]
+    if app_state.user_search is not None:
+        return app_state.user_search.similar_indices(encoded_user, n)
+    user_weights = app_state.user_weights
+    closest = top_k(user_weights @ user_weights[encoded_user], n + 1)
+    return closest[closest != encoded_user][:n]
+
+def similar_anime_indices(encoded_anime, n=5, allowed=None):
+    """Encoded indices of the n anime closest to an anime in embedding space, restricted to `allowed`."""
+    positions = app_state.derived("anime_positions", _build_anime_positions)
+    graph = precomputed_neighbors("anime", encoded_anime, n) if allowed is None else None
+    if graph is not None:
+        closest = graph[0][:n]
+        return closest[positions[closest] >= 0]
+
+    anime_weights = app_state.anime_weights
+    dists = anime_weights @ anime_weights[encoded_anime]
+    if allowed is not None:
+        dists = np.where(allowed, dists, -np.inf)
+    closest = top_k(dists, n + 1)
+    if allowed is not None:
+        closest = closest[allowed[closest]]
+    closest = closest[(closest != encoded_anime) & (positions[closest] >= 0)]
+    return closest[:n]
+
+def _in_sorted(values, sorted_array):
+    """Membership of `values` in a sorted, unique array via binary search."""
+    if len(sorted_array) == 0:
+        return np.zeros(len(values), dtype=bool)
+    found = np.searchsorted(sorted_array, values)
+    return sorted_array[np.minimum(found, len(sorted_array) - 1)] == values
+
+def _unique_in_order(values):
+    """Unique values in order of first occurrence."""
+    _, first = np.unique(values, return_index=True)
+    return values[np.sort(first)]
+
+def user_based_candidate_indices(similar_users, exclude, n=10, allowed=None):
+    """Anime most often preferred by the similar users, by vote count then first appearance."""
+    names = encoded_anime_names()
+    votes = [encoded_user_preferences(user) for user in similar_users]
+    candidates = np.concatenate(votes) if votes else np.empty(0, dtype=np.int64)
+    keep = ~_in_sorted(candidates, exclude)
+    if allowed is not None:
+        keep &= allowed[candidates]
+    keep &= pd.notna(names[candidates])
+    candidates = candidates[keep]
+    if len(candidates) == 0:
+        return candidates
+
+    counts = np.bincount(candidates)
+    unique, first = np.unique(candidates, return_index=True)
+    order = np.lexsort((first, -counts[unique]))
+    return unique[order][:n]
+
+@traced()
+def hybrid_recommendation(user_id, user_weight=0.5, content_weight=0.5, n=5, filters=None, deadline=None,
+                          diversity=None):
+    """
+    Generates hybrid recommendations on encoded anime indices, resolving names only for the final list.
+
+    Ratings and anime metadata come from the `app_state` caches (per-user preference lists,
+    encoded anime names), so the function takes no dataframes.
+
+    With a `deadline` (`utils.admission.Deadline`), each stage checks it first and raises
+    `DeadlineExceeded` once it has passed. With a `diversity` reranker, the user- and
+    content-based stages each gather enough candidates to fill a `diversity.candidates`
+    shortlist, and the top of the combined ranking is MMR re-ranked down to n.
+    """
+    check = deadline.check if deadline is not None else (lambda stage: None)
+    logger.info("--- Starting Hybrid Recommendation for User ID: %s ---", user_id)
+    if not user_embeddings_available() or app_state.anime_weights is None or app_state.user2user_encoded is None:
+        logger.error("Cannot run hybrid recommendation: Artifacts not loaded.")
         return []
 
-    # Sort by combined score
-    sorted_animes = sorted(final_scores.items(), key=lambda item: item[1], reverse=True)
-
-    logger.info(f"Generated {len(sorted_animes)} final combined recommendations.")
-    logger.info(f"Top {n} recommendations for user {user_id}: {sorted_animes[:n]}")
-    logger.info(f"--- Finished Hybrid Recommendation for User ID: {user_id} ---")
+    try:
+        encoded_user = app_state.user2user_encoded.get(user_id)
+        if encoded_user is None:
+            logger.warning(f"User ID {user_id} not found in user2user_encoded map, serving popular anime instead.")
+            return popular_recommendations(n=n, filters=filters, reason="unknown_user")
+        allowed = candidate_mask(filters)
+        user_pool, content_pool = n * 2, n
+        if diversity is not None:
+            # Neighbours per preference, so the first n preferences can fill the shortlist on their own.
+            user_pool, content_pool = max(user_pool, diversity.candidates), max(content_pool, -(-diversity.candidates // n))
+
+        check("user_preferences")
+        with _USER_PREFERENCES_SECONDS.time():
+            preferences = encoded_user_preferences(encoded_user)
+            # Sorted copy for binary-search exclusion; `preferences` keeps anime_df order.
+            excluded = np.sort(preferences)
+        if len(preferences) == 0:
+            logger.warning(f"User {user_id} has no preferences, serving popular anime instead.")
+            return popular_recommendations(n=n, filters=filters, reason="no_preferences")
+        check("similar_users")
+        with _SIMILAR_USERS_SECONDS.time():
+            similar_users = similar_user_indices(encoded_user, n=20)
+        check("user_based")
+        with _USER_BASED_SECONDS.time():
+            user_recs = user_based_candidate_indices(similar_users, excluded, n=user_pool, allowed=allowed)
+        logger.info("Found %d user-based candidates from %d similar users.", len(user_recs), len(similar_users))
+
+        check("content_based")
+        with _CONTENT_BASED_SECONDS.time():
+            names = encoded_anime_names()
+            content_recs = [similar_anime_indices(anime, n=content_pool, allowed=allowed)
+                            for anime in preferences[:n] if names[anime] is not None]
+            content_recs = np.concatenate(content_recs) if content_recs else np.empty(0, dtype=np.int64)
+            content_recs = _unique_in_order(content_recs[~_in_sorted(content_recs, excluded)])
+        logger.info("Found %d content-based candidates from the user's top preferences.", len(content_recs))
+
+        check("combine")
+        with _COMBINE_SECONDS.time():
+            candidates = _unique_in_order(np.concatenate((user_recs, content_recs)))
+            candidates = candidates[pd.notna(names[candidates])]
+            scores = (user_weight * np.isin(candidates, user_recs) + content_weight * np.isin(candidates, content_recs))
+            ranked = candidates[np.argsort(-scores, kind="stable")]
+        if diversity is not None and len(ranked) > n:
+            check("diversity")
+            with _DIVERSITY_SECONDS.time():
+                ranked = ranked[:diversity.candidates]
+                # Hybrid scores are coarse vote weights with many ties, so relevance is the position in the ranking.
+                relevance = 1.0 - np.arange(len(ranked)) / len(ranked)
+                top = ranked[diversity.rerank(relevance, app_state.anime_weights[ranked], n)]
+        else:
+            top = ranked[:n]
 
-    # Return only the names of the top N animes
-    return [anime_name for anime_name, score in sorted_animes[:n]]
+        if len(top) == 0:
+            logger.warning(f"No combined recommendations generated for user {user_id} after filtering.")
+            return []
+        recommendations = names[top].tolist()
+        logger.info("Top %s recommendations for user %s: %s", n, user_id, recommendations)
+        return recommendations
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error in hybrid_recommendation for user {user_id}: {e}", exc_info=True)
+        return []
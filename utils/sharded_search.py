@@ -0,0 +1,204 @@
+"""
+Sharded Search Module
+
+Scatter-gather nearest-neighbour search over the user embeddings, for user bases whose
+embedding matrix should not live in a single serving process. Each shard is a local
+process owning a contiguous slice of `user_weights.pkl` (memory-mapped on load, so only
+the slice becomes resident) and the matching slice of the user encoder. The coordinator
+talks to every shard over a `multiprocessing` pipe: it sends the query vectors to all
+shards, each shard returns its local top-k, and the coordinator merges them into the
+global top-k. When a search is attached to `AppState`, the serving process does not load
+`user_weights` at all; single rows are fetched from the owning shard with `row`.
+
+Each pipe has its own lock. A scatter takes the locks in shard order and releases each
+one as soon as that shard has replied, so concurrent queries pipeline across shards, and
+single-row lookups only wait for the shard they need.
+
+Usage:
+    with ShardedUserSearch(n_shards=4) as search:
+        user_ids, scores = search.similar_users(user_id=1980, n=20)
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import joblib
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.topk import row_top_k
+
+logger = get_logger(__name__)
+
+
+def _serve_shard(conn, weights_path, decoded_path, start, end, blas_threads):
+    """Shard process loop: answers vector lookups and top-k searches over rows [start, end)."""
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=blas_threads)
+    try:
+        weights = np.array(joblib.load(weights_path, mmap_mode="r")[start:end], dtype=np.float32)
+        user2user_decoded = joblib.load(decoded_path)
+        user_ids = np.array([user2user_decoded[i] for i in range(start, end)], dtype=np.int64)
+        del user2user_decoded
+        local_index = {int(user_id): i for i, user_id in enumerate(user_ids)}
+        conn.send(("ready", end - start))
+    except Exception as e:
+        conn.send(("error", f"Shard [{start}, {end}) failed to load: {e}"))
+        return
+
+    while True:
+        message = conn.recv()
+        try:
+            if message[0] == "stop":
+                break
+            if message[0] == "vector":
+                position = local_index.get(message[1])
+                if position is None:
+                    conn.send(("ok", None, None))
+                else:
+                    conn.send(("ok", start + position, weights[position].copy()))
+            elif message[0] == "row":
+                conn.send(("ok", weights[message[1] - start].copy()))
+            elif message[0] == "search":
+                _, queries, k, exclude = message
+                scores = queries @ weights.T
+                if exclude is not None:
+                    rows = np.flatnonzero((exclude >= start) & (exclude < end))
+                    scores[rows, exclude[rows] - start] = -np.inf
+                positions, top_scores = row_top_k(scores, k)
+                conn.send(("ok", positions + start, top_scores, user_ids[positions]))
+            else:
+                conn.send(("error", f"Unknown shard request: {message[0]}"))
+        except Exception as e:
+            conn.send(("error", f"Shard [{start}, {end}) failed on {message[0]}: {e}"))
+    conn.close()
+
+
+class ShardedUserSearch:
+    """Coordinator fanning user-similarity queries out to shard processes and merging their top-k."""
+
+    def __init__(self, n_shards=2, weights_path=USER_WEIGHTS_FILE_PATH, decoded_path=USER2USER_DECODED_PATH,
+                 start_method=None):
+        self.n_shards = n_shards
+        self.weights_path = weights_path
+        self.decoded_path = decoded_path
+        # None uses the platform default; "spawn" re-imports the caller's __main__ in every shard.
+        self.start_method = start_method
+        self.shards = []
+        self.bounds = None
+        # One lock per shard pipe: replies on a pipe are matched to requests by order.
+        self._locks = []
+
+    def start(self):
+        """Spawns the shard processes and waits until each has loaded its slice."""
+        try:
+            n_rows = joblib.load(self.weights_path, mmap_mode="r").shape[0]
+            self.bounds = bounds = np.linspace(0, n_rows, self.n_shards + 1).astype(int)
+            # Split the cores between shards instead of letting every shard's BLAS use all of them.
+            blas_threads = max(1, (os.cpu_count() or 1) // self.n_shards)
+            context = multiprocessing.get_context(self.start_method)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(target=_serve_shard, daemon=True, name=f"user-shard-{start}",
+                                          args=(child_conn, self.weights_path, self.decoded_path, int(start), int(end), blas_threads))
+                process.start()
+                self.shards.append((process, parent_conn))
+                self._locks.append(threading.Lock())
+            for reply in self._check_replies([conn.recv() for _, conn in self.shards]):
+                logger.info(f"User search shard ready with {reply[1]} users.")
+            logger.info(f"Sharded user search started: {n_rows} users across {self.n_shards} shards.")
+            return self
+        except Exception as e:
+            self.close()
+            raise CustomException(f"Failed to start sharded user search, {e}", sys)
+
+    @staticmethod
+    def _check_replies(replies):
+        errors = [reply[1] for reply in replies if reply[0] == "error"]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return replies
+
+    def _scatter(self, message):
+        # Locks are always taken in shard order, so concurrent scatters cannot deadlock.
+        held, replies = [], []
+        try:
+            for lock, (_, conn) in zip(self._locks, self.shards):
+                lock.acquire()
+                held.append(lock)
+                conn.send(message)
+            for lock, (_, conn) in zip(self._locks, self.shards):
+                replies.append(conn.recv())
+                lock.release()
+                held.remove(lock)
+        finally:
+            for lock in held:
+                lock.release()
+        return self._check_replies(replies)
+
+    def vector(self, user_id):
+        """Returns (encoded_index, embedding) of a user from the shard that owns it, or (None, None)."""
+        for _, encoded_index, embedding in self._scatter(("vector", int(user_id))):
+            if encoded_index is not None:
+                return encoded_index, embedding
+        return None, None
+
+    def row(self, encoded_index):
+        """Embedding of an encoded user, fetched from the one shard that owns it."""
+        shard = int(np.searchsorted(self.bounds, encoded_index, side="right")) - 1
+        _, conn = self.shards[shard]
+        with self._locks[shard]:
+            conn.send(("row", int(encoded_index)))
+            reply = conn.recv()
+        if reply[0] == "error":
+            raise RuntimeError(reply[1])
+        return reply[1]
+
+    def similar_indices(self, encoded_index, n=20):
+        """Encoded indices of the n users closest to an encoded user, most similar first."""
+        indices, _, _ = self.search(self.row(encoded_index), k=n, exclude=[encoded_index])
+        return indices[0]
+
+    def search(self, queries, k=10, exclude=None):
+        """Global top-k (encoded indices, scores, user ids) for each row of `queries`, skipping `exclude` per row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        exclude = None if exclude is None else np.asarray(exclude, dtype=np.int64)
+        replies = self._scatter(("search", queries, k, exclude))
+
+        indices = np.concatenate([reply[1] for reply in replies], axis=1)
+        scores = np.concatenate([reply[2] for reply in replies], axis=1)
+        user_ids = np.concatenate([reply[3] for reply in replies], axis=1)
+        keep, top_scores = row_top_k(scores, k)
+        return (np.take_along_axis(indices, keep, axis=1), top_scores, np.take_along_axis(user_ids, keep, axis=1))
+
+    def similar_users(self, user_id, n=5):
+        """User ids and similarities of the n users closest to `user_id`, most similar first."""
+        encoded_index, embedding = self.vector(user_id)
+        if encoded_index is None:
+            logger.warning(f"User ID {user_id} not found in any user search shard.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        _, scores, user_ids = self.search(embedding, k=n, exclude=[encoded_index])
+        return user_ids[0], scores[0]
+
+    def close(self):
+        """Stops every shard process."""
+        for process, conn in self.shards:
+            try:
+                conn.send(("stop",))
+                conn.close()
+            except (OSError, BrokenPipeError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.shards = []
+        self._locks = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,32 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedArrays:
+    """Named numpy arrays copied into shared memory blocks, attachable from other processes by handle."""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.handles = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.handles[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(handles):
+        """Returns (arrays, blocks); keep the blocks referenced while the arrays are in use."""
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in handles.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            blocks.append(block)
+        return arrays, blocks
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
@@ -0,0 +1,92 @@
+"""
+Single-Flight Module
+
+Coalesces concurrent identical requests within one worker process. The first caller for
+a key (the leader) runs the computation. Callers that arrive with the same key while it
+is still running (followers) block until it finishes and get the same result, or the
+same exception. A follower given a `timeout` stops waiting after it and gets
+`FollowerTimeout` instead; the leader's computation carries on. Nothing is kept once the call completes, so this is not a cache: the
+next request after completion computes again.
+
+Recommendation keys are built by `recommendation_key`: the admission cache key
+(`utils.admission.request_key`: the request kind, the normalized title or user ID and the
+filters) plus `AppState.model_version`. After a model reload, requests therefore never
+join a computation that uses the previous embeddings.
+"""
+
+import threading
+from src.logger import get_logger
+from utils.admission import request_key
+from utils.metrics import SINGLE_FLIGHT_CALLS
+
+logger = get_logger(__name__)
+
+
+class FollowerTimeout(Exception):
+    """Raised to a follower whose wait for the leader's result ran past its timeout."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with that key share its outcome."""
+
+    def __init__(self, name="default"):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._leader_calls = SINGLE_FLIGHT_CALLS.labels(name, "leader")
+        self._follower_calls = SINGLE_FLIGHT_CALLS.labels(name, "follower")
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns `(fn(), shared)`; `shared` is True when the result came from another caller's computation.
+
+        Followers wait at most `timeout` seconds for the leader and then raise `FollowerTimeout`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            self._follower_calls.inc()
+            if not call.done.wait(timeout):
+                raise FollowerTimeout(f"Single-flight {self.name}: no result for {key!r} within {timeout * 1e3:.0f} ms")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        self._leader_calls.inc()
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                logger.info(f"Single-flight {self.name}: {call.followers} identical requests shared one computation.")
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def recommendation_key(kind, key, filters=None, model_version=None):
+    """Single-flight key of a recommendation request."""
+    return request_key(kind, key, filters) + (model_version,)
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def top_k(scores, k):
+    """Indices of the `k` largest scores, ordered from largest to smallest."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def row_top_k(scores, k):
+    """Per-row indices and values of the `k` largest entries of a 2-D array, each row sorted descending."""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
@@ -0,0 +1,183 @@
+"""
+Tracing Module
+
+Per-request tracing for the recommendation path. A trace records nested spans
+(e.g. `predict_anime_hybrid` -> `hybrid_recommendation` -> `find_similar_user`) and is
+written as a Chrome trace JSON file that can be opened in `chrome://tracing` or Perfetto.
+A `cProfile` dump can optionally be captured alongside a trace.
+
+Tracing is off by default. When no trace is active, `span` returns a shared no-op
+context manager and `traced` functions call straight through after a single
+context-variable lookup.
+
+Configuration lives under `tracing` in `config/config.yaml`:
+    enabled: master switch; nothing is traced when false.
+    sample_rate: fraction of requests traced.
+    debug_header: request header forcing a trace ("profile" also forces a profile).
+    profile_sample_rate: fraction of traced requests that also get a cProfile dump.
+    output_dir: directory the `.trace.json` / `.prof` files are written to.
+"""
+
+import cProfile
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import uuid
+from datetime import datetime
+from time import perf_counter
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_trace = contextvars.ContextVar("anime_recs_trace", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_args", "_start")
+
+    def __init__(self, trace, name, args):
+        self._trace = trace
+        self._name = name
+        self._args = args
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        args = self._args
+        if exc_type is not None:
+            args = dict(args, error=exc_type.__name__)
+        self._trace.add_event(self._name, self._start, perf_counter() - self._start, args)
+        return False
+
+
+class Trace:
+    """The spans recorded for a single request, plus an optional profiler."""
+
+    def __init__(self, name, output_dir, profile=False):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.output_dir = output_dir
+        self.events = []
+        self.profiler = cProfile.Profile() if profile else None
+        self._start = None
+        self._token = None
+
+    def add_event(self, name, start, duration, args=None):
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args or {},
+        })
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        self._start = perf_counter()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError as e:
+                # Another profiler is already active in this interpreter; keep the trace only.
+                logger.warning(f"Could not start profiler for trace {self.trace_id}: {e}")
+                self.profiler = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.add_event(self.name, self._start, perf_counter() - self._start,
+                       {"trace_id": self.trace_id, "error": exc_type.__name__ if exc_type else None})
+        _current_trace.reset(self._token)
+        try:
+            self.write()
+        except Exception as e:
+            logger.error(f"Failed to write trace {self.trace_id}: {e}", exc_info=True)
+        return False
+
+    def write(self):
+        """Writes the trace (and profile, if captured) to the output directory."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_name = os.path.join(self.output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{self.trace_id}")
+        with open(f"{base_name}.trace.json", "w") as trace_file:
+            json.dump({
+                "traceEvents": sorted(self.events, key=lambda event: event["ts"]),
+                "displayTimeUnit": "ms",
+                "otherData": {"trace_id": self.trace_id, "name": self.name},
+            }, trace_file)
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{base_name}.prof")
+        logger.info(f"Trace {self.trace_id} for '{self.name}' written to {base_name}.trace.json")
+
+
+def span(name, **args):
+    """Context manager recording a span in the active trace, or a no-op when none is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, args)
+
+
+def traced(name=None):
+    """Decorator recording each call of the function as a span in the active trace."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Span(trace, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+class Tracer:
+    """Decides which requests are traced/profiled and creates their `Trace` objects."""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get("enabled", False)
+        self.sample_rate = config.get("sample_rate", 0.0)
+        self.debug_header = config.get("debug_header", "X-Debug-Trace")
+        self.profile_sample_rate = config.get("profile_sample_rate", 0.0)
+        self.output_dir = config.get("output_dir", os.path.join("logs", "traces"))
+        self._random = random.Random()
+
+    def start(self, name, headers=None):
+        """Returns a `Trace` to enter for this request, or None if it is not traced."""
+        if not self.enabled:
+            return None
+        header_value = headers.get(self.debug_header) if headers is not None and self.debug_header else None
+        if header_value:
+            profile = header_value.lower() == "profile" or self._random.random() < self.profile_sample_rate
+            return Trace(name, self.output_dir, profile=profile)
+        if self.sample_rate > 0 and self._random.random() < self.sample_rate:
+            return Trace(name, self.output_dir, profile=self._random.random() < self.profile_sample_rate)
+        return None
@@ -0,0 +1,278 @@
+"""
+Trending Module
+
+"Trending now" lists from a live stream of rating/view events, next to the static
+`Members` / `Score` popularity tables.
+
+Events are JSON objects such as `{"anime_id": 20, "event": "view", "ts": 1700000000.0}`
+(`ts` is optional and defaults to arrival time). They come from one of two sources:
+
+* `QueueSource`: an in-process queue. The app publishes a view event for every title
+  recommendation request.
+* `FileTailSource`: tails a JSON-lines file, following truncation and rotation.
+
+`WindowedCounts` keeps the counts of the last `window_minutes`. It is a ring of
+`bucket_seconds` buckets with one float64 count per encoded anime, plus running window
+totals. An event adds its weight to one bucket and the totals. When a bucket falls out of
+the window, its counts are subtracted from the totals and it is reused. Memory is
+`n_buckets x n_anime x 8` bytes, whatever the event volume. The catalogue has a fixed
+size, so exact arrays stay small and a count-min sketch is not needed.
+
+`TrendingService` drains the source in batches on a background thread. At most every
+`refresh_seconds`, it re-ranks the totals into a top-`top_k` snapshot. `/trending`
+returns a slice of that snapshot, so a request does O(1) work whatever the catalogue
+size or event rate.
+"""
+
+import json
+import math
+import os
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+from utils.helpers import encoded_anime_names
+from utils.metrics import TRENDING_EVENTS
+from utils.topk import top_k
+
+logger = get_logger(__name__)
+
+
+class WindowedCounts:
+    """Per-item event counts over a sliding window, kept in a ring of fixed-width time buckets."""
+
+    def __init__(self, n_items, window_s=3600, bucket_s=60, now=None):
+        self.n_items = n_items
+        self.bucket_s = bucket_s
+        self.n_buckets = max(1, math.ceil(window_s / bucket_s))
+        self.counts = np.zeros((self.n_buckets, n_items), dtype=np.float64)
+        self.totals = np.zeros(n_items, dtype=np.float64)
+        self.current = int((time.time() if now is None else now) // bucket_s)
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.totals.nbytes
+
+    def advance(self, now):
+        """Moves the window forward to `now`, expiring the buckets that fall out of it."""
+        bucket = int(now // self.bucket_s)
+        steps = bucket - self.current
+        if steps <= 0:
+            return
+        if steps >= self.n_buckets:
+            self.counts[:] = 0
+            self.totals[:] = 0
+        else:
+            for absolute in range(self.current + 1, bucket + 1):
+                slot = absolute % self.n_buckets
+                self.totals -= self.counts[slot]
+                self.counts[slot] = 0
+            # Running subtraction can leave tiny negative residues.
+            np.maximum(self.totals, 0, out=self.totals)
+        self.current = bucket
+
+    def add(self, items, timestamps, weights=None):
+        """
+        Counts a batch of events; events older than the window are ignored. Returns how many were counted.
+
+        The window only moves with the wall clock (`advance`), never with event timestamps,
+        so a skewed or millisecond timestamp cannot expire the counts.
+        """
+        items = np.asarray(items, dtype=np.int64)
+        buckets = (np.asarray(timestamps, dtype=np.float64) // self.bucket_s).astype(np.int64)
+        weights = np.ones(len(items)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(items) == 0:
+            return 0
+        # Events stamped ahead of the window (clock skew) count towards the current bucket.
+        buckets = np.minimum(buckets, self.current)
+        live = buckets > self.current - self.n_buckets
+        items, buckets, weights = items[live], buckets[live], weights[live]
+        np.add.at(self.counts, (buckets % self.n_buckets, items), weights)
+        self.totals += np.bincount(items, weights=weights, minlength=self.n_items)
+        return int(live.sum())
+
+
+class QueueSource:
+    """In-process event source backed by a bounded queue; `publish` never blocks."""
+
+    def __init__(self, maxsize=100000):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def publish(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            TRENDING_EVENTS.labels("dropped").inc()
+
+    def read(self, max_events, timeout):
+        """Up to `max_events` queued events, waiting at most `timeout` seconds for the first."""
+        try:
+            events = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(events) < max_events:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+class FileTailSource:
+    """Follows a JSON-lines event file from its current end, reopening it after truncation or rotation."""
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.from_start = from_start
+        self._file = None
+        self._inode = None
+        self._partial = b""
+
+    def _open(self, from_start):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "rb")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        if not from_start:
+            self._file.seek(0, os.SEEK_END)
+
+    def _check_rotation(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # A file created later is read from its first line.
+            self.from_start = True
+            return
+        if self._file is None:
+            self._open(self.from_start)
+        elif stat.st_ino != self._inode or stat.st_size < self._file.tell():
+            logger.info(f"Event file {self.path} was rotated or truncated, reading it from the start.")
+            self._open(from_start=True)
+
+    def read(self, max_events, timeout):
+        """Complete lines appended since the last read (at most `max_events`), parsed as JSON."""
+        self._check_rotation()
+        if self._file is None:
+            time.sleep(timeout)
+            return []
+        events = []
+        while len(events) < max_events:
+            line = self._file.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                # Writer is mid-line; keep the fragment until the rest arrives.
+                self._partial += line
+                break
+            line, self._partial = self._partial + line, b""
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                TRENDING_EVENTS.labels("malformed").inc()
+        if not events:
+            time.sleep(timeout)
+        return events
+
+
+class TrendingService:
+    """Consumes rating/view events in the background and serves the current top anime by windowed count."""
+
+    def __init__(self, config, source=None):
+        self.config = config
+        self.window_s = config.get("window_minutes", 60) * 60
+        self.bucket_s = config.get("bucket_seconds", 60)
+        self.top_k = config.get("top_k", 50)
+        self.refresh_s = config.get("refresh_seconds", 1.0)
+        self.batch_size = config.get("batch_size", 10000)
+        self.poll_s = config.get("poll_seconds", 0.5)
+        self.event_weights = config.get("event_weights", {"view": 1.0, "rating": 1.0})
+        self.source = source or self._default_source()
+        self.counts = None
+        self._snapshot = ([], None)
+        self._last_refresh = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _default_source(self):
+        if self.config.get("source", "queue") == "file":
+            return FileTailSource(self.config.get("event_file", "logs/events.jsonl"),
+                                  from_start=self.config.get("from_start", False))
+        return QueueSource(self.config.get("queue_size", 100000))
+
+    def publish(self, event):
+        """Adds an event when the source is the in-process queue; ignored for file sources."""
+        if isinstance(self.source, QueueSource):
+            self.source.publish(event)
+
+    def start(self, state):
+        """Starts consuming once `state` (an `AppState`) has loaded the anime encoding."""
+        self._thread = threading.Thread(target=self._run, args=(state,), name="trending", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def _run(self, state):
+        state.wait_until_ready()
+        if not state.is_ready():
+            logger.error("Trending service not started: artifacts failed to load.")
+            return
+        self.anime2anime_encoded = state.anime2anime_encoded
+        self.counts = WindowedCounts(len(self.anime2anime_encoded), self.window_s, self.bucket_s)
+        logger.info(f"Trending service started: {self.counts.n_buckets} x {self.bucket_s}s buckets over "
+                    f"{self.counts.n_items} anime ({self.counts.nbytes / 2**20:.1f} MB).")
+        while not self._stop.is_set():
+            try:
+                self.consume(self.source.read(self.batch_size, self.poll_s))
+            except Exception as e:
+                logger.error(f"Trending consumer error: {e}", exc_info=True)
+                time.sleep(self.poll_s)
+
+    def consume(self, events, now=None):
+        """Counts a batch of events and refreshes the snapshot when it is due."""
+        now = time.time() if now is None else now
+        items, timestamps, weights = [], [], []
+        for event in events:
+            try:
+                item = self.anime2anime_encoded.get(int(event["anime_id"]))
+                weight = self.event_weights.get(event.get("event", "view"))
+                timestamp = float(event.get("ts", now))
+            except (KeyError, TypeError, ValueError):
+                TRENDING_EVENTS.labels("malformed").inc()
+                continue
+            if item is None or weight is None:
+                TRENDING_EVENTS.labels("unknown").inc()
+                continue
+            items.append(item)
+            timestamps.append(timestamp)
+            weights.append(weight)
+
+        self.counts.advance(now)
+        if items:
+            counted = self.counts.add(items, timestamps, weights)
+            TRENDING_EVENTS.labels("counted").inc(counted)
+            TRENDING_EVENTS.labels("expired").inc(len(items) - counted)
+        if now - self._last_refresh >= self.refresh_s:
+            self.refresh(now)
+
+    def refresh(self, now=None):
+        """Re-ranks the window totals into the served top-`top_k` snapshot."""
+        now = time.time() if now is None else now
+        totals = self.counts.totals
+        top = top_k(totals, self.top_k)
+        top = top[totals[top] > 0]
+        names = encoded_anime_names()[top]
+        self._snapshot = ([{"name": name, "count": float(count)} for name, count in zip(names, totals[top])
+                           if pd.notna(name)], now)
+        self._last_refresh = now
+
+    def trending(self, n=10):
+        """The current top `n` (name, windowed count) entries and the time they were ranked."""
+        entries, as_of = self._snapshot
+        return entries[:n], as_of